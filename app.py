@@ -1,6 +1,5 @@
 import os
-import sqlite3
-from flask import Flask, request
+from flask import Flask, request, jsonify
 from dotenv import load_dotenv
 from twilio.twiml.messaging_response import MessagingResponse
 from db_utils import get_data_for_prediction
@@ -9,17 +8,41 @@ from db_utils import get_triage_details,save_ai_decision,get_supervisor_for_agen
 from llm_utils import generate_ai_decision
 
 # Import all of your utility functions
-from twilio_utils import download_audio_file, send_whatsapp_message
-from prediction_utils import make_prediction, generate_model_based_plan
-from transcription_utils import transcribe_audio
+from twilio_utils import download_audio_file, send_whatsapp_message, twiml_message_bodies, twilio_stats
+from background_jobs import BoundedWorkerPool
+from model_registry import model_load_report
+from response_cache import llm_cache
+from prediction_utils import make_prediction, generate_model_based_plan, format_priority_plan, recovery_model_version, monitoring_stats
+from transcription_utils import transcribe_audio, transcriber, transcript_cache_stats
+from audio_stream import MediaLimitError
+from webhook_idempotency import WEBHOOK_IDEMPOTENCY_ENABLED, webhook_requests
+from conversation_state import create_conversation_store
 from sensitive_utils.detector import detect_and_encrypt_sensitive
-from db_utils import get_agent_and_customers, get_customer_history, log_agent_notes, get_all_data_for_agent, create_communication_record, get_pending_reports_for_supervisor, submit_supervisor_decision
-from nlu_utils import get_intent_and_entities
+from sensitive_utils.encryptor import token_vault
+from db_utils import get_agent_and_customers, get_customer_history, log_agent_notes, get_all_data_for_agent, get_ranked_customers_for_agent, create_communication_record, get_pending_reports_for_supervisor, submit_supervisor_decision
+from nlu_utils import get_intent_and_entities, nlu_stats
 from llm_utils import generate_priority_plan, generate_summary_for_supervisor
 
 load_dotenv()
 app = Flask(__name__)
-conversation_state = {}
+# Per-user context (last account viewed, pending actions); shared by all workers by default.
+conversation_state = create_conversation_store()
+
+# When enabled, voice notes are acknowledged straight away and transcribed by a
+# bounded background pool; the reply is delivered later with send_whatsapp_message.
+ASYNC_VOICE_NOTES = os.getenv("ASYNC_VOICE_NOTES", "0") == "1"
+voice_note_pool = BoundedWorkerPool(
+    "voice-notes",
+    max_workers=int(os.getenv("VOICE_NOTE_WORKERS", "2")),
+    max_queue_size=int(os.getenv("VOICE_NOTE_QUEUE_SIZE", "32")),
+)
+
+VOICE_NOTE_TOO_LARGE_REPLY = "Sorry, that voice note is too long for me to process. Please send a shorter one or type your request."
+VOICE_NOTE_ERROR_REPLY = "Sorry, I could not process your voice note."
+
+
+class VoiceNoteError(Exception):
+    """A voice note failed for a reason a retry might not hit (download, transcription, ...)."""
 
 # --- Central function to process all text-based commands ---
 def process_text_message(incoming_msg, from_number):
@@ -28,7 +51,7 @@ def process_text_message(incoming_msg, from_number):
     It can be called with text from either a voice note or a typed message.
     """
     resp = MessagingResponse()
-    user_context = conversation_state.get(from_number, {})
+    user_context = conversation_state.get(from_number)
 
     # 1. Get intent and entities from our NLU utility
     intent, account_number = get_intent_and_entities(incoming_msg)
@@ -135,11 +158,17 @@ def process_text_message(incoming_msg, from_number):
     
 
     elif intent == 'get_priority_plan':
-            # 1. Get all the necessary feature data for the agent's customers
-            all_data = get_all_data_for_agent(from_number)
-            
-            # 2. Generate the priority plan using the custom-trained model
-            priority_plan = generate_model_based_plan(all_data)
+            # 1. Use the risk scores precomputed by risk_score_job.py
+            #    Empty unless every account has a score from the loaded model that is newer
+            #    than the account's last profile change.
+            ranked_customers = get_ranked_customers_for_agent(from_number, recovery_model_version())
+            if ranked_customers:
+                priority_plan = format_priority_plan(ranked_customers)
+            else:
+                # 2. Some accounts are not scored yet, were edited since, or were scored by an older model:
+                #    score the agent's whole portfolio now with the custom-trained model
+                all_data = get_all_data_for_agent(from_number)
+                priority_plan = generate_model_based_plan(all_data)
             
             # 3. Send the plan to the agent
             resp.message(priority_plan)
@@ -154,15 +183,9 @@ def process_text_message(incoming_msg, from_number):
             
             if account_to_report:
                 # First, get the agent's own details to find their supervisor
-                # This logic can be moved to db_utils.py for cleanliness in a future step
-                conn = sqlite3.connect('loan_recovery.db')
-                cursor = conn.cursor()
-                cursor.execute("SELECT supervisor_number FROM agents WHERE whatsapp_number = ?", (from_number,))
-                agent_info = cursor.fetchone()
-                conn.close()
+                supervisor_number = get_supervisor_for_agent(from_number)
                 
-                if agent_info and agent_info[0]:
-                    supervisor_number = agent_info[0]
+                if supervisor_number:
                     
                     # Fetch the customer details to generate the summary
                     details = get_customer_history(account_to_report, from_number)
@@ -214,37 +237,90 @@ def process_text_message(incoming_msg, from_number):
         except (IndexError, ValueError):
             resp.message("To submit a decision, use the format: decision for <report_id>: <your_decision>")
 
+    elif intent == 'greet':
+        resp.message("Hello! You can ask me for your customer list, your priority plan or an account's history, "
+                     "or log a reason with: log for <account_number>: <reason>")
+
+    elif intent == 'goodbye':
+        resp.message("Goodbye! Message me any time you need your customer list or priority plan.")
+
     else:
         resp.message("Sorry, I don't understand that command. Please try again.")
 
-    conversation_state[from_number] = user_context
+    conversation_state.set(from_number, user_context)
     return str(resp)
 
 
+def process_voice_note_in_background(media_url, from_number):
+    """
+    Runs on a voice_note_pool worker: downloads and transcribes the voice note,
+    then sends the reply as a proactive WhatsApp message.
+    """
+    try:
+        with download_audio_file(media_url) as audio:
+            transcribed_text = transcribe_audio(audio.data)
+        reply_twiml = process_text_message(transcribed_text, from_number)
+        for body in twiml_message_bodies(reply_twiml):
+            send_whatsapp_message(from_number, body)
+    except MediaLimitError as e:
+        print("Voice note rejected:", e)
+        send_whatsapp_message(from_number, VOICE_NOTE_TOO_LARGE_REPLY)
+    except Exception as e:
+        print("Error processing voice note:", e)
+        send_whatsapp_message(from_number, VOICE_NOTE_ERROR_REPLY)
+
+
 # In app.py
 
 @app.route("/webhook", methods=["POST"])
 def whatsapp_webhook():
+    # Twilio retries with the same MessageSid when a response is slow; a retry gets the
+    # stored reply instead of running the NLU, DB writes and LLM calls again.
+    message_sid = request.form.get("MessageSid")
+    try:
+        if not WEBHOOK_IDEMPOTENCY_ENABLED or not message_sid:
+            return handle_whatsapp_message()
+        return webhook_requests.run(message_sid, handle_whatsapp_message)
+    except VoiceNoteError as e:
+        # Answered here, outside run(), so the apology is not stored and a retry tries again.
+        print("Error processing voice note:", e)
+        resp = MessagingResponse()
+        resp.message(VOICE_NOTE_ERROR_REPLY)
+        return str(resp)
+
+
+def handle_whatsapp_message():
     from_number = request.form.get("From")
 
     if int(request.form.get("NumMedia", 0)) > 0:
         # --- This is a VOICE NOTE (In-Memory Processing) ---
         media_url = request.form.get("MediaUrl0")
+
+        if ASYNC_VOICE_NOTES:
+            # Acknowledge now; the worker sends the real reply when it is done.
+            resp = MessagingResponse()
+            if voice_note_pool.submit(process_voice_note_in_background, media_url, from_number):
+                resp.message("Got your voice note, I'm processing it now.")
+            else:
+                resp.message("Sorry, I'm handling a lot of voice notes right now. Please try again in a minute or send a text message.")
+            return str(resp)
+
         try:
-            # 1. Download audio as bytes
-            audio_data = download_audio_file(media_url)
-            
-            # 2. Transcribe the audio bytes directly from memory
-            transcribed_text = transcribe_audio(audio_data)
+            # 1. Download the audio (streamed, size-limited, spilled to disk if large)
+            with download_audio_file(media_url) as audio:
+                # 2. Transcribe it straight from that buffer
+                transcribed_text = transcribe_audio(audio.data)
             
             # 3. Process the transcribed text using our central function
             return process_text_message(transcribed_text, from_number)
 
-        except Exception as e:
-            print("Error processing voice note:", e)
+        except MediaLimitError as e:
+            print("Voice note rejected:", e)
             resp = MessagingResponse()
-            resp.message("Sorry, I could not process your voice note.")
+            resp.message(VOICE_NOTE_TOO_LARGE_REPLY)
             return str(resp)
+        except Exception as e:
+            raise VoiceNoteError(e) from e
             
     else:
         # --- This is a TEXT MESSAGE ---
@@ -253,6 +329,22 @@ def whatsapp_webhook():
         # Process the typed text using our central function
         return process_text_message(processed_text, from_number)
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify({
+        "voice_note_pool": voice_note_pool.stats(),
+        "transcriber": transcriber.stats(),
+        "transcript_cache": transcript_cache_stats(),
+        "models": model_load_report(),
+        "nlu": nlu_stats(),
+        "llm_cache": llm_cache.stats(),
+        "token_vault": token_vault.stats(),
+        "prediction_monitor": monitoring_stats(),
+        "twilio": twilio_stats(),
+        "webhook_idempotency": webhook_requests.stats(),
+        "conversation_state": conversation_state.stats(),
+    })
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
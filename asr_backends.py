@@ -0,0 +1,85 @@
+import abc
+import os
+
+# Which backend transcription_utils uses, and which Whisper checkpoint it loads.
+# Smaller variants (openai/whisper-base, openai/whisper-tiny) work with either backend.
+# torch and transformers are imported inside the backends so importing this module stays cheap.
+ASR_BACKEND = os.getenv("ASR_BACKEND", "hf")
+ASR_MODEL = os.getenv("ASR_MODEL", "openai/whisper-small")
+
+
+class ASRBackend(abc.ABC):
+    """
+    Base class for speech-to-text backends. Subclasses build a transformers ASR
+    pipeline in _build_pipeline(); inputs are whatever that pipeline accepts
+    (encoded audio bytes, or {"raw": float32 array, "sampling_rate": int}).
+    """
+    name = "base"
+
+    def __init__(self, model_name=ASR_MODEL):
+        self.model_name = model_name
+        self.pipeline = self._build_pipeline()
+
+    @abc.abstractmethod
+    def _build_pipeline(self):
+        """Returns the transformers ASR pipeline this backend runs."""
+
+    def transcribe(self, audio, generate_kwargs=None):
+        return self.pipeline(audio, generate_kwargs=generate_kwargs or {})["text"]
+
+    def transcribe_batch(self, audio_clips, generate_kwargs=None):
+        results = self.pipeline(audio_clips, batch_size=len(audio_clips), generate_kwargs=generate_kwargs or {})
+        return [result["text"] for result in results]
+
+    def describe(self):
+        return f"{self.name}:{self.model_name}"
+
+
+class HFPipelineBackend(ASRBackend):
+    """The stock fp32 Hugging Face pipeline, on GPU when one is available."""
+    name = "hf"
+
+    def _build_pipeline(self):
+        import torch
+        from transformers import pipeline
+
+        return pipeline("automatic-speech-recognition", model=self.model_name, device=0 if torch.cuda.is_available() else -1)
+
+
+class QuantizedWhisperBackend(ASRBackend):
+    """
+    Whisper with its Linear layers dynamically quantized to int8, for CPU-only nodes.
+    Weights are quantized once at load; activations are quantized on the fly.
+    """
+    name = "quantized"
+
+    def _build_pipeline(self):
+        import torch
+        from transformers import WhisperForConditionalGeneration, WhisperProcessor, pipeline
+
+        processor = WhisperProcessor.from_pretrained(self.model_name)
+        model = WhisperForConditionalGeneration.from_pretrained(self.model_name, torch_dtype=torch.float32)
+        model.eval()
+        quantized_model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline(
+            "automatic-speech-recognition",
+            model=quantized_model,
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+            device=-1,
+        )
+
+
+ASR_BACKENDS = {
+    HFPipelineBackend.name: HFPipelineBackend,
+    QuantizedWhisperBackend.name: QuantizedWhisperBackend,
+}
+
+
+def create_asr_backend(backend_name=None, model_name=None):
+    """Builds the configured backend (ASR_BACKEND / ASR_MODEL unless overridden)."""
+    backend_name = backend_name or ASR_BACKEND
+    model_name = model_name or ASR_MODEL
+    if backend_name not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{backend_name}'. Choose one of: {', '.join(ASR_BACKENDS)}")
+    return ASR_BACKENDS[backend_name](model_name)
@@ -0,0 +1,147 @@
+import subprocess
+import threading
+import numpy as np
+
+SAMPLING_RATE = 16000
+_BYTES_PER_SAMPLE = 2  # ffmpeg emits signed 16-bit PCM
+_FEED_BLOCK_BYTES = 64 * 1024
+
+
+class MediaLimitError(ValueError):
+    """The audio is larger or longer than the configured limit."""
+
+
+def _feed_stdin(process, audio_data):
+    """Writes the encoded audio to ffmpeg in blocks, without copying the source buffer."""
+    view = memoryview(audio_data)
+    try:
+        for start in range(0, len(view), _FEED_BLOCK_BYTES):
+            process.stdin.write(view[start:start + _FEED_BLOCK_BYTES])
+    except (BrokenPipeError, ValueError):
+        # ffmpeg stopped reading (bad input or the consumer closed early).
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+
+def decode_audio_stream(audio_data, sampling_rate=SAMPLING_RATE, block_seconds=1.0, max_seconds=None):
+    """
+    Decodes an encoded audio buffer (ogg/opus, mp3, wav, ...) with ffmpeg and yields
+    mono float32 PCM blocks of about block_seconds each. Only one block is held in memory.
+    audio_data can be any buffer (bytes, bytearray, mmap); it is not copied.
+    Raises MediaLimitError once more than max_seconds of audio has been decoded.
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "quiet",
+        "-i", "pipe:0",
+        "-ac", "1", "-ar", str(sampling_rate),
+        "-f", "s16le", "pipe:1",
+    ]
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    except FileNotFoundError:
+        raise ValueError("ffmpeg was not found but it is required to decode audio streams.")
+
+    feeder = threading.Thread(target=_feed_stdin, args=(process, audio_data), daemon=True)
+    feeder.start()
+
+    block_bytes = int(sampling_rate * block_seconds) * _BYTES_PER_SAMPLE
+    max_bytes = int(max_seconds * sampling_rate) * _BYTES_PER_SAMPLE if max_seconds else None
+    decoded_bytes = 0
+    try:
+        while True:
+            raw = process.stdout.read(block_bytes)
+            if not raw:
+                break
+            decoded_bytes += len(raw)
+            if max_bytes is not None and decoded_bytes > max_bytes:
+                raise MediaLimitError(f"audio is longer than the {max_seconds:g} second limit")
+            # Drop a trailing odd byte rather than failing on it.
+            usable = len(raw) - (len(raw) % _BYTES_PER_SAMPLE)
+            yield np.frombuffer(raw[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+        feeder.join()
+
+
+def decode_audio(audio_data, sampling_rate=SAMPLING_RATE, max_seconds=None):
+    """
+    Decodes a whole clip into one mono float32 array (see decode_audio_stream).
+    Blocks are written straight into a single array instead of being concatenated at
+    the end, so the clip is never held twice. With max_seconds that array is sized for
+    the limit up front (pages a short clip never touches are not committed); without
+    it, it grows by doubling. Returns a view of the decoded part.
+    """
+    capacity = int(max_seconds * sampling_rate) if max_seconds else int(60 * sampling_rate)
+    pcm = np.empty(capacity, dtype=np.float32)
+    filled = 0
+    for block in decode_audio_stream(audio_data, sampling_rate, block_seconds=5.0, max_seconds=max_seconds):
+        if filled + len(block) > len(pcm):
+            grown = np.empty(max(2 * len(pcm), filled + len(block)), dtype=np.float32)
+            grown[:filled] = pcm[:filled]
+            pcm = grown
+        pcm[filled:filled + len(block)] = block
+        filled += len(block)
+    return pcm[:filled]
+
+
+def iter_overlapping_chunks(pcm_blocks, sampling_rate=SAMPLING_RATE, chunk_length_s=30.0, stride_s=5.0):
+    """
+    Regroups decoded PCM blocks into fixed-length chunks where each chunk repeats the
+    last stride_s seconds of the previous one, so words cut at a boundary appear whole
+    in at least one chunk. Yields (chunk, is_last).
+    """
+    chunk_samples = int(chunk_length_s * sampling_rate)
+    stride_samples = int(stride_s * sampling_rate)
+    if stride_samples >= chunk_samples:
+        raise ValueError("stride_s must be shorter than chunk_length_s")
+
+    buffer = np.empty(chunk_samples, dtype=np.float32)
+    filled = 0
+    emitted_any = False
+    pending = None
+
+    for block in pcm_blocks:
+        offset = 0
+        while offset < len(block):
+            take = min(chunk_samples - filled, len(block) - offset)
+            buffer[filled:filled + take] = block[offset:offset + take]
+            filled += take
+            offset += take
+            if filled == chunk_samples:
+                # Hold each full chunk back by one step so the final one can be flagged.
+                if pending is not None:
+                    yield pending, False
+                pending = buffer.copy()
+                emitted_any = True
+                buffer[:stride_samples] = buffer[chunk_samples - stride_samples:]
+                filled = stride_samples
+
+    tail_has_new_audio = filled > (stride_samples if emitted_any else 0)
+    if pending is not None:
+        yield pending, not tail_has_new_audio
+    if tail_has_new_audio:
+        yield buffer[:filled].copy(), True
+
+
+def merge_overlapping_text(previous_words, new_words, max_overlap_words=20):
+    """
+    Returns the part of new_words that does not repeat the end of previous_words.
+    Looks for the longest suffix of previous_words that is also a prefix of new_words,
+    comparing case- and punctuation-insensitively.
+    """
+    def normalize(word):
+        return word.strip(".,!?;:\"'").lower()
+
+    limit = min(max_overlap_words, len(previous_words), len(new_words))
+    previous_tail = [normalize(w) for w in previous_words[-limit:]] if limit else []
+    new_head = [normalize(w) for w in new_words[:limit]]
+    for size in range(limit, 0, -1):
+        if previous_tail[-size:] == new_head[:size]:
+            return new_words[size:]
+    return new_words
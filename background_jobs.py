@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+
+
+class BoundedWorkerPool:
+    """
+    A fixed set of worker threads fed from a bounded queue.
+    submit() never blocks: when the queue is full the job is rejected so the caller
+    can shed load instead of piling up requests (backpressure).
+    """
+
+    def __init__(self, name, max_workers=2, max_queue_size=32, wait_samples=1000):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wait_times_ms = deque(maxlen=wait_samples)
+        self._busy_workers = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._started = False
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.max_workers):
+                thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._started = True
+
+    def submit(self, func, *args, **kwargs):
+        """Queues func(*args, **kwargs). Returns False if the queue is full."""
+        self._start()
+        try:
+            self._queue.put_nowait((time.monotonic(), func, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            return False
+        with self._lock:
+            self._submitted += 1
+        return True
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            enqueued_at, func, args, kwargs = job
+            with self._lock:
+                self._wait_times_ms.append((time.monotonic() - enqueued_at) * 1000)
+                self._busy_workers += 1
+            try:
+                func(*args, **kwargs)
+                succeeded = True
+            except Exception as e:
+                print(f"Background job error in {self.name}: {e}")
+                succeeded = False
+            with self._lock:
+                self._busy_workers -= 1
+                if succeeded:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+            self._queue.task_done()
+
+    def join(self):
+        """Blocks until every queued job has finished."""
+        self._queue.join()
+
+    def shutdown(self):
+        """Lets queued jobs finish, then stops the workers."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._started = False
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._wait_times_ms)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self.max_queue_size,
+                "workers": self.max_workers,
+                "busy_workers": self._busy_workers,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "failed": self._failed,
+                "wait_ms_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                "wait_ms_max": round(waits[-1], 3) if waits else 0.0,
+            }
+
+
+class KeyedWorkerPool:
+    """
+    BoundedWorkerPools of one thread each. Jobs submitted with the same key always go
+    to the same shard, so they run in submission order (e.g. messages to one number),
+    while jobs for different keys run in parallel. max_queue_size applies to each shard,
+    so a busy key cannot be rejected just because keys are unevenly spread.
+    """
+
+    def __init__(self, name, max_workers=4, max_queue_size=1000):
+        self.name = name
+        self._shards = [
+            BoundedWorkerPool(f"{name}-{i}", max_workers=1, max_queue_size=max_queue_size)
+            for i in range(max_workers)
+        ]
+
+    def submit(self, key, func, *args, **kwargs):
+        """Queues func(*args, **kwargs) behind earlier jobs for key. Returns False if that shard is full."""
+        shard = self._shards[zlib.crc32(str(key).encode("utf-8")) % len(self._shards)]
+        return shard.submit(func, *args, **kwargs)
+
+    def join(self):
+        for shard in self._shards:
+            shard.join()
+
+    def shutdown(self):
+        for shard in self._shards:
+            shard.shutdown()
+
+    def stats(self):
+        shards = [shard.stats() for shard in self._shards]
+        totals = {
+            key: sum(s[key] for s in shards)
+            for key in ("queue_depth", "max_queue_size", "workers", "busy_workers", "submitted", "rejected", "completed", "failed")
+        }
+        totals["wait_ms_max"] = max(s["wait_ms_max"] for s in shards)
+        return totals
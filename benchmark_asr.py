@@ -0,0 +1,134 @@
+"""
+Compares ASR backends on local sample clips: real-time factor, peak RSS and word error rate.
+
+The sample set is a directory holding audio clips (any format ffmpeg decodes) plus
+a manifest.json listing each clip, relative to that directory, with its reference
+transcript:
+    [{"file": "log_reason_01.ogg", "text": "log for ACC001: customer lost his job"}, ...]
+No clips are shipped with the repository; make_asr_samples.py synthesises a set of
+typical agent commands in this format, or use recorded voice notes.
+
+Each backend/model pair runs in a fresh process so peak RSS is measured in isolation.
+
+Usage:
+    python make_asr_samples.py --output samples
+    python benchmark_asr.py --samples samples --backends hf quantized \\
+        --models openai/whisper-small openai/whisper-base openai/whisper-tiny
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import resource
+import time
+
+from audio_stream import SAMPLING_RATE, decode_audio
+
+
+def normalize_words(text):
+    return re.sub(r"[^a-z0-9\s]", " ", text.lower()).split()
+
+
+def word_edit_distance(reference, hypothesis):
+    """Levenshtein distance between two word lists."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1]
+
+
+def load_samples(samples_dir):
+    manifest_path = os.path.join(samples_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        raise SystemExit(f"No manifest found at {manifest_path}. Generate a sample set with "
+                         f"'python make_asr_samples.py --output {samples_dir}' (see the notes at the top of this file).")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    samples = []
+    for entry in manifest:
+        if not isinstance(entry, dict) or "file" not in entry or "text" not in entry:
+            raise SystemExit(f"Bad manifest entry {entry!r}: expected {{\"file\": ..., \"text\": ...}}.")
+        with open(os.path.join(samples_dir, entry["file"]), "rb") as f:
+            pcm = decode_audio(f.read(), SAMPLING_RATE)
+        samples.append((entry["file"], pcm, entry["text"]))
+    return samples
+
+
+def _run_backend(backend_name, model_name, samples, generate_kwargs, result_queue):
+    # Imported here so each child process pays for (and measures) its own model load.
+    from asr_backends import create_asr_backend
+
+    load_start = time.perf_counter()
+    backend = create_asr_backend(backend_name, model_name)
+    load_seconds = time.perf_counter() - load_start
+
+    # Warm-up pass so one-off initialisation does not count against the first clip.
+    backend.transcribe({"raw": samples[0][1], "sampling_rate": SAMPLING_RATE}, generate_kwargs=generate_kwargs)
+
+    audio_seconds = 0.0
+    compute_seconds = 0.0
+    edits = 0
+    reference_words = 0
+    for _, pcm, reference in samples:
+        start = time.perf_counter()
+        hypothesis = backend.transcribe({"raw": pcm, "sampling_rate": SAMPLING_RATE}, generate_kwargs=generate_kwargs)
+        compute_seconds += time.perf_counter() - start
+        audio_seconds += len(pcm) / SAMPLING_RATE
+        ref_words = normalize_words(reference)
+        edits += word_edit_distance(ref_words, normalize_words(hypothesis))
+        reference_words += len(ref_words)
+
+    result_queue.put({
+        "backend": backend.describe(),
+        "load_s": load_seconds,
+        "rtf": compute_seconds / audio_seconds if audio_seconds else float("nan"),
+        "wer": edits / reference_words if reference_words else float("nan"),
+        # ru_maxrss is reported in KiB on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", default="samples")
+    parser.add_argument("--backends", nargs="+", default=["hf", "quantized"])
+    parser.add_argument("--models", nargs="+", default=["openai/whisper-small"])
+    parser.add_argument("--language", default="en")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        raise SystemExit("The sample manifest is empty.")
+    total_audio = sum(len(pcm) for _, pcm, _ in samples) / SAMPLING_RATE
+    print(f"Loaded {len(samples)} clips ({total_audio:.1f}s of audio)\n")
+
+    generate_kwargs = {"language": args.language, "task": "transcribe"}
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for backend_name in args.backends:
+        for model_name in args.models:
+            result_queue = context.Queue()
+            process = context.Process(target=_run_backend, args=(backend_name, model_name, samples, generate_kwargs, result_queue))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"{backend_name}:{model_name} failed (exit code {process.exitcode})")
+                continue
+            rows.append(result_queue.get())
+
+    print(f"{'backend':<40} {'load s':>8} {'RTF':>8} {'WER':>8} {'peak RSS MB':>12}")
+    for row in rows:
+        print(f"{row['backend']:<40} {row['load_s']:>8.1f} {row['rtf']:>8.3f} {row['wer']:>8.3f} {row['peak_rss_mb']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmarks the hot db_utils queries on a synthetic database, before and after the
+index migration. Prints the query plan and mean/p99 latency for each query.
+
+Usage:
+    python benchmark_db.py --customers 1000000 --db bench_loan_recovery.db
+"""
+import argparse
+import os
+import random
+import time
+
+import db_pool
+import db_utils
+from migrations import run_migrations, LATEST_VERSION
+
+# The SQL behind each benchmarked db_utils call, used for EXPLAIN QUERY PLAN.
+PLAN_QUERIES = {
+    "get_agent_and_customers": (
+        "SELECT customer_name, due_amount, account_number, location FROM customers WHERE assigned_agent_number = ?"
+    ),
+    "get_all_data_for_agent": (
+        "SELECT c.customer_name, c.account_number, p.* FROM customers c "
+        "JOIN customer_profile p ON c.account_number = p.account_number WHERE c.assigned_agent_number = ?"
+    ),
+    "get_pending_reports_for_supervisor": (
+        "SELECT comm_id, account_number, agent_number, summary_report FROM communications "
+        "WHERE supervisor_number = ? AND status = 'Pending'"
+    ),
+}
+
+EDUCATION = ["High School", "Bachelor's", "Master's", "PhD"]
+EMPLOYMENT = ["Full-time", "Part-time", "Self-employed", "Unemployed"]
+MARITAL = ["Single", "Married", "Divorced"]
+PURPOSE = ["Home", "Auto", "Education", "Business", "Medical", "Personal", "Other"]
+YES_NO = ["Yes", "No"]
+
+
+def agent_number(i):
+    return f"whatsapp:+9170000{i:05d}"
+
+
+def supervisor_number(i):
+    return f"whatsapp:+9180000{i:05d}"
+
+
+def populate(connection, num_customers, num_agents, num_supervisors, reports_per_supervisor):
+    rng = random.Random(42)
+    batch_size = 50000
+
+    agents = [(supervisor_number(s), f"Supervisor {s}", None) for s in range(num_supervisors)]
+    agents += [(agent_number(a), f"Agent {a}", supervisor_number(a % num_supervisors)) for a in range(num_agents)]
+    connection.executemany("INSERT INTO agents VALUES (?, ?, ?)", agents)
+
+    for start in range(0, num_customers, batch_size):
+        stop = min(start + batch_size, num_customers)
+        customers, profiles, history = [], [], []
+        for i in range(start, stop):
+            account = f"ACC{i:08d}"
+            customers.append((f"Customer {i}", round(rng.uniform(500, 50000), 2), account,
+                              "Mumbai", "Regular", agent_number(i % num_agents)))
+            profiles.append((account, rng.randint(21, 70), rng.randint(15000, 150000), rng.uniform(5000, 250000),
+                             rng.randint(300, 850), rng.randint(0, 120), rng.randint(1, 4), rng.uniform(2, 25),
+                             rng.choice([12, 24, 36, 48, 60]), rng.uniform(0.1, 0.9), rng.choice(EDUCATION),
+                             rng.choice(EMPLOYMENT), rng.choice(MARITAL), rng.choice(YES_NO), rng.choice(YES_NO),
+                             rng.choice(PURPOSE), rng.choice(YES_NO)))
+            history.append((account, rng.uniform(5000, 250000), rng.randint(0, 60), "2025-06-15", "Paid,Late,Paid"))
+        connection.executemany(
+            '''INSERT INTO customers (customer_name, due_amount, account_number, location, customer_type, assigned_agent_number)
+               VALUES (?, ?, ?, ?, ?, ?)''', customers)
+        connection.executemany(
+            '''INSERT INTO customer_profile (
+                account_number, Age, Income, LoanAmount, CreditScore, MonthsEmployed,
+                NumCreditLines, InterestRate, LoanTerm, DTIRatio, Education,
+                EmploymentType, MaritalStatus, HasMortgage, HasDependents, LoanPurpose, HasCoSigner
+               ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', profiles)
+        connection.executemany(
+            '''INSERT INTO account_history (account_number, total_loan, emis_paid, last_payment_date, payment_record)
+               VALUES (?, ?, ?, ?, ?)''', history)
+        connection.commit()
+        print(f"  inserted {stop:,} / {num_customers:,} customers")
+
+    reports = []
+    for s in range(num_supervisors):
+        for r in range(reports_per_supervisor):
+            i = rng.randrange(num_customers)
+            status = "Pending" if r % 4 == 0 else "Resolved"
+            reports.append((f"ACC{i:08d}", agent_number(i % num_agents), supervisor_number(s), "Summary text " * 20, status))
+    connection.executemany(
+        '''INSERT INTO communications (account_number, agent_number, supervisor_number, summary_report, status)
+           VALUES (?, ?, ?, ?, ?)''', reports)
+    connection.commit()
+
+
+def time_call(func, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return mean, p99
+
+
+def report(connection, label, num_agents, num_supervisors, iterations):
+    rng = random.Random(7)
+    agent_args = [(agent_number(rng.randrange(num_agents)),) for _ in range(iterations)]
+    supervisor_args = [(supervisor_number(rng.randrange(num_supervisors)),) for _ in range(iterations)]
+    calls = {
+        "get_agent_and_customers": (db_utils.get_agent_and_customers, agent_args),
+        "get_all_data_for_agent": (db_utils.get_all_data_for_agent, agent_args),
+        "get_pending_reports_for_supervisor": (db_utils.get_pending_reports_for_supervisor, supervisor_args),
+    }
+
+    print(f"\n=== {label} ===")
+    for name, (func, args_list) in calls.items():
+        plan = connection.execute(f"EXPLAIN QUERY PLAN {PLAN_QUERIES[name]}", args_list[0]).fetchall()
+        mean, p99 = time_call(func, args_list)
+        print(f"\n{name}: mean {mean:.3f} ms, p99 {p99:.3f} ms over {iterations} calls")
+        for row in plan:
+            print(f"    {row['detail']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench_loan_recovery.db")
+    parser.add_argument("--customers", type=int, default=1000000)
+    parser.add_argument("--agents", type=int, default=2000)
+    parser.add_argument("--supervisors", type=int, default=100)
+    parser.add_argument("--reports-per-supervisor", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic database afterwards")
+    args = parser.parse_args()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    db_pool.set_db_path(args.db)
+    connection = db_pool.get_connection()
+
+    run_migrations(connection, target_version=1)
+    print(f"Populating {args.customers:,} customers...")
+    start = time.perf_counter()
+    populate(connection, args.customers, args.agents, args.supervisors, args.reports_per_supervisor)
+    print(f"Populated in {time.perf_counter() - start:.1f}s")
+
+    report(connection, "schema v1 (no secondary indexes)", args.agents, args.supervisors, args.iterations)
+
+    start = time.perf_counter()
+    run_migrations(connection)
+    print(f"\nMigrated to v{LATEST_VERSION} in {time.perf_counter() - start:.1f}s")
+
+    report(connection, f"schema v{LATEST_VERSION} (with indexes)", args.agents, args.supervisors, args.iterations)
+
+    db_pool.close_all()
+    if not args.keep:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures what prediction monitoring adds to a single prediction: the time of
+PredictionMonitor.record() alone, and make_prediction-style scoring of one customer
+with and without a monitor (with the served model also run as the shadow model,
+the worst case). The log is written to a scratch directory.
+
+Usage:
+    python benchmark_monitoring.py --requests 5000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_scoring import synthetic_customers
+from model_monitoring import PredictionMonitor
+from model_registry import get_model
+from scoring_engine import RecoveryScorer, load_encoders
+
+
+def time_calls(function, count):
+    timings = np.empty(count)
+    for i in range(count):
+        start = time.perf_counter()
+        function(i)
+        timings[i] = (time.perf_counter() - start) * 1e6
+    return timings
+
+
+def report(label, timings):
+    print(f"{label:<28} mean {timings.mean():8.1f}us   p99 {np.percentile(timings, 99):8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    import prediction_utils  # registers the recovery model
+
+    model = get_model("recovery_model")
+    if model is None:
+        raise SystemExit("No recovery model found; run train_model.py first.")
+    encoders = load_encoders()
+    categorical_sizes = {col: len(categories) for col, categories in encoders["categories"].items()}
+    customers = synthetic_customers(args.requests, np.random.default_rng(42))
+
+    log_dir = tempfile.mkdtemp(prefix="prediction_log_")
+    try:
+        plain = RecoveryScorer(model, encoders)
+        monitor = PredictionMonitor(plain.feature_columns, categorical_sizes, log_dir=log_dir,
+                                    shadow_predict=plain.predict_proba_matrix)
+        monitored = RecoveryScorer(model, encoders, monitor)
+
+        matrix = plain.build_matrix(customers)
+        probabilities = plain.predict_proba_matrix(matrix)
+        for scorer in (plain, monitored):
+            time_calls(lambda i: scorer.predict_proba([customers[i]]), 200)  # warm up
+
+        report("record() only", time_calls(lambda i: monitor.record(matrix[i:i + 1], probabilities[i:i + 1]), args.requests))
+        baseline = time_calls(lambda i: plain.predict_proba([customers[i]]), args.requests)
+        with_monitor = time_calls(lambda i: monitored.predict_proba([customers[i]]), args.requests)
+        report("predict without monitor", baseline)
+        report("predict with monitor", with_monitor)
+        print(f"{'overhead per prediction':<28} mean {with_monitor.mean() - baseline.mean():8.1f}us")
+
+        monitor.flush()
+        stats = monitor.stats()
+        print(f"\nLogged {stats['logged_rows']:,} rows, dropped {stats['dropped_rows']:,}; "
+              f"max PSI {stats['drift']['max_psi']}; shadow {stats['shadow']}")
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Latency of the recovery model's serving formats on an already-built feature matrix:
+
+  pickle   XGBClassifier.predict_proba (the sklearn wrapper)
+  native   bare xgboost.Booster loaded from UBJ, inplace_predict
+  numpy    NumpyTreeEnsemble from the JSON export, no xgboost at all
+
+Reports mean and p99 for single-row predictions (one webhook request) and the time
+for one batch (priority plans, risk_score_job.py). Run
+check_predictor_parity.py --export first if the UBJ/JSON files do not exist yet.
+
+Usage:
+    python benchmark_predictor.py --single 2000 --batch 10000
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import xgboost as xgb
+
+from benchmark_scoring import synthetic_customers
+from prediction_utils import RECOVERY_MODEL_FILES
+from scoring_engine import RecoveryScorer, load_encoders
+from tree_predictor import NumpyTreeEnsemble
+
+
+def single_row_latency(predict, matrix, count):
+    timings = []
+    for i in range(count):
+        row = matrix[i % len(matrix):i % len(matrix) + 1]
+        start = time.perf_counter()
+        predict(row)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return sum(timings) / len(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+def batch_latency(predict, matrix, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(matrix)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--single", type=int, default=2000, help="number of single-row predictions")
+    parser.add_argument("--batch", type=int, default=10000, help="rows in the batch")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    model = joblib.load(RECOVERY_MODEL_FILES["pickle"])
+    booster = xgb.Booster()
+    booster.load_model(RECOVERY_MODEL_FILES["native"])
+    predictors = {
+        "pickle": lambda matrix: model.predict_proba(matrix)[:, 1],
+        "native": RecoveryScorer(booster, load_encoders()).predict_proba_matrix,
+        "numpy": NumpyTreeEnsemble.from_json(RECOVERY_MODEL_FILES["numpy"]).predict_proba_matrix,
+    }
+
+    scorer = RecoveryScorer(model, load_encoders())
+    matrix = scorer.build_matrix(synthetic_customers(args.batch, np.random.default_rng(args.seed)))
+
+    print(f"{'format':<8} {'1-row mean us':>14} {'1-row p99 us':>13} {f'{args.batch}-row ms':>12}")
+    for name, predict in predictors.items():
+        predict(matrix[:1])  # warm up
+        mean_us, p99_us = single_row_latency(predict, matrix, args.single)
+        batch_ms = batch_latency(predict, matrix, args.repeats)
+        print(f"{name:<8} {mean_us:>14.0f} {p99_us:>13.0f} {batch_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Recall vs latency of the approximate FAISS indexes (IVF, HNSW) against the exact
+flat index, at the sizes the sensitive-example bank is expected to reach.
+
+Vectors are synthetic: unit-normalised points scattered around random cluster
+centres, with the same dimension as all-MiniLM-L6-v2, so no model is needed.
+Recall@1 is the share of queries whose nearest neighbour matches the flat index.
+
+Usage:
+    python benchmark_rag_index.py --examples 10000 50000 --queries 1000
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from sensitive_utils.rag_faiss import build_faiss_index
+
+
+def synthetic_vectors(count, dim, clusters, rng):
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=count)
+    vectors = centres[assignment] + 0.3 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def time_search(index, queries):
+    """Returns (nearest ids, mean ms per single-vector query)."""
+    start = time.perf_counter()
+    ids = np.empty(len(queries), dtype=np.int64)
+    for i in range(len(queries)):
+        _, found = index.search(queries[i:i + 1], 1)
+        ids[i] = found[0][0]
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)  # the webhook searches one message at a time
+    rng = np.random.default_rng(args.seed)
+
+    for count in args.examples:
+        clusters = max(10, count // 200)
+        vectors = synthetic_vectors(count, args.dim, clusters, rng)
+        queries = synthetic_vectors(args.queries, args.dim, clusters, rng)
+        print(f"\n=== {count:,} examples, {args.queries:,} queries ===")
+        print(f"{'index':<24} {'build s':>8} {'ms/query':>9} {'recall@1':>9}")
+
+        start = time.perf_counter()
+        flat = build_faiss_index(vectors, "flat")
+        build_seconds = time.perf_counter() - start
+        truth, flat_ms = time_search(flat, queries)
+        print(f"{'flat':<24} {build_seconds:>8.2f} {flat_ms:>9.3f} {1.0:>9.3f}")
+
+        start = time.perf_counter()
+        ivf = build_faiss_index(vectors, "ivf")
+        build_seconds = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            found, ms = time_search(ivf, queries)
+            print(f"{f'ivf nlist={ivf.nlist} nprobe={nprobe}':<24} {build_seconds:>8.2f} {ms:>9.3f} {np.mean(found == truth):>9.3f}")
+
+        start = time.perf_counter()
+        hnsw = build_faiss_index(vectors, "hnsw")
+        build_seconds = time.perf_counter() - start
+        for ef_search in args.ef_search:
+            hnsw.hnsw.efSearch = ef_search
+            found, ms = time_search(hnsw, queries)
+            print(f"{f'hnsw efSearch={ef_search}':<24} {build_seconds:>8.2f} {ms:>9.3f} {np.mean(found == truth):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
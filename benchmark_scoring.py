@@ -0,0 +1,100 @@
+"""
+Rows per second of the recovery-model scoring paths.
+
+  legacy-row   one-row DataFrame + freshly fitted LabelEncoders per customer
+               (the old make_prediction)
+  legacy-batch one DataFrame per batch, LabelEncoders fitted on the batch
+               (the old generate_model_based_plan)
+  engine       RecoveryScorer: saved encoders, preallocated float32 matrix,
+               one booster call per batch
+
+Customers are synthetic but drawn from the training categories, so the model
+in recovery_model.pkl is used as-is.
+
+Usage:
+    python benchmark_scoring.py --rows 100 1000 10000
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from scoring_engine import DEFAULT_CATEGORIES, FEATURE_COLUMNS, RecoveryScorer, load_encoders
+
+NUMERIC_RANGES = {
+    'Age': (18, 70), 'Income': (15000, 150000), 'LoanAmount': (5000, 250000),
+    'CreditScore': (300, 850), 'MonthsEmployed': (0, 120), 'NumCreditLines': (1, 5),
+    'InterestRate': (2, 25), 'LoanTerm': (12, 60), 'DTIRatio': (0.1, 0.9),
+}
+
+
+def synthetic_customers(count, rng):
+    rows = []
+    for i in range(count):
+        row = {"customer_name": f"Customer {i}", "account_number": f"ACC{i}"}
+        for col, (low, high) in NUMERIC_RANGES.items():
+            row[col] = float(rng.uniform(low, high))
+        for col, categories in DEFAULT_CATEGORIES.items():
+            row[col] = categories[rng.integers(len(categories))]
+        rows.append(row)
+    return rows
+
+
+def legacy_row(model, rows):
+    for row in rows:
+        df = pd.DataFrame([row], columns=FEATURE_COLUMNS)
+        for col in df.select_dtypes(include=['object']).columns:
+            df[col] = LabelEncoder().fit_transform(df[col])
+        model.predict(df)
+        model.predict_proba(df)
+
+
+def legacy_batch(model, rows):
+    df = pd.DataFrame(rows)
+    for col in df.select_dtypes(include=['object']).columns:
+        df[col] = LabelEncoder().fit_transform(df[col])
+    model.predict_proba(df[FEATURE_COLUMNS])
+
+
+def engine_batch(scorer, rows):
+    scorer.predict_proba(rows)
+
+
+def rows_per_second(fn, target, rows, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(target, rows)
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--model", default="recovery_model.pkl")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-legacy-row", type=int, default=1000,
+                        help="skip the per-row legacy path above this many rows (it is very slow)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    scorer = RecoveryScorer(model, load_encoders())
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'rows':>7} {'legacy-row':>12} {'legacy-batch':>13} {'engine':>12} {'speedup':>8}")
+    for count in args.rows:
+        rows = synthetic_customers(count, rng)
+        row_rate = rows_per_second(legacy_row, model, rows, 1) if count <= args.max_legacy_row else float("nan")
+        batch_rate = rows_per_second(legacy_batch, model, rows, args.repeats)
+        engine_rate = rows_per_second(engine_batch, scorer, rows, args.repeats)
+        print(f"{count:>7} {row_rate:>12,.0f} {batch_rate:>13,.0f} {engine_rate:>12,.0f} {engine_rate / batch_rate:>7.1f}x")
+    print("(rows/s; speedup is engine vs legacy-batch)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compares the in-memory and out-of-core training modes of train_model.py on a
+synthetic loan_default.csv of the requested size, printing the wall time and
+peak RSS of every stage.
+
+Each run happens in a subprocess inside a scratch directory, so the model files
+in the repository are not overwritten and each mode's peak memory is measured on
+its own. Pass --skip-in-memory for datasets that do not fit in RAM.
+
+Usage:
+    python benchmark_training.py --rows 1000000 --chunk-size 200000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from scoring_engine import DEFAULT_CATEGORIES
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+WRITE_BATCH = 100000
+
+
+def write_synthetic_dataset(path, rows, seed=42):
+    """Writes a CSV with the loan_default.csv columns, in batches so memory stays flat."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, WRITE_BATCH):
+        count = min(WRITE_BATCH, rows - start)
+        credit_score = rng.integers(300, 850, count)
+        income = rng.integers(15000, 150000, count)
+        batch = pd.DataFrame({
+            'LoanID': [f"L{i:010d}" for i in range(start, start + count)],
+            'Age': rng.integers(18, 70, count),
+            'Income': income,
+            'LoanAmount': rng.integers(5000, 250000, count),
+            'CreditScore': credit_score,
+            'MonthsEmployed': rng.integers(0, 120, count),
+            'NumCreditLines': rng.integers(1, 5, count),
+            'InterestRate': rng.uniform(2, 25, count).round(2),
+            'LoanTerm': rng.choice([12, 24, 36, 48, 60], count),
+            'DTIRatio': rng.uniform(0.1, 0.9, count).round(2),
+            **{col: rng.choice(categories, count) for col, categories in DEFAULT_CATEGORIES.items()},
+        })
+        risk = 1 / (1 + np.exp((credit_score - 550) / 80 + (income - 60000) / 40000))
+        batch['Default'] = (rng.random(count) < risk).astype(int)
+        batch.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def run_mode(data_path, work_dir, out_of_core, chunk_size):
+    reports_dir = os.path.join(work_dir, "reports")
+    command = [sys.executable, os.path.join(REPO_DIR, "train_model.py"), "--data", data_path, "--reports-dir", reports_dir]
+    if out_of_core:
+        command += ["--out-of-core", "--chunk-size", str(chunk_size)]
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    subprocess.run(command, cwd=work_dir, env=env, check=True, stdout=subprocess.DEVNULL)
+    with open(os.path.join(reports_dir, "metrics.json")) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=200000)
+    parser.add_argument("--skip-in-memory", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory (dataset, models, reports)")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="training_bench_")
+    data_path = os.path.join(scratch, "loan_default.csv")
+    print(f"Writing {args.rows:,} synthetic rows to {data_path}...")
+    write_synthetic_dataset(data_path, args.rows)
+    print(f"Dataset size: {os.path.getsize(data_path) / 2 ** 20:.0f} MB")
+
+    modes = [("out-of-core", True)] if args.skip_in_memory else [("in-memory", False), ("out-of-core", True)]
+    for label, out_of_core in modes:
+        work_dir = os.path.join(scratch, label)
+        os.makedirs(work_dir)
+        metrics = run_mode(data_path, work_dir, out_of_core, args.chunk_size)
+        print(f"\n=== {label}: accuracy {metrics['accuracy']}, ROC AUC {metrics['roc_auc']} ===")
+        print(f"{'stage':<14} {'seconds':>9} {'peak RSS MB':>12}")
+        for record in metrics["stages"]:
+            print(f"{record['stage']:<14} {record['seconds']:>9.2f} {record['peak_rss_mb']:>12.1f}")
+
+    if args.keep:
+        print(f"\nScratch directory kept at {scratch}")
+    else:
+        import shutil
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
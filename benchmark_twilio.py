@@ -0,0 +1,118 @@
+"""
+Load-tests the outbound Twilio path against fake_twilio.py.
+
+Starts the stub server in a subprocess, queues --messages sends spread over
+--recipients numbers through twilio_utils.send_whatsapp_message, waits for the
+send queue to drain and reports the throughput, retries and failures. It then
+checks that the stub received every message exactly once and in order for each
+recipient. The stub can add latency, 503s and 429s to exercise the retries.
+
+--compare-unpooled also times sequential sends made the old way (a new connection
+per request) against the pooled session.
+
+Usage:
+    python benchmark_twilio.py --messages 5000 --recipients 50 --rate 0 --error-rate 0.02
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(port, latency_ms, error_rate, max_rps):
+    command = [sys.executable, os.path.join(REPO_DIR, "fake_twilio.py"), "--port", str(port),
+               "--latency-ms", str(latency_ms), "--error-rate", str(error_rate), "--max-rps", str(max_rps)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{base_url}/stats", timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("fake_twilio.py did not start")
+
+
+def compare_unpooled(transport, base_url, count):
+    url = f"{base_url}/2010-04-01/Accounts/AC_test/Messages.json"
+    data = {"From": "whatsapp:+10000000000", "To": "whatsapp:+19999999999", "Body": "compare"}
+    start = time.perf_counter()
+    for _ in range(count):
+        requests.post(url, data=data, auth=("AC_test", "token"), headers={"Connection": "close"})
+    unpooled = (time.perf_counter() - start) / count * 1000
+    start = time.perf_counter()
+    for _ in range(count):
+        transport.send_message(data["From"], data["To"], data["Body"])
+    pooled = (time.perf_counter() - start) / count * 1000
+    print(f"Sequential send: new connection {unpooled:.2f} ms, pooled session {pooled:.2f} ms")
+    requests.delete(f"{base_url}/messages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--recipients", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=0, help="send rate limit in messages/s (0: unlimited)")
+    parser.add_argument("--workers", type=int, default=8, help="send queue workers")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-rps", type=int, default=0)
+    parser.add_argument("--compare-unpooled", type=int, default=0, metavar="N", help="also time N sequential sends each way")
+    args = parser.parse_args()
+
+    process, base_url = start_stub(free_port(), args.latency_ms, args.error_rate, args.max_rps)
+    try:
+        # twilio_utils reads its settings at import time.
+        os.environ.update({
+            "TWILIO_API_BASE_URL": base_url, "TWILIO_ACCOUNT_SID": "AC_test", "TWILIO_AUTH_TOKEN": "token",
+            "TWILIO_SEND_RATE": str(args.rate), "TWILIO_SEND_WORKERS": str(args.workers),
+            "TWILIO_SEND_QUEUE_SIZE": str(args.messages), "TWILIO_BACKOFF_BASE": "0.05",
+        })
+        sys.path.insert(0, REPO_DIR)
+        import twilio_utils
+
+        if args.compare_unpooled:
+            compare_unpooled(twilio_utils.transport, base_url, args.compare_unpooled)
+
+        recipients = [f"whatsapp:+1555{i:07d}" for i in range(args.recipients)]
+        start = time.perf_counter()
+        for i in range(args.messages):
+            twilio_utils.send_whatsapp_message(recipients[i % len(recipients)], f"{i}")
+        queued = time.perf_counter() - start
+        twilio_utils.send_queue.join()
+        elapsed = time.perf_counter() - start
+
+        stats = twilio_utils.twilio_stats()
+        print(f"\nQueued {args.messages:,} messages in {queued * 1000:.0f} ms "
+              f"({queued / args.messages * 1e6:.1f} us per call on the request thread)")
+        print(f"Delivered in {elapsed:.2f} s: {args.messages / elapsed:,.0f} messages/s")
+        print(f"Transport: {stats['transport']}")
+        print(f"Send queue: {stats['send_queue']}")
+
+        received = requests.get(f"{base_url}/messages").json()
+        in_order = all(
+            [int(m["body"]) for m in received if m["to"] == number] == list(range(k, args.messages, len(recipients)))
+            for k, number in enumerate(recipients)
+        )
+        print(f"Stub: {requests.get(f'{base_url}/stats').json()}")
+        print(f"Received {len(received):,} of {args.messages:,}; in order per recipient: {in_order}")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
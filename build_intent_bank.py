@@ -0,0 +1,114 @@
+"""
+Builds and evaluates the example bank used by the embedding intent classifier.
+
+build:    labels historical messages with Gemini and writes them to the bank.
+          The input is a text file with one (already masked) message per line.
+              python build_intent_bank.py build --messages messages.txt --out intent_examples.json
+
+evaluate: holds out part of a labelled bank, classifies the held-out messages
+          against the rest and reports agreement with the Gemini labels, the share
+          of messages answered locally at the runtime confidence threshold, and latency.
+              python build_intent_bank.py evaluate --bank intent_examples.json
+"""
+import argparse
+import json
+import random
+import time
+from collections import Counter
+
+from model_registry import get_model
+from nlu_embeddings import EmbeddingIntentClassifier, NLU_EMBEDDINGS_MIN_CONFIDENCE, load_intent_bank
+from nlu_utils import KNOWN_INTENTS, get_intent_from_llm
+
+
+def build(messages_path, out_path, sleep_seconds):
+    with open(messages_path) as f:
+        messages = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+    examples = []
+    for i, message in enumerate(messages, start=1):
+        intent, _ = get_intent_from_llm(message)
+        if intent in KNOWN_INTENTS:
+            examples.append({"text": message, "intent": intent})
+        if i % 50 == 0:
+            print(f"  labelled {i} / {len(messages)}")
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+
+    with open(out_path, "w") as f:
+        json.dump(examples, f, indent=2)
+    print(f"Wrote {len(examples)} labelled examples to {out_path}")
+    print(Counter(x["intent"] for x in examples).most_common())
+
+
+def evaluate(bank_path, holdout_fraction, threshold, seed):
+    texts, intents = load_intent_bank(bank_path, KNOWN_INTENTS)
+    order = list(range(len(texts)))
+    random.Random(seed).shuffle(order)
+    split = int(len(order) * (1 - holdout_fraction))
+    train, test = order[:split], order[split:]
+    if not train or not test:
+        raise SystemExit("Not enough examples to split into a bank and a held-out set.")
+
+    encoder = get_model("sensitive_rag").model
+    classifier = EmbeddingIntentClassifier([texts[i] for i in train], [intents[i] for i in train], encoder)
+
+    # Time single-message predictions, which is what the webhook does.
+    predictions = []
+    latencies_ms = []
+    for i in test:
+        start = time.perf_counter()
+        predictions.append(classifier.predict(texts[i]))
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    gold = [intents[i] for i in test]
+    agree_all = sum(p == g for (p, _), g in zip(predictions, gold))
+    confident = [(p, g) for (p, c), g in zip(predictions, gold) if p and c >= threshold]
+    agree_confident = sum(p == g for p, g in confident)
+    latencies_ms.sort()
+
+    print(f"Bank: {len(train)} examples, held out: {len(test)}")
+    print(f"Agreement with Gemini (all held-out):      {agree_all / len(test):.3f}")
+    print(f"Answered locally at confidence >= {threshold}: {len(confident) / len(test):.3f}")
+    if confident:
+        print(f"Agreement on locally answered messages:    {agree_confident / len(confident):.3f}")
+    print(f"Latency per message: mean {sum(latencies_ms) / len(latencies_ms):.2f} ms, "
+          f"p95 {latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))]:.2f} ms")
+
+    print("\nPer intent (gold label: agreement / count):")
+    per_intent = Counter(gold)
+    for intent, count in per_intent.most_common():
+        correct = sum(p == g for (p, _), g in zip(predictions, gold) if g == intent)
+        print(f"  {intent:<22} {correct / count:.3f} / {count}")
+
+    mistakes = Counter((g, p) for (p, _), g in zip(predictions, gold) if p != g)
+    if mistakes:
+        print("\nMost common disagreements (gemini -> local):")
+        for (g, p), count in mistakes.most_common(10):
+            print(f"  {g} -> {p}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--messages", required=True)
+    build_parser.add_argument("--out", default="intent_examples.json")
+    build_parser.add_argument("--sleep", type=float, default=0.0, help="pause between Gemini calls (rate limits)")
+
+    evaluate_parser = subparsers.add_parser("evaluate")
+    evaluate_parser.add_argument("--bank", default="intent_examples.json")
+    evaluate_parser.add_argument("--holdout", type=float, default=0.2)
+    evaluate_parser.add_argument("--threshold", type=float, default=NLU_EMBEDDINGS_MIN_CONFIDENCE)
+    evaluate_parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build(args.messages, args.out, args.sleep)
+    else:
+        evaluate(args.bank, args.holdout, args.threshold, args.seed)
+
+
+if __name__ == "__main__":
+    main()
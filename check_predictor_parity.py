@@ -0,0 +1,75 @@
+"""
+Checks that the native booster (UBJ) and the NumPy tree predictor (JSON) produce the
+same probabilities as the pickled sklearn model, on synthetic customers with and
+without missing values. Reports the largest difference and the share of rows that
+are bit-identical, and exits with status 1 unless every probability is exactly equal.
+
+The native booster is expected to pass. The NumPy predictor reproduces XGBoost's
+margins but its final sigmoid can differ in the last float32 bit, which is why it is
+opt-in (RECOVERY_MODEL_FORMAT=numpy) rather than the default.
+
+With --export the UBJ/JSON files are first written from the pickle (for models
+trained before train_model.py exported them).
+
+Usage:
+    python check_predictor_parity.py [--export] [--rows 10000] [--predictor native]
+"""
+import argparse
+import sys
+
+import joblib
+import numpy as np
+import xgboost as xgb
+
+from benchmark_scoring import synthetic_customers
+from prediction_utils import RECOVERY_MODEL_FILES
+from scoring_engine import RecoveryScorer, load_encoders
+from tree_predictor import NumpyTreeEnsemble, export_booster
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--export", action="store_true", help="write the UBJ and JSON exports from the pickle first")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--missing-rate", type=float, default=0.05, help="share of values replaced by NaN in the second pass")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--predictor", choices=("all", "native", "numpy"), default="all",
+                        help="check only this predictor (e.g. native, the one served by default)")
+    args = parser.parse_args()
+
+    model = joblib.load(RECOVERY_MODEL_FILES["pickle"])
+    if args.export:
+        json_path, ubj_path = export_booster(model, RECOVERY_MODEL_FILES["numpy"], RECOVERY_MODEL_FILES["native"])
+        print(f"Exported '{ubj_path}' and '{json_path}'.")
+
+    booster = xgb.Booster()
+    booster.load_model(RECOVERY_MODEL_FILES["native"])
+    predictors = {
+        "native": RecoveryScorer(booster, load_encoders()),
+        "numpy": RecoveryScorer(NumpyTreeEnsemble.from_json(RECOVERY_MODEL_FILES["numpy"]), load_encoders()),
+    }
+    if args.predictor != "all":
+        predictors = {args.predictor: predictors[args.predictor]}
+    reference = RecoveryScorer(model, load_encoders())
+
+    rng = np.random.default_rng(args.seed)
+    matrix = reference.build_matrix(synthetic_customers(args.rows, rng))
+    with_missing = matrix.copy()
+    with_missing[rng.random(matrix.shape) < args.missing_rate] = np.nan
+
+    failed = False
+    for label, features in (("complete rows", matrix), ("rows with missing values", with_missing)):
+        expected = model.predict_proba(features)[:, 1]
+        for name, scorer in predictors.items():
+            actual = scorer.predict_proba_matrix(features)
+            max_diff = float(np.max(np.abs(actual - expected)))
+            identical = float(np.mean(actual == expected))
+            ok = bool(np.array_equal(actual, expected))
+            failed |= not ok
+            print(f"{label:<26} {name:<7} max |diff| {max_diff:.3g}  bit-identical {identical:.2%}  {'OK' if ok else 'MISMATCH'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Per-user conversation state (last_account_viewed, next_action, ...) for the webhook.
+
+Two interchangeable backends, chosen with CONVERSATION_STATE_BACKEND:
+  - "sqlite" (default): a SQLite file shared by every gunicorn worker and kept across
+    restarts. Each context is stored as compact JSON.
+  - "memory": an in-process LRU. Only suitable for a single worker.
+Both expire a context CONVERSATION_STATE_TTL_SECONDS after it was last saved. get()
+returns a copy: changes take effect when the context is passed to set().
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CONVERSATION_STATE_BACKEND = os.getenv("CONVERSATION_STATE_BACKEND", "sqlite")
+CONVERSATION_STATE_DB_PATH = os.getenv("CONVERSATION_STATE_DB_PATH", "conversation_state.db")
+CONVERSATION_STATE_MAX_ENTRIES = int(os.getenv("CONVERSATION_STATE_MAX_ENTRIES", "10000"))
+CONVERSATION_STATE_TTL_SECONDS = float(os.getenv("CONVERSATION_STATE_TTL_SECONDS", str(24 * 3600)))
+
+_PURGE_INTERVAL_SECONDS = 300.0
+
+
+class ConversationStateStore:
+    """Interface of the conversation state backends."""
+    name = "base"
+
+    def get(self, user_id):
+        """Returns the user's context as a new dict ({} if there is none or it expired)."""
+        raise NotImplementedError
+
+    def set(self, user_id, context):
+        """Saves the context; an empty context removes the user's entry."""
+        raise NotImplementedError
+
+    def delete(self, user_id):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class InMemoryConversationStore(ConversationStateStore):
+    """Bounded LRU with a TTL, private to this process."""
+    name = "memory"
+
+    def __init__(self, max_entries=CONVERSATION_STATE_MAX_ENTRIES, ttl_seconds=CONVERSATION_STATE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # user_id -> (expires_at, context)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, user_id):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    self._stats["hits"] += 1
+                    return dict(entry[1])
+                del self._entries[user_id]
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return {}
+
+    def set(self, user_id, context):
+        if not context:
+            self.delete(user_id)
+            return
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (time.time() + self.ttl_seconds, dict(context))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats.update(backend=self.name, max_entries=self.max_entries, ttl_seconds=self.ttl_seconds)
+        return stats
+
+
+class SQLiteConversationStore(ConversationStateStore):
+    """Shared by every process using the same file; expired rows are purged every few minutes."""
+    name = "sqlite"
+
+    def __init__(self, db_path=CONVERSATION_STATE_DB_PATH, ttl_seconds=CONVERSATION_STATE_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._stats = {"hits": 0, "misses": 0, "purged": 0, "errors": 0}
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_state (
+                    user_id TEXT PRIMARY KEY,
+                    context BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self._local.connection = connection
+        return connection
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _purge_expired(self, now):
+        with self._lock:
+            if now - self._last_purge < _PURGE_INTERVAL_SECONDS:
+                return
+            self._last_purge = now
+        cursor = self._connection().execute("DELETE FROM conversation_state WHERE expires_at <= ?", (now,))
+        self._count("purged", cursor.rowcount)
+
+    def get(self, user_id):
+        now = time.time()
+        try:
+            self._purge_expired(now)
+            row = self._connection().execute(
+                "SELECT context FROM conversation_state WHERE user_id = ? AND expires_at > ?", (user_id, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            # Losing context is better than failing the message.
+            print(f"Conversation state read error: {e}")
+            self._count("errors")
+            return {}
+        if row is None:
+            self._count("misses")
+            return {}
+        self._count("hits")
+        return json.loads(row[0])
+
+    def set(self, user_id, context):
+        if not context:
+            self.delete(user_id)
+            return
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO conversation_state (user_id, context, expires_at) VALUES (?, ?, ?)",
+                (user_id, json.dumps(context, separators=(",", ":")).encode("utf-8"), time.time() + self.ttl_seconds),
+            )
+        except sqlite3.Error as e:
+            print(f"Conversation state write error: {e}")
+            self._count("errors")
+
+    def delete(self, user_id):
+        try:
+            self._connection().execute("DELETE FROM conversation_state WHERE user_id = ?", (user_id,))
+        except sqlite3.Error as e:
+            print(f"Conversation state write error: {e}")
+            self._count("errors")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(backend=self.name, ttl_seconds=self.ttl_seconds)
+        return stats
+
+
+def create_conversation_store(backend=None):
+    backend = backend or CONVERSATION_STATE_BACKEND
+    if backend == "memory":
+        return InMemoryConversationStore()
+    if backend == "sqlite":
+        return SQLiteConversationStore()
+    raise ValueError(f"Unknown CONVERSATION_STATE_BACKEND '{backend}' (expected 'sqlite' or 'memory').")
@@ -1,5 +1,4 @@
 import os
-import sqlite3
 from flask import Flask, render_template, request, redirect, url_for, session
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
@@ -7,7 +6,7 @@ from wtforms.validators import DataRequired
 import bcrypt
 
 # --- 1. IMPORT THE MISSING FUNCTIONS ---
-from db_utils import get_pending_reports_for_supervisor, submit_supervisor_decision
+from db_utils import get_pending_reports_for_supervisor, submit_supervisor_decision, get_supervisor_credentials, get_agent_name
 from twilio_utils import send_whatsapp_message # <-- ADD THIS IMPORT
 
 app = Flask(__name__)
@@ -27,25 +26,14 @@ def login():
     form = LoginForm()
     error = None  # Add this line
     if form.validate_on_submit():
-        conn = sqlite3.connect('loan_recovery.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM supervisors WHERE whatsapp_number = ?", (form.whatsapp_number.data,))
-        supervisor = cursor.fetchone()
-        conn.close()
+        supervisor = get_supervisor_credentials(form.whatsapp_number.data)
 
         if supervisor:
             password_bytes = form.password.data.encode('utf-8')
             stored_hash = supervisor['password_hash'].encode('utf-8')
             if bcrypt.checkpw(password_bytes, stored_hash):
                 # Fetch supervisor name from agents table
-                conn = sqlite3.connect('loan_recovery.db')
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("SELECT agent_name FROM agents WHERE whatsapp_number = ?", (form.whatsapp_number.data,))
-                agent_row = cursor.fetchone()
-                conn.close()
-                supervisor_name = agent_row['agent_name'] if agent_row else "Supervisor"
+                supervisor_name = get_agent_name(form.whatsapp_number.data) or "Supervisor"
                 session['supervisor_number'] = supervisor['whatsapp_number']
                 session['supervisor_name'] = supervisor_name
                 return redirect(url_for('dashboard'))
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+
+# Path to the SQLite database. Override with LOAN_DB_PATH for tests or deployments.
+DB_PATH = os.getenv("LOAN_DB_PATH", "loan_recovery.db")
+
+# Pragmas applied to every new connection.
+# WAL lets readers and the single writer proceed concurrently, and NORMAL
+# synchronous is safe under WAL (only the last transaction can be lost on power cut).
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": int(os.getenv("LOAN_DB_CACHE_KB", "-20000")),  # negative = KiB
+    "mmap_size": int(os.getenv("LOAN_DB_MMAP_BYTES", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+BUSY_TIMEOUT_SECONDS = 5.0
+
+_local = threading.local()
+_lock = threading.Lock()
+# id(connection) -> (owning thread, connection). Connections of threads that have exited
+# are closed the next time a connection is opened, so short-lived threads (app.run's
+# threaded server, ad-hoc workers) do not leak a connection and its file descriptors each.
+_all_connections = {}
+
+
+def _open_connection(db_path):
+    # Each connection is still only used by the thread that opened it; check_same_thread
+    # is off so that close_all() and the dead-thread cleanup can close it from elsewhere.
+    connection = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    for name, value in PRAGMAS.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    return connection
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except sqlite3.Error as e:
+        print(f"Error closing database connection: {e}")
+
+
+def _close_dead_thread_connections():
+    with _lock:
+        dead = [key for key, (thread, _) in _all_connections.items() if not thread.is_alive()]
+        connections = [_all_connections.pop(key)[1] for key in dead]
+    for connection in connections:
+        _close_quietly(connection)
+
+
+def get_connection():
+    """
+    Returns the calling thread's connection, opening it on first use.
+    Connections are kept open for the lifetime of the thread and reused by every query.
+    """
+    connection = getattr(_local, "connection", None)
+    if connection is None or getattr(_local, "db_path", None) != DB_PATH:
+        if connection is not None:
+            close_connection()
+        _close_dead_thread_connections()
+        connection = _open_connection(DB_PATH)
+        _local.connection = connection
+        _local.db_path = DB_PATH
+        with _lock:
+            _all_connections[id(connection)] = (threading.current_thread(), connection)
+    return connection
+
+
+def close_connection():
+    """Closes the calling thread's connection, if it has one."""
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        return
+    with _lock:
+        _all_connections.pop(id(connection), None)
+    _close_quietly(connection)
+    _local.connection = None
+    _local.db_path = None
+
+
+def close_all():
+    """Closes every pooled connection (e.g. before a fork or at shutdown)."""
+    with _lock:
+        connections = [connection for _, connection in _all_connections.values()]
+        _all_connections.clear()
+    for connection in connections:
+        _close_quietly(connection)
+    _local.connection = None
+    _local.db_path = None
+
+
+def set_db_path(db_path):
+    """Points the pool at a different database file. Existing connections are reopened lazily."""
+    global DB_PATH
+    DB_PATH = db_path
@@ -1,8 +1,13 @@
-import sqlite3
+from db_pool import get_connection
+from response_cache import llm_cache
+
+# A profile's risk score (r) needs recomputing when there is none, it came from another
+# model version (the single parameter), or the profile (p) changed after it was scored.
+# Shared with risk_score_job.py so the job and the priority-plan fast path agree.
+STALE_SCORE_CONDITION = "(r.account_number IS NULL OR r.model_version != ? OR p.updated_at >= r.scored_at)"
 
 def get_agent_and_customers(agent_number):
-    connection = sqlite3.connect('loan_recovery.db')
-    connection.row_factory = sqlite3.Row
+    connection = get_connection()
     cursor = connection.cursor()
     cursor.execute("SELECT agent_name FROM agents WHERE whatsapp_number = ?", (agent_number,))
     agent = cursor.fetchone()
@@ -10,7 +15,6 @@ def get_agent_and_customers(agent_number):
     if agent:
         cursor.execute("SELECT customer_name, due_amount, account_number, location FROM customers WHERE assigned_agent_number = ?", (agent_number,))
         customers = cursor.fetchall()
-    connection.close()
     return agent, customers
 
 # In db_utils.py
@@ -20,8 +24,7 @@ def get_agent_and_customers(agent_number):
 # In db_utils.py
 
 def get_customer_history(account_number, agent_number):
-    connection = sqlite3.connect('loan_recovery.db')
-    connection.row_factory = sqlite3.Row
+    connection = get_connection()
     cursor = connection.cursor()
     
     # --- THIS IS THE CORRECTED QUERY ---
@@ -39,21 +42,20 @@ def get_customer_history(account_number, agent_number):
     if customer_details:
         customer_details = dict(customer_details)
 
-    connection.close()
     return customer_details
 
 def log_agent_notes(account_number, agent_number, notes):
-    connection = sqlite3.connect('loan_recovery.db')
+    connection = get_connection()
     cursor = connection.cursor()
     cursor.execute("SELECT customer_id FROM customers WHERE account_number = ? AND assigned_agent_number = ?", (account_number, agent_number))
     customer = cursor.fetchone()
     if customer:
         cursor.execute("UPDATE account_history SET agent_notes = ?, status = 'Pending Review' WHERE account_number = ?", (notes, account_number))
         connection.commit()
-        connection.close()
+        # Cached summaries/decisions for this account are now stale
+        llm_cache.invalidate_tag(account_number)
         return True
     else:
-        connection.close()
         return False
 
 # In db_utils.py
@@ -66,8 +68,7 @@ def get_all_data_for_agent(agent_number):
     Fetches all the feature data for every customer assigned to a specific agent,
     ready for the predictive model.
     """
-    connection = sqlite3.connect('loan_recovery.db')
-    connection.row_factory = sqlite3.Row
+    connection = get_connection()
     cursor = connection.cursor()
 
     # --- UPDATED QUERY to fetch all features from the customer_profile table ---
@@ -84,13 +85,39 @@ def get_all_data_for_agent(agent_number):
     ''', (agent_number,))
     
     all_data = cursor.fetchall()
-    connection.close()
     
     return [dict(row) for row in all_data]
 
+def get_ranked_customers_for_agent(agent_number, model_version):
+    """
+    Returns the agent's customers with their precomputed risk score, highest first,
+    if every one of them has a current score from model_version. Returns an empty
+    list if any score is missing or stale (see STALE_SCORE_CONDITION), or if the
+    agent has no customers; the caller then scores the portfolio live.
+    """
+    connection = get_connection()
+    cursor = connection.cursor()
+
+    cursor.execute(f'''
+        SELECT c.customer_name, c.account_number, r.risk_score
+        FROM customers c
+        JOIN customer_profile p ON c.account_number = p.account_number
+        JOIN risk_scores r ON c.account_number = r.account_number
+        WHERE c.assigned_agent_number = ?
+          AND NOT EXISTS (
+              SELECT 1
+              FROM customers c
+              JOIN customer_profile p ON c.account_number = p.account_number
+              LEFT JOIN risk_scores r ON c.account_number = r.account_number
+              WHERE c.assigned_agent_number = ? AND {STALE_SCORE_CONDITION}
+          )
+        ORDER BY r.risk_score DESC
+    ''', (agent_number, agent_number, model_version))
+
+    return [dict(row) for row in cursor.fetchall()]
+
 def get_full_case_details(account_number, supervisor_number):
-    connection = sqlite3.connect('loan_recovery.db')
-    connection.row_factory = sqlite3.Row
+    connection = get_connection()
     cursor = connection.cursor()
 
     cursor.execute('''
@@ -102,7 +129,6 @@ def get_full_case_details(account_number, supervisor_number):
     ''', (account_number, supervisor_number))
     
     details = cursor.fetchone()
-    connection.close()
     return details
 
 # In db_utils.py
@@ -111,7 +137,7 @@ def create_communication_record(account_number, agent_number, supervisor_number,
     """
     Creates a new record in the communications table for a supervisor to review.
     """
-    connection = sqlite3.connect('loan_recovery.db')
+    connection = get_connection()
     cursor = connection.cursor()
 
     try:
@@ -123,9 +149,8 @@ def create_communication_record(account_number, agent_number, supervisor_number,
         success = True
     except Exception as e:
         print(f"Database Error creating communication record: {e}")
+        connection.rollback()
         success = False
-    finally:
-        connection.close()
     
     return success
 
@@ -135,8 +160,7 @@ def get_pending_reports_for_supervisor(supervisor_number):
     """
     Fetches all communication records with a 'Pending' status for a specific supervisor.
     """
-    connection = sqlite3.connect('loan_recovery.db')
-    connection.row_factory = sqlite3.Row
+    connection = get_connection()
     cursor = connection.cursor()
     
     cursor.execute('''
@@ -146,7 +170,6 @@ def get_pending_reports_for_supervisor(supervisor_number):
     ''', (supervisor_number,))
     
     reports = cursor.fetchall()
-    connection.close()
     return reports
 
 # In db_utils.py
@@ -156,8 +179,7 @@ def submit_supervisor_decision(comm_id, decision):
     Updates a communication record with the supervisor's decision, sets the 
     status to 'Resolved', and returns the details needed for notification.
     """
-    connection = sqlite3.connect('loan_recovery.db')
-    connection.row_factory = sqlite3.Row
+    connection = get_connection()
     cursor = connection.cursor()
 
     # Get the original agent's number and account number before updating
@@ -165,7 +187,6 @@ def submit_supervisor_decision(comm_id, decision):
     comm_details = cursor.fetchone()
 
     if not comm_details:
-        connection.close()
         return None, None # Return nothing if the report ID is invalid
 
     try:
@@ -179,11 +200,11 @@ def submit_supervisor_decision(comm_id, decision):
         success = True
     except Exception as e:
         print(f"Database Error submitting decision: {e}")
+        connection.rollback()
         success = False
-    finally:
-        connection.close()
     
     if success:
+        llm_cache.invalidate_tag(comm_details['account_number'])
         return comm_details['agent_number'], comm_details['account_number']
     else:
         return None, None
@@ -195,19 +216,17 @@ def submit_supervisor_decision(comm_id, decision):
 
 def get_supervisor_for_agent(agent_number):
     """Fetches the supervisor's number for a given agent."""
-    connection = sqlite3.connect('loan_recovery.db')
+    connection = get_connection()
     cursor = connection.cursor()
     cursor.execute("SELECT supervisor_number FROM agents WHERE whatsapp_number = ?", (agent_number,))
     supervisor_info = cursor.fetchone()
-    connection.close()
     if supervisor_info:
         return supervisor_info[0]
     return None
 
 def get_triage_details(account_number):
     """Fetches the necessary details for the triage logic, including the credit score."""
-    connection = sqlite3.connect('loan_recovery.db')
-    connection.row_factory = sqlite3.Row
+    connection = get_connection()
     cursor = connection.cursor()
 
     cursor.execute('''
@@ -218,7 +237,6 @@ def get_triage_details(account_number):
     ''', (account_number,))
     
     details = cursor.fetchone()
-    connection.close()
     
     if details:
         return dict(details)
@@ -227,7 +245,7 @@ def get_triage_details(account_number):
 # --- NEW: Function to save the AI's decision ---
 def save_ai_decision(account_number, decision):
     """Saves the AI's decision to the database and resolves the case."""
-    connection = sqlite3.connect('loan_recovery.db')
+    connection = get_connection()
     cursor = connection.cursor()
     try:
         cursor.execute('''
@@ -239,9 +257,8 @@ def save_ai_decision(account_number, decision):
         success = True
     except Exception as e:
         print(f"Database Error saving AI decision: {e}")
+        connection.rollback()
         success = False
-    finally:
-        connection.close()
     return success
 
 # In db_utils.py
@@ -252,8 +269,7 @@ def get_data_for_prediction(account_number):
     """
     Fetches all the feature data for a single customer, ready for the predictive model.
     """
-    connection = sqlite3.connect('loan_recovery.db')
-    connection.row_factory = sqlite3.Row
+    connection = get_connection()
     cursor = connection.cursor()
 
     # --- UPDATED QUERY to fetch the correct columns from the new profile table ---
@@ -268,8 +284,27 @@ def get_data_for_prediction(account_number):
     ''', (account_number,))
     
     data = cursor.fetchone()
-    connection.close()
     
     if data:
         return dict(data)
-    return None
\ No newline at end of file
+    return None
+
+def get_supervisor_credentials(whatsapp_number):
+    """Fetches a supervisor's login record (number and password hash)."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT whatsapp_number, password_hash FROM supervisors WHERE whatsapp_number = ?", (whatsapp_number,))
+    supervisor = cursor.fetchone()
+    if supervisor:
+        return dict(supervisor)
+    return None
+
+def get_agent_name(whatsapp_number):
+    """Fetches the display name for an agent or supervisor."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT agent_name FROM agents WHERE whatsapp_number = ?", (whatsapp_number,))
+    agent = cursor.fetchone()
+    if agent:
+        return agent['agent_name']
+    return None
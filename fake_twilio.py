@@ -0,0 +1,120 @@
+"""
+A local stand-in for the parts of Twilio the bot talks to, for offline testing.
+
+- POST /2010-04-01/Accounts/<sid>/Messages.json  records an outbound message
+- GET  /messages                                  lists recorded messages (?to= filters)
+- DELETE /messages                                clears them
+- GET  /stats                                     counts of accepted and rejected message requests
+- GET  /media/<filename>                          serves audio from --media-dir
+
+Run it, then start the bot with TWILIO_API_BASE_URL pointing at it:
+    python fake_twilio.py --port 5055 --media-dir samples
+    TWILIO_API_BASE_URL=http://localhost:5055 ASYNC_VOICE_NOTES=1 python app.py
+and post a webhook with MediaUrl0=http://localhost:5055/media/<clip>.
+
+For load tests (see benchmark_twilio.py) it can behave like a busy Twilio:
+--latency-ms delays every message request, --error-rate answers that fraction
+with 503, and --max-rps answers 429 (with Retry-After) above that many messages
+per second.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+import uuid
+from flask import Flask, request, jsonify, send_from_directory, abort
+
+fake_app = Flask(__name__)
+fake_app.config['MEDIA_DIR'] = os.path.abspath("samples")
+fake_app.config['LATENCY_MS'] = 0
+fake_app.config['ERROR_RATE'] = 0.0
+fake_app.config['MAX_RPS'] = 0
+
+_messages = []
+_messages_lock = threading.Lock()
+_stats = {"accepted": 0, "rejected_503": 0, "rejected_429": 0}
+_window = {"second": 0, "count": 0}
+
+
+def _simulated_failure():
+    """Returns an error response per the load-test settings, or None to accept the request."""
+    if fake_app.config['LATENCY_MS']:
+        time.sleep(fake_app.config['LATENCY_MS'] / 1000)
+    with _messages_lock:
+        if random.random() < fake_app.config['ERROR_RATE']:
+            _stats["rejected_503"] += 1
+            return jsonify({"code": 20503, "message": "Service unavailable"}), 503
+        max_rps = fake_app.config['MAX_RPS']
+        if max_rps:
+            second = int(time.time())
+            if second != _window["second"]:
+                _window.update(second=second, count=0)
+            _window["count"] += 1
+            if _window["count"] > max_rps:
+                _stats["rejected_429"] += 1
+                return jsonify({"code": 20429, "message": "Too many requests"}), 429, {"Retry-After": "1"}
+        _stats["accepted"] += 1
+    return None
+
+
+@fake_app.route("/2010-04-01/Accounts/<account_sid>/Messages.json", methods=["POST"])
+def create_message(account_sid):
+    failure = _simulated_failure()
+    if failure is not None:
+        return failure
+    message = {
+        "sid": "SM" + uuid.uuid4().hex,
+        "account_sid": account_sid,
+        "from": request.form.get("From"),
+        "to": request.form.get("To"),
+        "body": request.form.get("Body"),
+        "status": "queued",
+        "received_at": time.time(),
+    }
+    with _messages_lock:
+        _messages.append(message)
+    return jsonify(message), 201
+
+
+@fake_app.route("/messages", methods=["GET"])
+def list_messages():
+    to_number = request.args.get("to")
+    with _messages_lock:
+        messages = [m for m in _messages if to_number is None or m["to"] == to_number]
+    return jsonify(messages)
+
+
+@fake_app.route("/messages", methods=["DELETE"])
+def clear_messages():
+    with _messages_lock:
+        _messages.clear()
+        _stats.update(accepted=0, rejected_503=0, rejected_429=0)
+    return "", 204
+
+
+@fake_app.route("/stats", methods=["GET"])
+def get_stats():
+    with _messages_lock:
+        return jsonify(_stats)
+
+
+@fake_app.route("/media/<path:filename>", methods=["GET"])
+def get_media(filename):
+    media_dir = fake_app.config['MEDIA_DIR']
+    if not os.path.isfile(os.path.join(media_dir, filename)):
+        abort(404)
+    return send_from_directory(media_dir, filename)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--media-dir", default="samples")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay before answering each message request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of message requests answered with 503")
+    parser.add_argument("--max-rps", type=int, default=0, help="answer 429 above this many messages per second (0: no limit)")
+    args = parser.parse_args()
+    fake_app.config['MEDIA_DIR'] = os.path.abspath(args.media_dir)
+    fake_app.config.update(LATENCY_MS=args.latency_ms, ERROR_RATE=args.error_rate, MAX_RPS=args.max_rps)
+    fake_app.run(host="127.0.0.1", port=args.port, threaded=True)
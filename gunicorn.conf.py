@@ -0,0 +1,42 @@
+"""
+gunicorn settings for app.py:  gunicorn -c gunicorn.conf.py app:app
+
+The app and its models are loaded once in the master before workers are forked,
+so every worker shares the same read-only model memory copy-on-write.
+Set PRELOAD_MODELS=0 to fall back to lazy per-worker loading.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("PRELOAD_MODELS", "1") == "1"
+
+# Keep torch/BLAS from starting one thread per core in every worker.
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))
+
+
+def when_ready(server):
+    # Runs in the master after app.py has been imported (preload_app) and before any fork.
+    if not preload_app:
+        return
+    import db_pool
+    from model_registry import preload_models, model_load_report
+
+    preload_models()
+    for name, info in model_load_report().items():
+        server.log.info(f"Preloaded model '{name}': load {info['load_s']}s, warm-up {info['warmup_s']}s")
+
+    # SQLite connections must not cross a fork.
+    db_pool.close_all()
+    # Move everything allocated so far out of the GC's reach, so collections in the
+    # workers do not write to (and un-share) the preloaded model pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if TORCH_THREADS_PER_WORKER:
+        import torch
+        torch.set_num_threads(TORCH_THREADS_PER_WORKER)
@@ -1,93 +1,14 @@
 import sqlite3
 import bcrypt
+from db_pool import get_connection, close_connection
+from migrations import run_migrations
 
-connection = sqlite3.connect('loan_recovery.db')
+connection = get_connection()
 cursor = connection.cursor()
 
-# --- Create tables ---
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS agents (
-    whatsapp_number TEXT PRIMARY KEY,
-    agent_name TEXT NOT NULL,
-    supervisor_number TEXT
-)
-''')
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS supervisors (
-    whatsapp_number TEXT PRIMARY KEY,
-    password_hash TEXT NOT NULL,
-    FOREIGN KEY (whatsapp_number) REFERENCES agents(whatsapp_number)
-)
-''')
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS customers (
-    customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    customer_name TEXT NOT NULL,
-    due_amount REAL NOT NULL,
-    account_number TEXT NOT NULL UNIQUE,
-    location TEXT,
-    customer_type TEXT DEFAULT 'Regular',
-    assigned_agent_number TEXT,
-    FOREIGN KEY (assigned_agent_number) REFERENCES agents(whatsapp_number)
-)
-''')
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS account_history (
-    history_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    account_number TEXT NOT NULL UNIQUE,
-    total_loan REAL NOT NULL,
-    emis_paid INTEGER NOT NULL,
-    last_payment_date TEXT,
-    payment_record TEXT,
-    status TEXT DEFAULT 'Open',
-    agent_notes TEXT,
-    supervisor_decision TEXT,
-    ai_decision TEXT,
-    FOREIGN KEY (account_number) REFERENCES customers(account_number)
-)
-''')
-
-# --- UPDATED: 'customer_profile' table to match the training data ---
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS customer_profile (
-    profile_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    account_number TEXT NOT NULL UNIQUE,
-    Age INTEGER,
-    Income INTEGER,
-    LoanAmount REAL,
-    CreditScore INTEGER,
-    MonthsEmployed INTEGER,
-    NumCreditLines INTEGER,
-    InterestRate REAL,
-    LoanTerm INTEGER,
-    DTIRatio REAL,
-    Education TEXT,
-    EmploymentType TEXT,
-    MaritalStatus TEXT,
-    HasMortgage TEXT,
-    HasDependents TEXT,
-    LoanPurpose TEXT,
-    HasCoSigner TEXT,
-    FOREIGN KEY (account_number) REFERENCES customers(account_number)
-)
-''')
-# (communications table remains the same)
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS communications (
-    comm_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    account_number TEXT NOT NULL,
-    agent_number TEXT NOT NULL,
-    supervisor_number TEXT NOT NULL,
-    summary_report TEXT NOT NULL,
-    supervisor_decision TEXT,
-    status TEXT DEFAULT 'Pending',
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (account_number) REFERENCES customers(account_number),
-    FOREIGN KEY (agent_number) REFERENCES agents(whatsapp_number),
-    FOREIGN KEY (supervisor_number) REFERENCES agents(whatsapp_number)
-)
-''')
-
+# --- Create or upgrade tables ---
+# The schema itself lives in migrations.py; this script only adds sample data on top.
+run_migrations(connection)
 
 print("Tables checked/created successfully.")
 
@@ -147,4 +68,4 @@ except sqlite3.IntegrityError:
     print("Sample data already exists, skipping insertion.")
 
 connection.commit()
-connection.close()
\ No newline at end of file
+close_connection()
\ No newline at end of file
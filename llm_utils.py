@@ -1,8 +1,17 @@
 import os
-import google.generativeai as genai
+from model_registry import register_model, get_model
+from response_cache import cached_llm_call
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel('gemini-2.0-flash')
+GEMINI_MODEL_NAME = 'gemini-2.0-flash'
+
+def load_gemini_model():
+    # Imported on first use; the SDK is slow to import
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+register_model("analyst_llm", load_gemini_model)
 
 ANALYST_PROMPT = """
 You are an expert loan recovery analyst. Analyze the provided customer data, including a simple payment record string, to create a prioritized contact plan.
@@ -24,7 +33,7 @@ def generate_priority_plan(customer_data):
 
     try:
         full_prompt = ANALYST_PROMPT.format(customer_data=formatted_data)
-        response = model.generate_content(full_prompt)
+        response = get_model("analyst_llm").generate_content(full_prompt)
         return response.text
     except Exception as e:
         print(f"LLM Analyst Error: {e}")
@@ -52,8 +61,12 @@ def generate_summary_for_supervisor(customer_details):
 
     try:
         full_prompt = SUMMARY_PROMPT.format(customer_details=formatted_details)
-        response = model.generate_content(full_prompt)
-        return response.text
+        # Tagged with the account so log_agent_notes / submit_supervisor_decision can invalidate it
+        return cached_llm_call(
+            GEMINI_MODEL_NAME, full_prompt,
+            lambda: get_model("analyst_llm").generate_content(full_prompt).text,
+            tag=customer_details['account_number'],
+        )
     except Exception as e:
         print(f"LLM Summarizer Error: {e}")
         return "Sorry, I was unable to generate a summary for this case."
@@ -93,8 +106,11 @@ def generate_ai_decision(case_data):
 
     try:
         full_prompt = AI_DECISION_PROMPT.format(case_data=formatted_data)
-        response = model.generate_content(full_prompt)
-        return response.text.strip()
+        return cached_llm_call(
+            GEMINI_MODEL_NAME, full_prompt,
+            lambda: get_model("analyst_llm").generate_content(full_prompt).text.strip(),
+            tag=case_data['account_number'],
+        )
     except Exception as e:
         print(f"LLM Decision Error: {e}")
         return "Could not determine an AI decision."
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Generates the sample set for benchmark_asr.py: short spoken clips of typical agent
+commands, encoded as ogg/opus like WhatsApp voice notes, plus their manifest.
+
+The clips are synthesised with a Hugging Face text-to-speech model through the
+transformers pipeline (the same stack the ASR backends use) and encoded with ffmpeg.
+The output directory then holds:
+    samples/
+        manifest.json        [{"file": "clip_01.ogg", "text": "show me my customers"}, ...]
+        clip_01.ogg
+        ...
+"text" is the reference transcript the word error rate is computed against.
+Recorded clips work the same way: put them in a directory with a manifest.json in
+this format (any format ffmpeg can decode).
+
+Synthetic speech is cleaner than real voice notes, so use the resulting WER to
+compare backends with each other rather than as an absolute figure.
+
+Usage:
+    python make_asr_samples.py --output samples [--model facebook/mms-tts-eng]
+"""
+import argparse
+import json
+import os
+import subprocess
+
+import numpy as np
+
+SAMPLE_TEXTS = [
+    "show me my customers",
+    "what is my priority plan for today",
+    "show the history for account ACC001",
+    "log for ACC002: customer lost his job and will pay next month",
+    "the customer promised to pay half of the amount on Friday",
+    "send a report to my supervisor",
+    "do I have any pending reports",
+    "decision for report 12: approve the restructuring",
+]
+
+
+def encode_ogg_opus(audio, sampling_rate, path):
+    """Writes mono float32 PCM as an ogg/opus file with ffmpeg."""
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "quiet", "-y",
+        "-f", "f32le", "-ar", str(sampling_rate), "-ac", "1", "-i", "pipe:0",
+        "-c:a", "libopus", "-b:a", "24k", path,
+    ]
+    try:
+        subprocess.run(command, input=np.ascontiguousarray(audio, dtype=np.float32).tobytes(), check=True)
+    except FileNotFoundError:
+        raise SystemExit("ffmpeg was not found but it is required to encode the samples.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="samples")
+    parser.add_argument("--model", default="facebook/mms-tts-eng", help="transformers text-to-speech model")
+    args = parser.parse_args()
+
+    from transformers import pipeline
+
+    synthesiser = pipeline("text-to-speech", model=args.model)
+    os.makedirs(args.output, exist_ok=True)
+    manifest = []
+    for number, text in enumerate(SAMPLE_TEXTS, start=1):
+        speech = synthesiser(text)
+        file_name = f"clip_{number:02d}.ogg"
+        encode_ogg_opus(np.squeeze(speech["audio"]), speech["sampling_rate"], os.path.join(args.output, file_name))
+        manifest.append({"file": file_name, "text": text})
+        print(f"  {file_name}: {text}")
+
+    manifest_path = os.path.join(args.output, "manifest.json")
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote {len(manifest)} clips and '{manifest_path}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Bounded download buffers for voice-note media.
+
+A media body is read in chunks and never as one response.content copy. Small
+bodies stay in a bytearray. Once a body passes MEDIA_SPILL_BYTES it moves to an
+unlinked temporary file, which is memory-mapped when the download completes. Either
+way MediaBuffer.data is a buffer that the decoder (audio_stream.decode_audio_stream)
+can read straight from. A body over MEDIA_MAX_BYTES is rejected as soon as the
+limit is crossed, or up front when Content-Length already exceeds it.
+"""
+import mmap
+import os
+import tempfile
+
+from audio_stream import MediaLimitError
+
+# WhatsApp caps audio messages at 16 MB.
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(16 * 1024 * 1024)))
+MEDIA_SPILL_BYTES = int(os.getenv("MEDIA_SPILL_BYTES", str(2 * 1024 * 1024)))
+MEDIA_CHUNK_BYTES = 64 * 1024
+
+
+class MediaBuffer:
+    def __init__(self, spill_bytes=MEDIA_SPILL_BYTES):
+        self.spill_bytes = spill_bytes
+        self.size = 0
+        self.data = None
+        self._memory = bytearray()
+        self._file = None
+        self._mmap = None
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def write(self, chunk):
+        if self._file is None and self.size + len(chunk) > self.spill_bytes:
+            self._file = tempfile.TemporaryFile(prefix="media_")
+            self._file.write(self._memory)
+            self._memory = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._memory += chunk
+        self.size += len(chunk)
+
+    def finish(self):
+        """Makes .data available: the bytearray itself, or a read-only map of the spill file."""
+        if self._file is None:
+            self.data = self._memory
+        elif self.size:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = self._mmap
+        else:
+            self.data = b""
+        return self
+
+    def close(self):
+        self.data = None
+        self._memory = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A view of it is still alive; it is unmapped when that view is released.
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()  # the file was never linked, so this frees the disk space
+            self._file = None
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_response(response, max_bytes=MEDIA_MAX_BYTES, spill_bytes=MEDIA_SPILL_BYTES, chunk_bytes=MEDIA_CHUNK_BYTES):
+    """Reads a streamed requests response into a MediaBuffer, enforcing max_bytes."""
+    declared = response.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        response.close()
+        raise MediaLimitError(f"media is {int(declared)} bytes, more than the {max_bytes} byte limit")
+
+    buffer = MediaBuffer(spill_bytes)
+    try:
+        for chunk in response.iter_content(chunk_bytes):
+            if buffer.size + len(chunk) > max_bytes:
+                raise MediaLimitError(f"media is larger than the {max_bytes} byte limit")
+            buffer.write(chunk)
+        return buffer.finish()
+    except BaseException:
+        buffer.close()
+        raise
+    finally:
+        response.close()
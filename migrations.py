@@ -0,0 +1,210 @@
+import sqlite3
+from db_pool import get_connection
+
+# Each migration is (version, description, [statements]).
+# Versions must be strictly increasing; the applied version is tracked in PRAGMA user_version.
+# Never edit a migration once it has shipped -- add a new one instead.
+MIGRATIONS = [
+    (1, "base schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS agents (
+            whatsapp_number TEXT PRIMARY KEY,
+            agent_name TEXT NOT NULL,
+            supervisor_number TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS supervisors (
+            whatsapp_number TEXT PRIMARY KEY,
+            password_hash TEXT NOT NULL,
+            FOREIGN KEY (whatsapp_number) REFERENCES agents(whatsapp_number)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS customers (
+            customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_name TEXT NOT NULL,
+            due_amount REAL NOT NULL,
+            account_number TEXT NOT NULL UNIQUE,
+            location TEXT,
+            customer_type TEXT DEFAULT 'Regular',
+            assigned_agent_number TEXT,
+            FOREIGN KEY (assigned_agent_number) REFERENCES agents(whatsapp_number)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS account_history (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_number TEXT NOT NULL UNIQUE,
+            total_loan REAL NOT NULL,
+            emis_paid INTEGER NOT NULL,
+            last_payment_date TEXT,
+            payment_record TEXT,
+            status TEXT DEFAULT 'Open',
+            agent_notes TEXT,
+            supervisor_decision TEXT,
+            ai_decision TEXT,
+            FOREIGN KEY (account_number) REFERENCES customers(account_number)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS customer_profile (
+            profile_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_number TEXT NOT NULL UNIQUE,
+            Age INTEGER,
+            Income INTEGER,
+            LoanAmount REAL,
+            CreditScore INTEGER,
+            MonthsEmployed INTEGER,
+            NumCreditLines INTEGER,
+            InterestRate REAL,
+            LoanTerm INTEGER,
+            DTIRatio REAL,
+            Education TEXT,
+            EmploymentType TEXT,
+            MaritalStatus TEXT,
+            HasMortgage TEXT,
+            HasDependents TEXT,
+            LoanPurpose TEXT,
+            HasCoSigner TEXT,
+            FOREIGN KEY (account_number) REFERENCES customers(account_number)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS communications (
+            comm_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_number TEXT NOT NULL,
+            agent_number TEXT NOT NULL,
+            supervisor_number TEXT NOT NULL,
+            summary_report TEXT NOT NULL,
+            supervisor_decision TEXT,
+            status TEXT DEFAULT 'Pending',
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (account_number) REFERENCES customers(account_number),
+            FOREIGN KEY (agent_number) REFERENCES agents(whatsapp_number),
+            FOREIGN KEY (supervisor_number) REFERENCES agents(whatsapp_number)
+        )
+        ''',
+    ]),
+    (2, "indexes for agent and supervisor lookups", [
+        # get_agent_and_customers: the index covers every selected column, so the
+        # customer list is served without touching the table.
+        # get_all_data_for_agent: seeks by agent and joins customer_profile on account_number.
+        '''
+        CREATE INDEX IF NOT EXISTS idx_customers_agent
+        ON customers (assigned_agent_number, account_number, customer_name, due_amount, location)
+        ''',
+        # get_pending_reports_for_supervisor: equality on both columns.
+        # summary_report is left out on purpose; it is large and only read for the few matching rows.
+        '''
+        CREATE INDEX IF NOT EXISTS idx_communications_supervisor_status
+        ON communications (supervisor_number, status, account_number, agent_number)
+        ''',
+        # get_full_case_details joins agents on supervisor_number.
+        '''
+        CREATE INDEX IF NOT EXISTS idx_agents_supervisor
+        ON agents (supervisor_number)
+        ''',
+        "ANALYZE",
+    ]),
+    (3, "precomputed risk scores", [
+        # updated_at is maintained by the triggers below so that risk_score_job.py only
+        # re-scores profiles that changed after their last score.
+        "ALTER TABLE customer_profile ADD COLUMN updated_at TEXT",
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_customer_profile_inserted
+        AFTER INSERT ON customer_profile
+        BEGIN
+            UPDATE customer_profile SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+            WHERE profile_id = NEW.profile_id;
+        END
+        ''',
+        # Listing the feature columns keeps the trigger from firing on its own updated_at write.
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_customer_profile_updated
+        AFTER UPDATE OF account_number, Age, Income, LoanAmount, CreditScore, MonthsEmployed,
+            NumCreditLines, InterestRate, LoanTerm, DTIRatio, Education, EmploymentType,
+            MaritalStatus, HasMortgage, HasDependents, LoanPurpose, HasCoSigner
+        ON customer_profile
+        BEGIN
+            UPDATE customer_profile SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+            WHERE profile_id = NEW.profile_id;
+        END
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS risk_scores (
+            account_number TEXT PRIMARY KEY,
+            risk_score REAL NOT NULL,
+            model_version TEXT NOT NULL,
+            scored_at TEXT NOT NULL,
+            FOREIGN KEY (account_number) REFERENCES customer_profile(account_number)
+        )
+        ''',
+        # Ranking accounts by risk (priority plans, dashboard) reads this index in order.
+        '''
+        CREATE INDEX IF NOT EXISTS idx_risk_scores_score
+        ON risk_scores (risk_score DESC)
+        ''',
+    ]),
+    (4, "indexes for agent-scoped risk ranking", [
+        # Priority plans rank one agent's customers, never the whole table, so the global
+        # risk_score index from migration 3 was never used.
+        "DROP INDEX IF EXISTS idx_risk_scores_score",
+        # get_ranked_customers_for_agent seeks the agent's accounts in idx_customers_agent,
+        # then reads each account's score and freshness from these two covering indexes
+        # without touching either table. Only that agent's rows are sorted by risk_score.
+        # risk_score_job.py's staleness check uses the same two indexes.
+        '''
+        CREATE INDEX IF NOT EXISTS idx_risk_scores_account_score
+        ON risk_scores (account_number, risk_score, model_version, scored_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_customer_profile_account_updated
+        ON customer_profile (account_number, updated_at)
+        ''',
+        "ANALYZE",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(connection):
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(connection=None, target_version=None):
+    """
+    Applies every migration newer than the database's current version, in order.
+    Each migration runs in its own transaction together with its version bump.
+    Returns the list of versions that were applied.
+    """
+    connection = connection or get_connection()
+    target_version = LATEST_VERSION if target_version is None else target_version
+    current_version = get_schema_version(connection)
+    applied = []
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current_version or version > target_version:
+            continue
+        try:
+            connection.execute("BEGIN")
+            for statement in statements:
+                connection.execute(statement)
+            # PRAGMA does not accept bound parameters; version is an int from this file.
+            connection.execute(f"PRAGMA user_version = {int(version)}")
+            connection.commit()
+        except sqlite3.Error as e:
+            connection.rollback()
+            print(f"Migration {version} ({description}) failed: {e}")
+            raise
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+
+    return applied
+
+
+if __name__ == "__main__":
+    applied_versions = run_migrations()
+    if not applied_versions:
+        print(f"Database already at schema version {LATEST_VERSION}.")
@@ -0,0 +1,338 @@
+"""
+Prediction logging, drift monitoring and shadow evaluation for the recovery model.
+
+The request path (PredictionMonitor.record) only copies the scored feature rows and
+their probabilities into a preallocated buffer. A background thread takes each full
+buffer (and whatever has accumulated every few seconds) and:
+  - appends every column to its own raw file -- a compact, append-only columnar log.
+    Each process writes its own segment directory per UTC day, so gunicorn workers
+    never interleave rows. read_prediction_log() loads a segment back.
+  - scores the batch with the shadow (candidate) model, if one is configured, and
+    compares it with the served probabilities.
+  - updates per-column histograms over a sliding window of recent predictions and
+    their population stability index (PSI) against a reference distribution. The
+    reference is the first window ever logged; it is saved and reused after restarts.
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+PREDICTION_MONITORING = os.getenv("PREDICTION_MONITORING", "1") == "1"
+PREDICTION_LOG_DIR = os.getenv("PREDICTION_LOG_DIR", "prediction_log")
+MONITOR_BUFFER_ROWS = int(os.getenv("MONITOR_BUFFER_ROWS", "4096"))
+MONITOR_FLUSH_SECONDS = float(os.getenv("MONITOR_FLUSH_SECONDS", "5"))
+DRIFT_WINDOW_ROWS = int(os.getenv("DRIFT_WINDOW_ROWS", "500"))
+DRIFT_WINDOWS = int(os.getenv("DRIFT_WINDOWS", "6"))
+# Usual PSI reading: < 0.1 stable, 0.1-0.2 moderate shift, > 0.2 significant shift.
+PSI_ALERT_THRESHOLD = 0.2
+# Full batches waiting for the writer; beyond this, batches are dropped rather than block requests.
+MAX_PENDING_BATCHES = 16
+
+SCORE_COLUMN = "risk_score"
+SHADOW_COLUMN = "shadow_score"
+TIMESTAMP_COLUMN = "timestamp"
+
+
+class ColumnarLog:
+    """Appends batches column by column to <log_dir>/<UTC day>/<host>-<pid>/<column>.<f32|f64>."""
+
+    def __init__(self, log_dir, columns):
+        self.log_dir = log_dir
+        self.columns = columns  # name -> numpy dtype
+
+    def segment_dir(self, timestamp):
+        day = time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+        return os.path.join(self.log_dir, day, f"{socket.gethostname()}-{os.getpid()}")
+
+    def append(self, values):
+        segment = self.segment_dir(values[TIMESTAMP_COLUMN][0])
+        os.makedirs(segment, exist_ok=True)
+        for name, dtype in self.columns.items():
+            suffix = "f64" if np.dtype(dtype) == np.float64 else "f32"
+            with open(os.path.join(segment, f"{name}.{suffix}"), "ab") as f:
+                f.write(np.ascontiguousarray(values[name], dtype=dtype).tobytes())
+
+
+def read_prediction_log(segment_dir):
+    """Loads one segment back as {column: array}. Columns are truncated to the shortest one."""
+    columns = {}
+    for path in glob.glob(os.path.join(segment_dir, "*.f32")) + glob.glob(os.path.join(segment_dir, "*.f64")):
+        name, suffix = os.path.splitext(os.path.basename(path))
+        columns[name] = np.fromfile(path, dtype=np.float64 if suffix == ".f64" else np.float32)
+    rows = min((len(values) for values in columns.values()), default=0)
+    return {name: values[:rows] for name, values in columns.items()}
+
+
+class DriftTracker:
+    """
+    Population stability index of each column over the last `windows` windows of
+    `window_rows` predictions. Histogram counts are kept per window, so sliding the
+    window subtracts the evicted counts instead of re-reading any rows.
+    """
+
+    def __init__(self, columns, categorical_sizes, window_rows=DRIFT_WINDOW_ROWS, windows=DRIFT_WINDOWS, reference_path=None):
+        self.columns = columns
+        self.categorical_sizes = categorical_sizes
+        self.window_rows = window_rows
+        self.reference_path = reference_path
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_rows = 0
+        self._closed = deque(maxlen=windows)
+        self.reference = None
+        if reference_path and os.path.exists(reference_path):
+            with open(reference_path) as f:
+                self._set_reference(json.load(f))
+
+    def _set_reference(self, reference):
+        self._edges = [np.asarray(reference["edges"][col], dtype=np.float32) for col in self.columns]
+        self._expected = [np.asarray(reference["proportions"][col]) for col in self.columns]
+        self._current = [np.zeros(len(edges) + 2, dtype=np.int64) for edges in self._edges]
+        self._current_rows = 0
+        self._totals = [np.zeros_like(counts) for counts in self._current]
+        self.reference = reference
+
+    def _build_reference(self, rows):
+        """Decile edges for numeric columns, one bin per code for categorical ones."""
+        edges = {}
+        for j, col in enumerate(self.columns):
+            if col in self.categorical_sizes:
+                col_edges = np.arange(self.categorical_sizes[col] - 1) + 0.5
+            else:
+                values = rows[:, j][~np.isnan(rows[:, j])]
+                col_edges = np.unique(np.quantile(values, np.linspace(0.1, 0.9, 9))) if len(values) else np.empty(0)
+            edges[col] = col_edges.tolist()
+        self._edges = [np.asarray(edges[col], dtype=np.float32) for col in self.columns]
+        proportions = {}
+        for j, col in enumerate(self.columns):
+            counts = self._histogram(j, rows[:, j])
+            proportions[col] = (counts / counts.sum()).tolist()
+        reference = {"rows": len(rows), "edges": edges, "proportions": proportions}
+        if self.reference_path:
+            os.makedirs(os.path.dirname(self.reference_path) or ".", exist_ok=True)
+            tmp_path = f"{self.reference_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(reference, f)
+            os.replace(tmp_path, self.reference_path)
+        self._set_reference(reference)
+
+    def _histogram(self, j, values):
+        edges = self._edges[j]
+        bins = np.searchsorted(edges, values, side="right")
+        bins[np.isnan(values)] = len(edges) + 1  # missing / unseen category
+        return np.bincount(bins, minlength=len(edges) + 2)
+
+    def update(self, rows):
+        with self._lock:
+            if self.reference is None:
+                self._pending.append(rows)
+                self._pending_rows += len(rows)
+                if self._pending_rows >= self.window_rows:
+                    self._build_reference(np.concatenate(self._pending))
+                    self._pending, self._pending_rows = [], 0
+                return
+
+            start = 0
+            while start < len(rows):
+                piece = rows[start:start + self.window_rows - self._current_rows]
+                for j in range(len(self.columns)):
+                    self._current[j] += self._histogram(j, piece[:, j])
+                self._current_rows += len(piece)
+                start += len(piece)
+                if self._current_rows == self.window_rows:
+                    self._close_window()
+
+    def _close_window(self):
+        if len(self._closed) == self._closed.maxlen:
+            for total, evicted in zip(self._totals, self._closed[0]):
+                total -= evicted
+        self._closed.append(self._current)
+        for total, counts in zip(self._totals, self._current):
+            total += counts
+        self._current = [np.zeros_like(counts) for counts in self._current]
+        self._current_rows = 0
+
+    @staticmethod
+    def psi(actual_counts, expected_proportions, eps=1e-4):
+        actual = actual_counts / max(actual_counts.sum(), 1)
+        actual, expected = np.maximum(actual, eps), np.maximum(expected_proportions, eps)
+        return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+    def stats(self):
+        with self._lock:
+            if self.reference is None:
+                return {"reference_rows": 0, "collecting_reference": self._pending_rows, "psi": {}}
+            if not self._closed:
+                psi = {}
+            else:
+                psi = {col: round(self.psi(total, expected), 4)
+                       for col, total, expected in zip(self.columns, self._totals, self._expected)}
+            return {
+                "reference_rows": self.reference["rows"],
+                "window_rows": self.window_rows,
+                "windows": len(self._closed),
+                "psi": psi,
+                "max_psi": max(psi.values(), default=None),
+                "drifted": sorted(col for col, value in psi.items() if value > PSI_ALERT_THRESHOLD),
+            }
+
+
+class ShadowComparison:
+    """Running comparison of the served and shadow probabilities."""
+
+    def __init__(self, threshold=0.5):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.agreements = 0
+        self.abs_diff_sum = 0.0
+        self.abs_diff_max = 0.0
+        self.served_sum = 0.0
+        self.shadow_sum = 0.0
+
+    def update(self, served, shadow):
+        diff = np.abs(served.astype(np.float64) - shadow)
+        with self._lock:
+            self.rows += len(served)
+            self.agreements += int(np.sum((served > self.threshold) == (shadow > self.threshold)))
+            self.abs_diff_sum += float(diff.sum())
+            self.abs_diff_max = max(self.abs_diff_max, float(diff.max(initial=0.0)))
+            self.served_sum += float(served.sum())
+            self.shadow_sum += float(shadow.sum())
+
+    def stats(self):
+        with self._lock:
+            rows = max(self.rows, 1)
+            return {
+                "rows": self.rows,
+                "decision_agreement": round(self.agreements / rows, 4),
+                "mean_abs_diff": round(self.abs_diff_sum / rows, 5),
+                "max_abs_diff": round(self.abs_diff_max, 5),
+                "served_mean": round(self.served_sum / rows, 4),
+                "shadow_mean": round(self.shadow_sum / rows, 4),
+            }
+
+
+class PredictionMonitor:
+    def __init__(self, feature_names, categorical_sizes, log_dir=PREDICTION_LOG_DIR, shadow_predict=None,
+                 buffer_rows=MONITOR_BUFFER_ROWS, flush_seconds=MONITOR_FLUSH_SECONDS,
+                 window_rows=DRIFT_WINDOW_ROWS, windows=DRIFT_WINDOWS):
+        self.feature_names = list(feature_names)
+        self.buffer_rows = buffer_rows
+        self.flush_seconds = flush_seconds
+        self.shadow_predict = shadow_predict
+        columns = {TIMESTAMP_COLUMN: np.float64, **{name: np.float32 for name in self.feature_names}, SCORE_COLUMN: np.float32}
+        if shadow_predict is not None:
+            columns[SHADOW_COLUMN] = np.float32
+        self.log = ColumnarLog(log_dir, columns)
+        self.drift = DriftTracker(self.feature_names + [SCORE_COLUMN], categorical_sizes, window_rows, windows,
+                                  os.path.join(log_dir, "drift_reference.json"))
+        self.shadow = ShadowComparison() if shadow_predict is not None else None
+        self.logged_rows = 0
+        self.dropped_rows = 0
+        self.errors = 0
+        self._start()
+        # Threads do not survive fork (gunicorn preloads models in the master).
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._start)
+        atexit.register(self.close)
+
+    def _start(self):
+        self._lock = threading.Lock()
+        self._new_buffer()
+        self._batches = queue.Queue(maxsize=MAX_PENDING_BATCHES)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="prediction-monitor", daemon=True)
+        self._thread.start()
+
+    def _new_buffer(self):
+        self._rows = np.empty((self.buffer_rows, len(self.feature_names) + 1), dtype=np.float32)
+        self._times = np.empty(self.buffer_rows, dtype=np.float64)
+        self._count = 0
+
+    def record(self, matrix, probabilities):
+        """Hot path: copies the rows into the buffer. All other work happens in the background."""
+        now = time.time()
+        with self._lock:
+            start = 0
+            while start < len(matrix):
+                take = min(len(matrix) - start, self.buffer_rows - self._count)
+                end = self._count + take
+                self._rows[self._count:end, :-1] = matrix[start:start + take]
+                self._rows[self._count:end, -1] = probabilities[start:start + take]
+                self._times[self._count:end] = now
+                self._count = end
+                start += take
+                if self._count == self.buffer_rows:
+                    self._hand_off()
+
+    def _hand_off(self):
+        # Caller holds self._lock.
+        if not self._count:
+            return
+        batch = (self._rows[:self._count], self._times[:self._count])
+        count = self._count
+        self._new_buffer()
+        try:
+            self._batches.put_nowait(batch)
+        except queue.Full:
+            self.dropped_rows += count
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                batch = self._batches.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                with self._lock:
+                    self._hand_off()
+                continue
+            try:
+                self._process(*batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"Prediction monitor error: {e}")
+            finally:
+                self._batches.task_done()
+
+    def _process(self, rows, times):
+        features, served = rows[:, :-1], rows[:, -1]
+        values = {TIMESTAMP_COLUMN: times, SCORE_COLUMN: served}
+        values.update((name, features[:, j]) for j, name in enumerate(self.feature_names))
+        if self.shadow_predict is not None:
+            shadow = np.asarray(self.shadow_predict(np.ascontiguousarray(features)), dtype=np.float32)
+            values[SHADOW_COLUMN] = shadow
+            self.shadow.update(served, shadow)
+        self.log.append(values)
+        self.drift.update(rows)
+        self.logged_rows += len(rows)
+
+    def flush(self):
+        """Writes out everything recorded so far and waits for the background thread."""
+        with self._lock:
+            self._hand_off()
+        self._batches.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.flush()
+            self._stopped.set()
+
+    def stats(self):
+        with self._lock:
+            buffered = self._count
+        return {
+            "logged_rows": self.logged_rows,
+            "buffered_rows": buffered,
+            "dropped_rows": self.dropped_rows,
+            "errors": self.errors,
+            "drift": self.drift.stats(),
+            "shadow": self.shadow.stats() if self.shadow else None,
+        }
@@ -0,0 +1,76 @@
+"""
+Lazily loaded, process-wide model instances.
+
+Modules register a loader for each heavy model at import time (which is cheap) and
+call get_model() where they need it, so the model is only built on first use.
+Under gunicorn, gunicorn.conf.py calls preload_models() in the master process so
+forked workers share the loaded weights copy-on-write instead of each loading its own.
+"""
+import threading
+import time
+
+_loaders = {}
+_warmups = {}
+_instances = {}
+_load_seconds = {}
+_warmup_seconds = {}
+_lock = threading.Lock()
+_load_locks = {}
+
+
+def register_model(name, loader, warmup=None):
+    """
+    Registers loader() as the way to build model `name`.
+    warmup(instance), if given, is run by preload_models() to trigger one-off
+    initialisation (kernel selection, caches) before the first real request.
+    """
+    with _lock:
+        _loaders[name] = loader
+        _load_locks.setdefault(name, threading.Lock())
+        if warmup is not None:
+            _warmups[name] = warmup
+
+
+def get_model(name):
+    """Returns the model, loading it on first use. Concurrent first callers wait for a single load."""
+    if name in _instances:
+        return _instances[name]
+    if name not in _loaders:
+        raise KeyError(f"No model registered under '{name}'")
+
+    with _load_locks[name]:
+        if name not in _instances:
+            start = time.perf_counter()
+            _instances[name] = _loaders[name]()
+            _load_seconds[name] = time.perf_counter() - start
+            print(f"Loaded model '{name}' in {_load_seconds[name]:.2f}s")
+    return _instances[name]
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+def preload_models(names=None, warm_up=True):
+    """Loads (and optionally warms up) the given models, or every registered model."""
+    for name in names or list(_loaders):
+        instance = get_model(name)
+        if warm_up and name in _warmups and name not in _warmup_seconds and instance is not None:
+            start = time.perf_counter()
+            try:
+                _warmups[name](instance)
+            except Exception as e:
+                print(f"Warm-up for model '{name}' failed: {e}")
+            _warmup_seconds[name] = time.perf_counter() - start
+
+
+def model_load_report():
+    """Returns {name: {"loaded": bool, "load_s": float, "warmup_s": float}} for every registered model."""
+    return {
+        name: {
+            "loaded": name in _instances,
+            "load_s": round(_load_seconds.get(name, 0.0), 3),
+            "warmup_s": round(_warmup_seconds.get(name, 0.0), 3),
+        }
+        for name in _loaders
+    }
@@ -0,0 +1,247 @@
+"""
+Hyperparameter search for the recovery model (python train_model.py tune).
+
+Every candidate parameter set is scored with stratified k-fold cross-validation
+(ROC AUC). Candidates run in parallel in a process pool; each worker gives XGBoost
+a fixed number of threads so that workers x threads never exceeds the cores, and
+one core is left to the parent, which measures how fast each candidate is to
+serve (single-row latency in the format production serves, see
+RECOVERY_MODEL_FORMAT) and how big it is (UBJ bytes). A candidate too deep for
+the NumPy tree predictor is timed on the native booster instead. The grid is
+validated before any fit is started.
+
+Finished candidates are appended to a JSONL checkpoint as they complete, so an
+interrupted search resumes where it stopped. The leaderboard (CSV) is sorted by
+mean AUC and marks the candidates that no other candidate beats on AUC, latency
+and size at once (the Pareto front).
+"""
+import csv
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from tree_predictor import MAX_DEPTH, NumpyTreeEnsemble
+
+TUNING_GRID = {
+    "n_estimators": [50, 100, 200, 400],
+    "max_depth": [3, 4, 6, 8],
+    "learning_rate": [0.05, 0.1, 0.3],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+    "min_child_weight": [1, 5],
+}
+CHECKPOINT_FILE = "tuning_checkpoint.jsonl"
+LEADERBOARD_FILE = "leaderboard.csv"
+LATENCY_ROWS = 200
+# Passed by _cross_validate itself, so a grid must not set them.
+RESERVED_PARAMS = ("eval_metric", "random_state", "n_jobs")
+
+_worker_state = {}
+
+
+def usable_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan_workers(candidates, cores=None, workers=None):
+    """
+    Returns (workers, threads per worker). One core is kept for the parent and
+    workers * threads never exceeds the rest, so XGBoost threads are not oversubscribed.
+    """
+    available = max(1, (cores or usable_cores()) - 1)
+    workers = max(1, min(workers or available, available, candidates))
+    return workers, max(1, available // workers)
+
+
+def candidate_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def build_candidates(grid, search="random", n_candidates=30, seed=42):
+    """All grid combinations, or a random sample of n_candidates distinct ones."""
+    names = sorted(grid)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    if search == "grid" or n_candidates >= len(combinations):
+        return combinations
+    return random.Random(seed).sample(combinations, n_candidates)
+
+
+def validate_grid(grid):
+    """Raises ValueError if the grid cannot be searched (unknown or reserved parameters, empty or bad values)."""
+    from xgboost import XGBClassifier
+
+    if not isinstance(grid, dict) or not grid:
+        raise ValueError("the tuning grid must map parameter names to lists of values")
+    known = set(XGBClassifier().get_params())
+    for name, values in grid.items():
+        if name in RESERVED_PARAMS:
+            raise ValueError(f"'{name}' is set by the tuner and cannot be part of the grid")
+        if name not in known:
+            raise ValueError(f"'{name}' is not an XGBClassifier parameter")
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"'{name}' must map to a non-empty list of values")
+    for depth in grid.get("max_depth", []):
+        if not isinstance(depth, int) or depth < 1:
+            raise ValueError(f"max_depth values must be positive integers, got {depth!r}")
+    deep = [depth for depth in grid.get("max_depth", []) if depth > MAX_DEPTH]
+    if deep:
+        print(f"Note: max_depth {deep} is deeper than the NumPy tree predictor supports ({MAX_DEPTH}); "
+              "those candidates are timed on the native booster.")
+
+
+def stratified_folds(y, k, seed=42):
+    from sklearn.model_selection import StratifiedKFold
+
+    splitter = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(y)), y))
+
+
+def _init_worker(X, y, folds, nthread):
+    _worker_state.update(X=X, y=y, folds=folds, nthread=nthread)
+
+
+def _cross_validate(params):
+    """Runs in a worker: k-fold AUC for one candidate, plus the last fold's model as JSON."""
+    from sklearn.metrics import roc_auc_score
+    from xgboost import XGBClassifier
+
+    X, y, folds, nthread = (_worker_state[key] for key in ("X", "y", "folds", "nthread"))
+    aucs = []
+    start = time.perf_counter()
+    for train_index, valid_index in folds:
+        model = XGBClassifier(**params, eval_metric='logloss', random_state=42, n_jobs=nthread)
+        model.fit(X[train_index], y[train_index])
+        aucs.append(float(roc_auc_score(y[valid_index], model.predict_proba(X[valid_index])[:, 1])))
+    booster = model.get_booster()
+    return {
+        "params": params,
+        "auc_mean": round(float(np.mean(aucs)), 5),
+        "auc_std": round(float(np.std(aucs)), 5),
+        "fold_aucs": [round(auc, 5) for auc in aucs],
+        "fit_seconds": round(time.perf_counter() - start, 2),
+        "model_bytes": len(booster.save_raw("ubj")),
+        "n_trees": booster.num_boosted_rounds(),
+        "model_json": bytes(booster.save_raw("json")).decode("utf-8"),
+    }
+
+
+def _serving_predictor(model_json, model_format):
+    """Returns (format, predict) for the format production would serve this model in."""
+    if model_format == "numpy":
+        try:
+            return "numpy", NumpyTreeEnsemble.from_model(json.loads(model_json)).predict_proba_matrix
+        except ValueError as e:
+            print(f"  NumPy tree predictor unavailable ({e}); timing the native booster.")
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(bytearray(model_json, "utf-8"))
+    return "native", lambda matrix: booster.inplace_predict(matrix, missing=np.nan, validate_features=False)
+
+
+def serving_latency_us(model_json, rows, model_format="native"):
+    """Median single-row latency in microseconds, and the format that was timed."""
+    timed_format, predict = _serving_predictor(model_json, model_format)
+    predict(rows[:1])  # warm up
+    timings = []
+    for i in range(len(rows)):
+        start = time.perf_counter()
+        predict(rows[i:i + 1])
+        timings.append((time.perf_counter() - start) * 1e6)
+    return round(float(np.median(timings)), 1), timed_format
+
+
+def load_checkpoint(path):
+    results = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    result = json.loads(line)
+                    results[candidate_key(result["params"])] = result
+    return results
+
+
+def append_checkpoint(path, result):
+    with open(path, "a") as f:
+        f.write(json.dumps(result) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def mark_pareto_front(results):
+    """Flags results not dominated on (higher AUC, lower latency, smaller model)."""
+    for result in results:
+        result["pareto"] = not any(
+            other["auc_mean"] >= result["auc_mean"]
+            and other["latency_us"] <= result["latency_us"]
+            and other["model_bytes"] <= result["model_bytes"]
+            and (other["auc_mean"], -other["latency_us"], -other["model_bytes"])
+            != (result["auc_mean"], -result["latency_us"], -result["model_bytes"])
+            for other in results
+        )
+
+
+def write_leaderboard(results, path):
+    ranked = sorted(results, key=lambda r: r["auc_mean"], reverse=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "auc_mean", "auc_std", "latency_us", "model_kb", "n_trees", "fit_seconds", "pareto", "params"])
+        for rank, r in enumerate(ranked, start=1):
+            writer.writerow([rank, r["auc_mean"], r["auc_std"], r["latency_us"], round(r["model_bytes"] / 1024, 1),
+                             r["n_trees"], r["fit_seconds"], "yes" if r["pareto"] else "", candidate_key(r["params"])])
+    return ranked
+
+
+def tune(X, y, grid=TUNING_GRID, search="random", n_candidates=30, folds=5, workers=None,
+         reports_dir="training_reports", restart=False, seed=42):
+    """Runs (or resumes) the search and writes the leaderboard. Returns the results, best AUC first."""
+    validate_grid(grid)
+    # "auto" serves the native booster (see prediction_utils.py).
+    serving_format = "numpy" if os.getenv("RECOVERY_MODEL_FORMAT", "auto") == "numpy" else "native"
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    os.makedirs(reports_dir, exist_ok=True)
+    checkpoint_path = os.path.join(reports_dir, CHECKPOINT_FILE)
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    candidates = build_candidates(grid, search, n_candidates, seed)
+    done = load_checkpoint(checkpoint_path)
+    pending = [params for params in candidates if candidate_key(params) not in done]
+    print(f"{len(candidates)} candidates, {len(candidates) - len(pending)} already in the checkpoint.")
+
+    latency_rows = X[np.random.default_rng(seed).choice(len(X), size=min(LATENCY_ROWS, len(X)), replace=False)]
+    if pending:
+        worker_count, nthread = plan_workers(len(pending), workers=workers)
+        print(f"Running {len(pending)} candidates x {folds} folds on {worker_count} workers x {nthread} threads.")
+        with ProcessPoolExecutor(max_workers=worker_count, initializer=_init_worker,
+                                 initargs=(X, y, stratified_folds(y, folds, seed), nthread)) as pool:
+            futures = [pool.submit(_cross_validate, params) for params in pending]
+            for finished, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                result["latency_us"], result["latency_format"] = serving_latency_us(
+                    result.pop("model_json"), latency_rows, serving_format)
+                append_checkpoint(checkpoint_path, result)
+                done[candidate_key(result["params"])] = result
+                print(f"  [{finished}/{len(pending)}] AUC {result['auc_mean']:.4f}  {result['latency_us']:.0f}us  "
+                      f"{result['model_bytes'] / 1024:.0f}KB  {candidate_key(result['params'])}")
+
+    results = [done[candidate_key(params)] for params in candidates]
+    mark_pareto_front(results)
+    ranked = write_leaderboard(results, os.path.join(reports_dir, LEADERBOARD_FILE))
+    print(f"\nLeaderboard written to '{os.path.join(reports_dir, LEADERBOARD_FILE)}'")
+    print(f"{'rank':>4} {'AUC':>8} {'latency us':>11} {'size KB':>8} {'pareto':>7}  params")
+    for rank, r in enumerate(ranked[:10], start=1):
+        print(f"{rank:>4} {r['auc_mean']:>8.4f} {r['latency_us']:>11.0f} {r['model_bytes'] / 1024:>8.0f} "
+              f"{'yes' if r['pareto'] else '':>7}  {candidate_key(r['params'])}")
+    return ranked
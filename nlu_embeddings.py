@@ -0,0 +1,84 @@
+"""
+Nearest-neighbour intent classifier over a bank of labelled example messages.
+
+The bank (intent_examples.json) is built offline by build_intent_bank.py from
+messages labelled by Gemini. At runtime the incoming message is embedded with the
+SentenceTransformer that LightweightRAG already loads, and the k most similar bank
+examples vote on the intent.
+"""
+import json
+import os
+import numpy as np
+
+INTENT_BANK_PATH = os.getenv("INTENT_BANK_PATH", "intent_examples.json")
+NLU_EMBEDDINGS_ENABLED = os.getenv("NLU_EMBEDDINGS_ENABLED", "1") == "1"
+NLU_EMBEDDINGS_MIN_CONFIDENCE = float(os.getenv("NLU_EMBEDDINGS_MIN_CONFIDENCE", "0.8"))
+
+
+class EmbeddingIntentClassifier:
+    def __init__(self, texts, intents, encoder, k=5, min_similarity=0.6):
+        if not texts:
+            raise ValueError("The intent bank is empty")
+        self.texts = list(texts)
+        self.intents = np.array(intents)
+        self.encoder = encoder
+        self.k = min(k, len(self.texts))
+        self.min_similarity = min_similarity
+        # Normalised once, so a dot product is the cosine similarity.
+        self.embeddings = self._encode(self.texts)
+
+    def _encode(self, texts):
+        vectors = self.encoder.encode(texts, convert_to_numpy=True, batch_size=64).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def predict(self, message):
+        """Returns (intent, confidence) for one message."""
+        return self.predict_batch([message])[0]
+
+    def predict_batch(self, messages):
+        """
+        Returns [(intent, confidence), ...]. Confidence is the similarity-weighted
+        share of the k nearest examples that agree, or 0.0 when even the nearest
+        example is less similar than min_similarity.
+        """
+        similarities = self._encode(messages) @ self.embeddings.T
+        if self.k < similarities.shape[1]:
+            top = np.argpartition(-similarities, self.k - 1, axis=1)[:, :self.k]
+        else:
+            top = np.tile(np.arange(similarities.shape[1]), (len(messages), 1))
+
+        results = []
+        for row, neighbours in enumerate(top):
+            neighbour_sims = similarities[row, neighbours]
+            if neighbour_sims.max() < self.min_similarity:
+                results.append((None, 0.0))
+                continue
+            weights = np.clip(neighbour_sims, 0.0, None)
+            votes = {}
+            for intent, weight in zip(self.intents[neighbours], weights):
+                votes[intent] = votes.get(intent, 0.0) + float(weight)
+            best_intent = max(votes, key=votes.get)
+            total = sum(votes.values())
+            results.append((str(best_intent), votes[best_intent] / total if total else 0.0))
+        return results
+
+
+def load_intent_bank(bank_path=INTENT_BANK_PATH, allowed_intents=None):
+    """Reads [{"text": ..., "intent": ...}] and drops intents outside allowed_intents."""
+    with open(bank_path) as f:
+        data = json.load(f)
+    examples = [x for x in data if allowed_intents is None or x["intent"] in allowed_intents]
+    return [x["text"] for x in examples], [x["intent"] for x in examples]
+
+
+def load_intent_classifier(encoder, bank_path=INTENT_BANK_PATH, allowed_intents=None):
+    """Builds the classifier, or returns None when no bank has been built yet."""
+    if not os.path.exists(bank_path):
+        print(f"Warning: {bank_path} not found. Embedding intent classification will be disabled.")
+        return None
+    texts, intents = load_intent_bank(bank_path, allowed_intents)
+    if not texts:
+        print(f"Warning: {bank_path} has no usable examples. Embedding intent classification will be disabled.")
+        return None
+    return EmbeddingIntentClassifier(texts, intents, encoder)
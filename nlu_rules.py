@@ -0,0 +1,55 @@
+"""
+Rule-based fast path for the NLU.
+
+Structured commands ("log for ACC001: ...", "decision for 12: ...", "list my customers")
+are recognised with precompiled regular expressions, so they never need a Gemini call.
+Each rule carries a confidence; nlu_utils only trusts results at or above
+NLU_RULES_MIN_CONFIDENCE and sends everything else to the LLM.
+"""
+import os
+import re
+
+NLU_RULES_ENABLED = os.getenv("NLU_RULES_ENABLED", "1") == "1"
+NLU_RULES_MIN_CONFIDENCE = float(os.getenv("NLU_RULES_MIN_CONFIDENCE", "0.85"))
+
+ACCOUNT_NUMBER_PATTERN = re.compile(r"\bacc[\s#-]*(\d{1,12})\b", re.IGNORECASE)
+
+# (intent, confidence, pattern), checked in order; the first match wins.
+# The command formats that app.process_text_message parses come first, because
+# their free-text part can contain words that would trigger the looser rules below.
+INTENT_RULES = [
+    ("submit_decision", 0.99, r"^\s*decision\s+for\s+\d+\s*:"),
+    ("log_reason", 0.99, r"^\s*log(?:\s+(?:a\s+)?(?:reason|notes?))?\s+for\s+acc[\s#-]*\d+\s*:"),
+    ("log_reason", 0.9, r"^\s*log\s+(?:a\s+)?(?:reason|notes?)\b"),
+    ("get_pending_reports", 0.95, r"\b(?:pending|open)\s+reports?\b|\breports?\s+(?:to|for)\s+review\b"),
+    ("send_report", 0.9, r"\b(?:send|submit|escalate)\b.*\b(?:report|supervisor)\b"),
+    ("get_priority_plan", 0.95, r"\bpriority\s+(?:plan|list)\b|\bwho\s+should\s+i\s+(?:call|contact|visit)\b|\bprioriti[sz]e\b"),
+    ("get_customer_list", 0.95, r"^\s*(?:(?:list|show|get|see|view)\s+(?:me\s+)?)?(?:all\s+)?(?:my\s+)?customers?(?:\s+list)?\s*[.!?]*\s*$|\bcustomer\s+list\b|\b(?:list|show)\s+(?:me\s+)?(?:all\s+)?my\s+customers\b"),
+    ("get_customer_history", 0.9, r"\b(?:history|details?|record|status)\b.*\bacc[\s#-]*\d+|\bacc[\s#-]*\d+\b.*\b(?:history|details?|record|status)\b"),
+    ("get_customer_history", 0.85, r"^\s*(?:show|view|check|open)\s+(?:me\s+)?acc[\s#-]*\d+\s*[.!?]*\s*$"),
+    ("greet", 0.95, r"^\s*(?:hi|hello|hey|namaste|good\s+(?:morning|afternoon|evening))\b[\s!.,]*(?:there|bot)?[\s!.]*$"),
+    ("goodbye", 0.95, r"^\s*(?:bye|goodbye|good\s*night|see\s+you|thanks?(?:\s+you)?[,\s]*bye)\b[\s!.]*$"),
+]
+
+_COMPILED_RULES = [(intent, confidence, re.compile(pattern, re.IGNORECASE)) for intent, confidence, pattern in INTENT_RULES]
+
+
+def extract_account_number(message):
+    """Returns the first account number in the message in canonical form (ACC001), or None."""
+    match = ACCOUNT_NUMBER_PATTERN.search(message)
+    if match:
+        return f"ACC{match.group(1)}"
+    return None
+
+
+def classify(message):
+    """
+    Returns (intent, account_number, confidence). intent is None and confidence
+    is 0.0 when no rule matches.
+    """
+    account_number = extract_account_number(message)
+    for intent, confidence, pattern in _COMPILED_RULES:
+        if pattern.search(message):
+            return intent, account_number, confidence
+    return None, account_number, 0.0
+
@@ -1,9 +1,23 @@
 import os
+import re
 import json
-import google.generativeai as genai
+import threading
+from model_registry import register_model, get_model
+from response_cache import cached_llm_call
+from nlu_rules import NLU_RULES_ENABLED, NLU_RULES_MIN_CONFIDENCE, classify as classify_with_rules, extract_account_number
+import sensitive_utils.rag_faiss  # registers the "sensitive_rag" model
+from nlu_embeddings import NLU_EMBEDDINGS_ENABLED, NLU_EMBEDDINGS_MIN_CONFIDENCE, load_intent_classifier
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel('gemini-2.0-flash')
+GEMINI_MODEL_NAME = 'gemini-2.0-flash'
+
+def load_gemini_model():
+    # Imported on first use; the SDK is slow to import
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+register_model("nlu_llm", load_gemini_model)
 
 # NEW: Simplified 'log_reason' and added 'provide_notes' intent
 SYSTEM_PROMPT = """
@@ -33,18 +47,73 @@ Example user messages and their expected JSON output:
 - "who should I call first?" -> {"intent": "get_priority_plan", "account_number": null}
 """
 
+# The intents listed in SYSTEM_PROMPT; the local classifiers only ever answer with one of these
+KNOWN_INTENTS = re.findall(r"^- (\w+)$", SYSTEM_PROMPT, re.MULTILINE)
+
+# The embedding classifier reuses the SentenceTransformer already loaded for sensitive-data detection
+register_model("intent_classifier", lambda: load_intent_classifier(get_model("sensitive_rag").model, allowed_intents=KNOWN_INTENTS))
+
+# How many messages each NLU tier answered
+_tier_counts = {"rules": 0, "embeddings": 0, "llm": 0}
+_tier_counts_lock = threading.Lock()
+
+def _record_tier(tier):
+    with _tier_counts_lock:
+        _tier_counts[tier] += 1
+
+def nlu_stats():
+    with _tier_counts_lock:
+        counts = dict(_tier_counts)
+    total = sum(counts.values())
+    return {
+        **counts,
+        "total": total,
+        "local_hit_rate": round((counts["rules"] + counts["embeddings"]) / total, 4) if total else 0.0,
+        "rules_min_confidence": NLU_RULES_MIN_CONFIDENCE,
+        "embeddings_min_confidence": NLU_EMBEDDINGS_MIN_CONFIDENCE,
+    }
+
 def get_intent_and_entities(message):
+    """
+    Determines the user's intent and extracts entities. Structured commands are
+    recognised by nlu_rules, other messages by the embedding classifier, and the
+    Gemini LLM is only called when neither is confident.
+    """
+    if NLU_RULES_ENABLED:
+        intent, account_number, confidence = classify_with_rules(message)
+        if intent and confidence >= NLU_RULES_MIN_CONFIDENCE:
+            _record_tier("rules")
+            return intent, account_number
+
+    if NLU_EMBEDDINGS_ENABLED:
+        try:
+            classifier = get_model("intent_classifier")
+            if classifier:
+                intent, confidence = classifier.predict(message)
+                if intent and confidence >= NLU_EMBEDDINGS_MIN_CONFIDENCE:
+                    _record_tier("embeddings")
+                    return intent, extract_account_number(message)
+        except Exception as e:
+            print(f"Embedding NLU Error: {e}")
+
+    _record_tier("llm")
+    return get_intent_from_llm(message)
+
+def get_intent_from_llm(message):
     """
     Uses the Gemini LLM to determine the user's intent and extract entities.
     """
     try:
         full_prompt = f"{SYSTEM_PROMPT}\nUser message: \"{message}\""
-        response = model.generate_content(full_prompt)
-        json_response_str = response.text.strip().replace('```json', '').replace('```', '')
-        result = json.loads(json_response_str)
-        
-        intent = result.get("intent", "unknown")
-        account_number = result.get("account_number")
+
+        def ask_gemini():
+            response = get_model("nlu_llm").generate_content(full_prompt)
+            json_response_str = response.text.strip().replace('```json', '').replace('```', '')
+            result = json.loads(json_response_str)
+            return [result.get("intent", "unknown"), result.get("account_number")]
+
+        # Identical messages get the same answer, so repeated commands skip the LLM
+        intent, account_number = cached_llm_call(GEMINI_MODEL_NAME, full_prompt, ask_gemini)
         
         return intent, account_number
 
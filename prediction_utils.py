@@ -1,50 +1,134 @@
+import functools
+import hashlib
+import os
 import joblib
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+from model_registry import register_model, get_model, is_loaded
+from model_monitoring import PREDICTION_MONITORING, PredictionMonitor
+from scoring_engine import ENCODERS_PATH, FEATURE_COLUMNS, RecoveryScorer, load_encoders
+from tree_predictor import NumpyTreeEnsemble
 
-# Load the trained model when the application starts
-try:
-    model = joblib.load('recovery_model.pkl')
-    print("Predictive model loaded successfully.")
-except FileNotFoundError:
-    print("Warning: recovery_model.pkl not found. Predictive features will be disabled.")
-    model = None
+RECOVERY_MODEL_PATH = 'recovery_model.pkl'
+# "native" is the bare XGBoost booster from the UBJ export (bit-identical to the pickle,
+# multithreaded, fastest for large batches such as risk_score_job.py), "pickle" the sklearn
+# wrapper. "auto" picks the first of these that loads. "numpy" (opt-in only) is the
+# pure-NumPy tree predictor built from the JSON export: lower latency for single rows, but
+# its probabilities can differ from XGBoost's in the last float32 bit.
+# See benchmark_predictor.py and check_predictor_parity.py.
+RECOVERY_MODEL_FORMAT = os.getenv("RECOVERY_MODEL_FORMAT", "auto")
+AUTO_MODEL_FORMATS = ("native", "pickle")
+RECOVERY_MODEL_FILES = {
+    "numpy": 'recovery_model.json',
+    "native": 'recovery_model.ubj',
+    "pickle": RECOVERY_MODEL_PATH,
+}
+# Optional candidate model scored in the background next to the served one (shadow mode).
+# Any of the formats above; the format is taken from the file extension.
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH")
+
+def _load_model_file(model_format, path):
+    if model_format == "native":
+        import xgboost as xgb
+
+        booster = xgb.Booster()
+        booster.load_model(path)
+        return booster
+    if model_format == "numpy":
+        return NumpyTreeEnsemble.from_json(path)
+    return joblib.load(path)
+
+@functools.lru_cache(maxsize=None)
+def resolve_recovery_model():
+    """Returns (format, path, model) for the configured format, or (None, None, None)."""
+    formats = AUTO_MODEL_FORMATS if RECOVERY_MODEL_FORMAT == "auto" else [RECOVERY_MODEL_FORMAT]
+    for model_format in formats:
+        path = RECOVERY_MODEL_FILES[model_format]
+        if not os.path.exists(path):
+            continue
+        try:
+            return model_format, path, _load_model_file(model_format, path)
+        except (ImportError, ValueError) as e:
+            print(f"Warning: could not load {path} ({e}).")
+    return None, None, None
+
+def load_recovery_model():
+    """Loads the trained model on first use, in the fastest available serving format."""
+    model_format, path, model = resolve_recovery_model()
+    if model is None:
+        print("Warning: recovery model not found. Predictive features will be disabled.")
+        return None
+    print(f"Predictive model loaded successfully ({model_format}: {path}).")
+    return model
+
+def _model_format_for(path):
+    extension = os.path.splitext(path)[1]
+    return {".json": "numpy", ".ubj": "native"}.get(extension, "pickle")
+
+def load_prediction_monitor(encoders):
+    """Prediction log and drift monitor, with the shadow model if SHADOW_MODEL_PATH is set."""
+    shadow_predict = None
+    if SHADOW_MODEL_PATH:
+        try:
+            shadow = _load_model_file(_model_format_for(SHADOW_MODEL_PATH), SHADOW_MODEL_PATH)
+            shadow_predict = RecoveryScorer(shadow, encoders).predict_proba_matrix
+            print(f"Shadow model loaded ({SHADOW_MODEL_PATH}).")
+        except Exception as e:
+            print(f"Warning: could not load the shadow model {SHADOW_MODEL_PATH} ({e}).")
+    categorical_sizes = {col: len(categories) for col, categories in encoders["categories"].items()}
+    return PredictionMonitor(encoders.get("feature_columns", FEATURE_COLUMNS), categorical_sizes,
+                             shadow_predict=shadow_predict)
+
+def load_recovery_scorer():
+    """Wraps the model with the encoders saved by train_model.py (loaded once)."""
+    model = get_model("recovery_model")
+    if model is None:
+        return None
+    encoders = load_encoders()
+    monitor = load_prediction_monitor(encoders) if PREDICTION_MONITORING else None
+    return RecoveryScorer(model, encoders, monitor)
+
+register_model("recovery_model", load_recovery_model)
+register_model("recovery_scorer", load_recovery_scorer)
+
+def monitoring_stats():
+    """Logging, drift and shadow statistics, or None until the scorer has been used."""
+    if not is_loaded("recovery_scorer"):
+        return None
+    scorer = get_model("recovery_scorer")
+    if scorer is None or scorer.monitor is None:
+        return None
+    return scorer.monitor.stats()
+
+@functools.lru_cache(maxsize=None)
+def recovery_model_version():
+    """
+    Short hash of the model files and the encoders. Stored with every precomputed risk
+    score so scores from an older model are recognised. It does not depend on the serving
+    format, so processes using different formats agree. None if there is no model.
+    """
+    if resolve_recovery_model()[2] is None:
+        return None
+    digest = hashlib.sha256()
+    for path in (*RECOVERY_MODEL_FILES.values(), ENCODERS_PATH):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
 
 def make_prediction(customer_data):
     """
     Uses the loaded model to predict the likelihood of loan recovery.
     """
-    if not model:
+    scorer = get_model("recovery_scorer")
+    if not scorer:
         return "Predictive model is not available."
 
     try:
-        # 1. Define the exact column order the model expects
-        expected_columns = [
-            'Age', 'Income', 'LoanAmount', 'CreditScore', 'MonthsEmployed', 
-            'NumCreditLines', 'InterestRate', 'LoanTerm', 'DTIRatio', 'Education', 
-            'EmploymentType', 'MaritalStatus', 'HasMortgage', 'HasDependents', 
-            'LoanPurpose', 'HasCoSigner'
-        ]
-        
-        # 2. Convert the single customer's data into a DataFrame with the correct column order
-        df = pd.DataFrame([customer_data], columns=expected_columns)
-
-        # 3. Preprocess the data in the exact same way as in training
-        # Note: In a production system, you would save and load the trained LabelEncoders
-        # to ensure consistent mapping between text and numbers.
-        for col in df.select_dtypes(include=['object']).columns:
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col])
-        
-        # 4. Make the prediction
-        prediction = model.predict(df)
-        probability = model.predict_proba(df)
-
-        # 5. Format the output
-        if prediction[0] == 0:
-            return f"Prediction: High chance of recovery (Probability: {probability[0][0]*100:.2f}%)."
+        risk = float(scorer.predict_proba([customer_data])[0])
+
+        if risk < 0.5:
+            return f"Prediction: High chance of recovery (Probability: {(1 - risk)*100:.2f}%)."
         else:
-            return f"Prediction: High risk of default (Probability: {probability[0][1]*100:.2f}%)."
+            return f"Prediction: High risk of default (Probability: {risk*100:.2f}%)."
 
     except Exception as e:
         print(f"Prediction Error: {e}")
@@ -55,48 +139,40 @@ def generate_model_based_plan(all_customer_data):
     Uses the loaded model to predict default risk for a list of customers and
     sorts them to create a priority plan.
     """
-    if not model:
+    scorer = get_model("recovery_scorer")
+    if not scorer:
         return "Predictive model is not available."
     if not all_customer_data:
         return "You have no customers to create a plan for."
 
     try:
-        expected_columns = [
-            'Age', 'Income', 'LoanAmount', 'CreditScore', 'MonthsEmployed', 
-            'NumCreditLines', 'InterestRate', 'LoanTerm', 'DTIRatio', 'Education', 
-            'EmploymentType', 'MaritalStatus', 'HasMortgage', 'HasDependents', 
-            'LoanPurpose', 'HasCoSigner'
-        ]
-        
-        df = pd.DataFrame(all_customer_data)
-        df_processed = df.copy()
-        for col in df_processed.select_dtypes(include=['object']).columns:
-            le = LabelEncoder()
-            df_processed[col] = le.fit_transform(df_processed[col])
-        
-        df_processed = df_processed[expected_columns]
-        probabilities = model.predict_proba(df_processed)[:, 1]
-        df['risk_score'] = probabilities
-        df_sorted = df.sort_values(by='risk_score', ascending=False)
-
-        # --- THIS IS THE KEY FIX ---
-        # We now create a much simpler and more actionable reply.
-        reply_msg = "🤖 Here is your AI-generated priority plan:\n"
-        for index, row in df_sorted.iterrows():
-            # Assign a clear priority level based on the risk score
-            if row['risk_score'] > 0.5:
-                priority = "High Priority"
-            elif row['risk_score'] > 0.2:
-                priority = "Medium Priority"
-            else:
-                priority = "Low Priority"
-            
-            reply_msg += f"\n--------------------\n"
-            reply_msg += f"👤 *{row['customer_name']} ({row['account_number']})*\n"
-            reply_msg += f"   - *Priority:* {priority}"
-        
-        return reply_msg
+        # All customers are scored in one call; a stable sort keeps ties in query order.
+        risk_scores = scorer.predict_proba(all_customer_data)
+        order = (-risk_scores).argsort(kind="stable")
+
+        return format_priority_plan(
+            dict(all_customer_data[i], risk_score=float(risk_scores[i])) for i in order
+        )
 
     except Exception as e:
         print(f"Priority Plan Error: {e}")
-        return "Could not generate a priority plan for your customers."
\ No newline at end of file
+        return "Could not generate a priority plan for your customers."
+
+def format_priority_plan(ranked_customers):
+    """Builds the priority-plan reply from customers already sorted by risk_score, highest first."""
+    # We now create a much simpler and more actionable reply.
+    lines = ["🤖 Here is your AI-generated priority plan:\n"]
+    for row in ranked_customers:
+        # Assign a clear priority level based on the risk score
+        if row['risk_score'] > 0.5:
+            priority = "High Priority"
+        elif row['risk_score'] > 0.2:
+            priority = "Medium Priority"
+        else:
+            priority = "Low Priority"
+
+        lines.append(f"\n--------------------\n")
+        lines.append(f"👤 *{row['customer_name']} ({row['account_number']})*\n")
+        lines.append(f"   - *Priority:* {priority}")
+
+    return "".join(lines)
@@ -0,0 +1,56 @@
+"""
+Reports where application startup time goes.
+
+Prints the import time of each application module (in the order app.py imports
+them), then the time taken to load and warm up every registered model.
+For a per-package breakdown of the imports themselves, run:
+    python -X importtime -c "import app" 2> importtime.log
+
+Usage:
+    python profile_startup.py            # imports only (what a lazy worker pays)
+    python profile_startup.py --preload  # also load and warm up every model
+"""
+import argparse
+import importlib
+import sys
+import time
+
+MODULES = [
+    "db_pool",
+    "db_utils",
+    "twilio_utils",
+    "prediction_utils",
+    "llm_utils",
+    "nlu_utils",
+    "transcription_utils",
+    "sensitive_utils.detector",
+    "app",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preload", action="store_true", help="also load and warm up every registered model")
+    args = parser.parse_args()
+
+    total_start = time.perf_counter()
+    print(f"{'module':<28} {'import s':>10}")
+    for name in MODULES:
+        if name in sys.modules:
+            continue
+        start = time.perf_counter()
+        importlib.import_module(name)
+        print(f"{name:<28} {time.perf_counter() - start:>10.3f}")
+    print(f"{'total':<28} {time.perf_counter() - total_start:>10.3f}")
+
+    from model_registry import preload_models, model_load_report
+
+    if args.preload:
+        preload_models()
+    print(f"\n{'model':<20} {'loaded':>7} {'load s':>8} {'warm-up s':>10}")
+    for name, info in model_load_report().items():
+        print(f"{name:<20} {str(info['loaded']):>7} {info['load_s']:>8.3f} {info['warmup_s']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
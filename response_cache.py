@@ -0,0 +1,238 @@
+"""
+Content-addressed cache for LLM responses.
+
+Entries are keyed on a hash of the model name and the whitespace-normalised prompt,
+kept in an in-memory LRU with a TTL, and optionally written through to a SQLite file
+so they survive restarts and are shared between worker processes. Cached replies
+(supervisor summaries, priority plans) contain customer names, loan figures and agent
+notes in clear, so the LLM cache only uses a file when LLM_CACHE_DB_PATH is set;
+otherwise each worker keeps its own in-memory cache. An entry can carry
+a tag (e.g. an account number) so every entry derived from that account can be
+dropped at once when its data changes.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+# Empty (the default) disables the on-disk store.
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")
+# Row cap of the on-disk store; the oldest entries are dropped beyond it.
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv("LLM_CACHE_MAX_DISK_ENTRIES", "50000"))
+# Expired and surplus rows are removed from disk at most this often, by put().
+DISK_PURGE_INTERVAL_SECONDS = 60.0
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def make_cache_key(model_name, prompt):
+    normalized = _WHITESPACE.sub(" ", prompt).strip()
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS, db_path=None,
+                 max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self._last_disk_purge = 0.0
+        self._entries = OrderedDict()  # key -> (expires_at, value, tag)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    # --- on-disk store ---
+
+    def _disk(self):
+        if not self.db_path:
+            return None
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=5.0)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    tag TEXT,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_tag ON response_cache (tag)")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache (expires_at)")
+            connection.commit()
+            self._local.connection = connection
+        return connection
+
+    def _disk_get(self, key, now):
+        connection = self._disk()
+        if connection is None:
+            return None
+        row = connection.execute(
+            "SELECT value, tag, expires_at FROM response_cache WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None or row[2] <= now:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _disk_put(self, key, value, tag, expires_at):
+        connection = self._disk()
+        if connection is None:
+            return
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO response_cache (cache_key, value, tag, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), tag, expires_at),
+            )
+
+    def _disk_purge(self, now):
+        """Deletes expired rows, then the rows expiring soonest (the oldest) beyond max_disk_entries."""
+        connection = self._disk()
+        if connection is None:
+            return
+        with connection:
+            connection.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            surplus = connection.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_disk_entries
+            if surplus > 0:
+                connection.execute(
+                    "DELETE FROM response_cache WHERE cache_key IN "
+                    "(SELECT cache_key FROM response_cache ORDER BY expires_at LIMIT ?)",
+                    (surplus,),
+                )
+
+    # --- in-memory LRU ---
+
+    def _remember(self, key, value, tag, expires_at):
+        # Caller holds self._lock.
+        if key in self._entries:
+            self._forget(key)
+        self._entries[key] = (expires_at, value, tag)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._forget(oldest_key)
+            self._stats["evictions"] += 1
+
+    def _forget(self, key):
+        # Caller holds self._lock.
+        _, _, tag = self._entries.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    # --- public API ---
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[1]
+                self._forget(key)
+                self._stats["expirations"] += 1
+
+        try:
+            disk_entry = self._disk_get(key, now)
+        except sqlite3.Error as e:
+            print(f"Response cache read error: {e}")
+            disk_entry = None
+
+        with self._lock:
+            if disk_entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, tag, expires_at = disk_entry
+            self._remember(key, value, tag, expires_at)
+            self._stats["disk_hits"] += 1
+            return value
+
+    def put(self, key, value, tag=None):
+        """Stores a JSON-serialisable value."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, tag, expires_at)
+            purge_due = bool(self.db_path) and now - self._last_disk_purge >= DISK_PURGE_INTERVAL_SECONDS
+            if purge_due:
+                self._last_disk_purge = now
+        try:
+            self._disk_put(key, value, tag, expires_at)
+            if purge_due:
+                self._disk_purge(now)
+        except sqlite3.Error as e:
+            print(f"Response cache write error: {e}")
+
+    def invalidate_tag(self, tag):
+        """Drops every entry stored with this tag."""
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._forget(key)
+            self._stats["invalidations"] += 1
+        try:
+            connection = self._disk()
+            if connection is not None:
+                with connection:
+                    connection.execute("DELETE FROM response_cache WHERE tag = ?", (tag,))
+        except sqlite3.Error as e:
+            print(f"Response cache invalidation error: {e}")
+
+    def purge_expired(self):
+        """Removes expired entries from memory and disk (housekeeping; lookups already ignore them)."""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (expires_at, _, _) in self._entries.items() if expires_at <= now]:
+                self._forget(key)
+                self._stats["expirations"] += 1
+        try:
+            self._disk_purge(now)
+        except sqlite3.Error as e:
+            print(f"Response cache purge error: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["max_disk_entries"] = self.max_disk_entries
+        return stats
+
+
+llm_cache = ResponseCache(db_path=LLM_CACHE_DB_PATH or None, max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES)
+
+
+def cached_llm_call(model_name, prompt, call, tag=None):
+    """
+    Returns call() for this prompt, reusing a cached result when one exists.
+    call() must return a JSON-serialisable value; it should raise on failure so
+    that errors are never cached.
+    """
+    if not LLM_CACHE_ENABLED:
+        return call()
+    key = make_cache_key(model_name, prompt)
+    value = llm_cache.get(key)
+    if value is None:
+        value = call()
+        llm_cache.put(key, value, tag=tag)
+    return value
@@ -0,0 +1,107 @@
+"""
+Precomputes the recovery model's risk score for every customer profile into the
+risk_scores table, so priority plans are a single indexed query instead of scoring
+the agent's whole portfolio on every request.
+
+Profiles are streamed from SQLite in chunks (keyset pagination on profile_id) and
+each chunk is scored with one vectorised call. By default only profiles that have
+no score yet, were changed after their last score (customer_profile.updated_at), or
+were scored by a different model version are re-scored.
+
+Meant to run nightly, e.g. from cron:
+    0 2 * * *  cd /srv/transcription-bot && python risk_score_job.py
+
+Usage:
+    python risk_score_job.py [--full] [--chunk-size 5000]
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+from db_pool import get_connection, close_connection
+from db_utils import STALE_SCORE_CONDITION
+from migrations import run_migrations
+from model_registry import get_model
+from prediction_utils import recovery_model_version
+from scoring_engine import FEATURE_COLUMNS
+
+RISK_SCORE_CHUNK_SIZE = int(os.getenv("RISK_SCORE_CHUNK_SIZE", "5000"))
+
+STALE_PROFILES_QUERY = f'''
+    SELECT p.profile_id, p.account_number, {", ".join("p." + col for col in FEATURE_COLUMNS)}
+    FROM customer_profile p
+    LEFT JOIN risk_scores r ON p.account_number = r.account_number
+    WHERE p.profile_id > ?
+      AND (? OR {STALE_SCORE_CONDITION})
+    ORDER BY p.profile_id
+    LIMIT ?
+'''
+
+
+def score_profiles(full=False, chunk_size=RISK_SCORE_CHUNK_SIZE):
+    """
+    Scores stale profiles (every profile with full=True) and removes scores whose
+    profile no longer exists. Returns a summary dict, or None if there is no model.
+    """
+    scorer = get_model("recovery_scorer")
+    if not scorer:
+        print("Predictive model is not available; no risk scores computed.")
+        return None
+    model_version = recovery_model_version()
+
+    connection = get_connection()
+    # Scores are stamped with the time the run started, so a profile edited while the
+    # job is running is picked up again by the next run.
+    run_started = connection.execute("SELECT strftime('%Y-%m-%d %H:%M:%f', 'now')").fetchone()[0]
+    start = time.perf_counter()
+    last_profile_id = 0
+    scored = 0
+
+    while True:
+        rows = connection.execute(STALE_PROFILES_QUERY, (last_profile_id, int(full), model_version, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_profile_id = rows[-1]['profile_id']
+        risk_scores = scorer.predict_proba([dict(row) for row in rows], record=False)
+        try:
+            connection.executemany(
+                '''INSERT OR REPLACE INTO risk_scores (account_number, risk_score, model_version, scored_at)
+                   VALUES (?, ?, ?, ?)''',
+                [(row['account_number'], float(score), model_version, run_started) for row, score in zip(rows, risk_scores)])
+            connection.commit()
+        except sqlite3.Error as e:
+            print(f"Database Error saving risk scores: {e}")
+            connection.rollback()
+            raise
+        scored += len(rows)
+        print(f"  scored {scored:,} profiles")
+
+    removed = connection.execute(
+        "DELETE FROM risk_scores WHERE account_number NOT IN (SELECT account_number FROM customer_profile)").rowcount
+    connection.commit()
+
+    return {
+        "scored": scored,
+        "removed": removed,
+        "model_version": model_version,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="re-score every profile, not only the changed ones")
+    parser.add_argument("--chunk-size", type=int, default=RISK_SCORE_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    run_migrations(get_connection())
+    summary = score_profiles(full=args.full, chunk_size=args.chunk_size)
+    if summary:
+        print(f"Scored {summary['scored']:,} profiles and removed {summary['removed']:,} orphaned scores "
+              f"with model {summary['model_version']} in {summary['seconds']}s.")
+    close_connection()
+
+
+if __name__ == "__main__":
+    main()
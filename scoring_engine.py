@@ -0,0 +1,106 @@
+"""
+Vectorised scoring for the recovery model.
+
+Customer rows (dicts from db_utils) are written straight into a preallocated float32
+matrix using the categorical encodings saved by train_model.py, and the whole matrix
+is scored with one call into the booster (or the NumPy tree predictor, see
+tree_predictor.py).
+"""
+import json
+import os
+import numpy as np
+
+ENCODERS_PATH = os.getenv("RECOVERY_ENCODERS_PATH", "recovery_encoders.json")
+
+# Column order the model was trained on
+FEATURE_COLUMNS = [
+    'Age', 'Income', 'LoanAmount', 'CreditScore', 'MonthsEmployed',
+    'NumCreditLines', 'InterestRate', 'LoanTerm', 'DTIRatio', 'Education',
+    'EmploymentType', 'MaritalStatus', 'HasMortgage', 'HasDependents',
+    'LoanPurpose', 'HasCoSigner'
+]
+CATEGORICAL_COLUMNS = [
+    'Education', 'EmploymentType', 'MaritalStatus', 'HasMortgage',
+    'HasDependents', 'LoanPurpose', 'HasCoSigner'
+]
+
+# Used only when recovery_encoders.json is missing (models trained before it existed).
+# LabelEncoder assigns codes in sorted order, so these sorted category lists of the
+# training dataset reproduce the mapping the original model was trained with.
+DEFAULT_CATEGORIES = {
+    'Education': ["Bachelor's", 'High School', "Master's", 'PhD'],
+    'EmploymentType': ['Full-time', 'Part-time', 'Self-employed', 'Unemployed'],
+    'MaritalStatus': ['Divorced', 'Married', 'Single'],
+    'HasMortgage': ['No', 'Yes'],
+    'HasDependents': ['No', 'Yes'],
+    'LoanPurpose': ['Auto', 'Business', 'Education', 'Home', 'Other'],
+    'HasCoSigner': ['No', 'Yes'],
+}
+
+
+def save_encoders(categories, fill_values, path=ENCODERS_PATH):
+    """Writes the category order of each encoded column and the imputation values used in training."""
+    with open(path, "w") as f:
+        json.dump({"feature_columns": FEATURE_COLUMNS, "categories": categories, "fill_values": fill_values}, f, indent=2)
+
+
+def load_encoders(path=ENCODERS_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    print(f"Warning: {path} not found. Using the default category encodings.")
+    return {"feature_columns": FEATURE_COLUMNS, "categories": DEFAULT_CATEGORIES, "fill_values": {}}
+
+
+class RecoveryScorer:
+    def __init__(self, model, encoders, monitor=None):
+        self.model = model
+        # Optional PredictionMonitor (model_monitoring.py) that logs what is scored
+        self.monitor = monitor
+        self.feature_columns = encoders.get("feature_columns", FEATURE_COLUMNS)
+        # category -> code lookups; categories never seen in training become NaN (treated as missing)
+        self.codes = {
+            col: {category: float(code) for code, category in enumerate(categories)}
+            for col, categories in encoders["categories"].items()
+        }
+        self.fill_values = encoders.get("fill_values", {})
+        # The sklearn wrapper is bypassed: its booster (or a bare Booster loaded from UBJ)
+        # is called directly, and NumPy tree predictors take the matrix as-is.
+        if hasattr(model, "predict_proba_matrix"):
+            self._predict = model.predict_proba_matrix
+        elif hasattr(model, "get_booster") or hasattr(model, "inplace_predict"):
+            booster = model.get_booster() if hasattr(model, "get_booster") else model
+            # The matrix is already in training column order; it has no names to validate.
+            self._predict = lambda matrix: booster.inplace_predict(matrix, missing=np.nan, validate_features=False)
+        else:
+            self._predict = lambda matrix: model.predict_proba(matrix)[:, 1]
+
+    def _encode_value(self, col, value):
+        if value is None and col in self.fill_values:
+            value = self.fill_values[col]
+        if col in self.codes:
+            return self.codes[col].get(value, np.nan)
+        return np.nan if value is None else float(value)
+
+    def build_matrix(self, rows):
+        """Builds the (len(rows), n_features) float32 feature matrix without a DataFrame."""
+        matrix = np.empty((len(rows), len(self.feature_columns)), dtype=np.float32)
+        for j, col in enumerate(self.feature_columns):
+            matrix[:, j] = [self._encode_value(col, row.get(col)) for row in rows]
+        return matrix
+
+    def predict_proba(self, rows, record=True):
+        """
+        Returns the probability of default (class 1) for every row. The rows are passed
+        to the monitor unless record=False (e.g. batch rescoring, which is not traffic).
+        """
+        if not rows:
+            return np.empty(0, dtype=np.float32)
+        matrix = self.build_matrix(rows)
+        probabilities = self.predict_proba_matrix(matrix)
+        if record and self.monitor is not None:
+            self.monitor.record(matrix, probabilities)
+        return probabilities
+
+    def predict_proba_matrix(self, matrix):
+        return self._predict(matrix)
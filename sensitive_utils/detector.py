@@ -1,8 +1,10 @@
+import os
 import re
 import nltk
 from nltk.tokenize import sent_tokenize
-from sensitive_utils.encryptor import encrypt_text, sensitive_data_log
-from sensitive_utils.rag_faiss import LightweightRAG
+from sensitive_utils.encryptor import encrypt_text, token_vault
+import sensitive_utils.rag_faiss  # registers the "sensitive_rag" model
+from model_registry import get_model
 
 
 PATTERNS = [
@@ -14,27 +16,87 @@ PATTERNS = [
     (r'\b\d{4,6}\b', 'PIN'), # Added PIN pattern
 ]
 
-rag = LightweightRAG()
+# All patterns compiled into one alternation, in PATTERNS order. At any position the
+# first alternative that matches wins, so the list order is also the priority order
+# (a 12-digit AADHAAR is never re-matched as an ACCOUNT or PIN), and finditer yields
+# non-overlapping spans in a single left-to-right scan.
+SENSITIVE_PATTERN = re.compile("|".join(f"(?P<{label}>{pattern})" for pattern, label in PATTERNS))
+# Every pattern needs a digit except EMAIL, which needs an '@'. Most chat sentences
+# have neither, and this character check rejects them much faster than the full scan.
+_MAY_BE_SENSITIVE = re.compile(r"[0-9@]")
+
+
+def mask_sensitive_spans(sent: str, encrypt=None):
+    """
+    Replaces every sensitive span in the sentence with its token in one pass.
+    All spans are sealed in the token vault with one bulk call unless a per-value
+    encrypt(value, label) function is given. Returns (masked_sentence, found).
+    """
+    if not _MAY_BE_SENSITIVE.search(sent):
+        return sent, False
+
+    matches = list(SENSITIVE_PATTERN.finditer(sent))
+    if not matches:
+        return sent, False
+    if encrypt is None:
+        tokens = token_vault.encrypt_many([(match.group(), match.lastgroup) for match in matches])
+    else:
+        tokens = [encrypt(match.group(), match.lastgroup) for match in matches]
+
+    pieces = []
+    last_end = 0
+    for match, token in zip(matches, tokens):
+        pieces.append(sent[last_end:match.start()])
+        pieces.append(token)
+        last_end = match.end()
+    pieces.append(sent[last_end:])
+    return "".join(pieces), True
+
+
+# Sentences with no pattern match only go to the (much slower) embedding lookup if
+# they mention something that could be a credential or identity document.
+RAG_DISTANCE_THRESHOLD = 0.5
+RAG_PREFILTER_ENABLED = os.getenv("RAG_PREFILTER_ENABLED", "1") == "1"
+SENSITIVE_KEYWORDS = [
+    "pin", "otp", "cvv", "password", "passcode", "code", "secret",
+    "aadhaar", "aadhar", "pan", "passport", "licence", "license", "voter",
+    "account", "a/c", "card", "debit", "credit", "ifsc", "upi", "bank", "net banking",
+    "phone", "mobile", "email", "mail", "number", "dob", "birth", "address",
+]
+_KEYWORD_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in SENSITIVE_KEYWORDS) + r")\b", re.IGNORECASE)
+
+
+def may_need_rag(sent: str) -> bool:
+    """Cheap lexical gate in front of the embedding lookup."""
+    return not RAG_PREFILTER_ENABLED or bool(_KEYWORD_PATTERN.search(sent))
+
+
+def detect_and_encrypt_sensitive_batch(texts):
+    """
+    Masks sensitive data in several messages at once. Sentences that no pattern
+    matches (and that pass the keyword gate) are embedded together in one batch
+    and searched against the example index with a single FAISS call.
+    """
+    messages = [sent_tokenize(text) for text in texts]
+    rag_candidates = []
+
+    for message_index, sentences in enumerate(messages):
+        for sentence_index, sent in enumerate(sentences):
+            masked, found = mask_sensitive_spans(sent)
+            sentences[sentence_index] = masked
+            if not found and may_need_rag(sent):
+                rag_candidates.append((message_index, sentence_index))
+
+    if rag_candidates:
+        candidate_sentences = [messages[m][s] for m, s in rag_candidates]
+        results = get_model("sensitive_rag").query_batch(candidate_sentences)
+        for (message_index, sentence_index), (example, label, distance) in zip(rag_candidates, results):
+            if distance < RAG_DISTANCE_THRESHOLD:
+                sentences = messages[message_index]
+                sentences[sentence_index] = encrypt_text(sentences[sentence_index], label)
+
+    return [" ".join(sentences) for sentences in messages]
+
 
 def detect_and_encrypt_sensitive(text: str) -> str:
-    sensitive_data_log.clear()
-    sentences = sent_tokenize(text)
-    new_sentences = []
-
-    for sent in sentences:
-        found = False
-        # Correctly nested loop for pattern matching
-        for pattern, label in PATTERNS:
-            matches = re.findall(pattern, sent)
-            for match in matches:
-                sent = sent.replace(match, encrypt_text(match, label))
-                found = True
-
-        if not found:
-            example, label, distance = rag.query(sent)
-            if distance < 0.5:
-                sent = encrypt_text(sent, label)
-
-        new_sentences.append(sent)
-
-    return " ".join(new_sentences)
\ No newline at end of file
+    return detect_and_encrypt_sensitive_batch([text])[0]
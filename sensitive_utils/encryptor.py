@@ -1,19 +1,18 @@
 import os
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
+from sensitive_utils.token_vault import TokenVault
 
 load_dotenv()
 fernet = Fernet(os.getenv("FERNET_KEY").encode())
-sensitive_data_log = {}
+token_vault = TokenVault(
+    fernet,
+    max_entries=int(os.getenv("TOKEN_VAULT_MAX_ENTRIES", "100000")),
+    ttl_seconds=float(os.getenv("TOKEN_VAULT_TTL_SECONDS", "86400")),
+)
 
 def encrypt_text(text: str, label: str = "SENSITIVE") -> str:
-    encrypted = fernet.encrypt(text.encode()).decode()
-    token_label = f"***{label.upper()}***"
-    sensitive_data_log[token_label] = encrypted
-    return token_label
+    return token_vault.encrypt(text, label)
 
 def decrypt_text(token_label: str) -> str:
-    token = sensitive_data_log.get(token_label)
-    if token:
-        return fernet.decrypt(token.encode()).decode()
-    return token_label
+    return token_vault.decrypt(token_label)
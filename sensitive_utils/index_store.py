@@ -0,0 +1,128 @@
+"""
+On-disk cache for LightweightRAG's example embeddings and FAISS index.
+
+Embeddings are stored per encoder model as a raw float32 matrix (<model>.f32) plus a
+JSON sidecar listing the text of each row. Loading memory-maps the matrix, and new
+examples are appended to the end of the file, so only texts never seen before are
+ever encoded.
+
+Appends from several processes (gunicorn workers) are serialised with an flock on
+<model>.lock; each append re-reads the sidecar first, and the sidecar is replaced
+atomically, so rows and texts always stay aligned. Saved indexes are published
+under the same lock, also with an atomic replace (see rag_faiss.py).
+
+Built indexes are saved under a key derived from the model name, the index type and
+the examples, and are reused until any of them change.
+"""
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single-process use only
+    fcntl = None
+
+RAG_CACHE_DIR = os.getenv("RAG_CACHE_DIR", "rag_cache")
+
+
+def _hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def examples_key(model_name, index_type, texts, labels):
+    return _hash(model_name, index_type, json.dumps([texts, labels]))
+
+
+class EmbeddingStore:
+    def __init__(self, model_name, cache_dir=RAG_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        prefix = os.path.join(cache_dir, _hash(model_name))
+        self.matrix_path = prefix + ".f32"
+        self.meta_path = prefix + ".json"
+        self.lock_path = prefix + ".lock"
+        self.texts = []
+        self.dim = None
+        self.rows = {}
+        with self.locked():
+            self._reload()
+
+    @contextmanager
+    def locked(self):
+        """Exclusive cross-process lock on this model's cache files (embeddings and saved indexes)."""
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reload(self):
+        """Re-reads the sidecar (caller holds the lock), picking up rows other processes appended."""
+        texts, dim = [], None
+        if os.path.exists(self.meta_path) and os.path.exists(self.matrix_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            expected_bytes = len(meta["texts"]) * meta["dim"] * 4
+            actual_bytes = os.path.getsize(self.matrix_path)
+            if actual_bytes >= expected_bytes:
+                texts, dim = meta["texts"], meta["dim"]
+                if actual_bytes > expected_bytes:
+                    # Rows of an append that crashed before its sidecar was written.
+                    os.truncate(self.matrix_path, expected_bytes)
+            else:
+                print("Warning: RAG embedding cache is inconsistent, rebuilding it.")
+                os.remove(self.matrix_path)
+        elif os.path.exists(self.matrix_path):
+            os.remove(self.matrix_path)
+        self.texts = texts
+        self.dim = dim
+        self.rows = {text: i for i, text in enumerate(texts)}
+
+    def missing(self, texts):
+        """Texts that have no stored embedding yet (deduplicated, in order)."""
+        return [t for t in dict.fromkeys(texts) if t not in self.rows]
+
+    def append(self, texts, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self.locked():
+            self._reload()
+            # Another process may have stored some of these texts in the meantime.
+            new = [i for i, text in enumerate(texts) if text not in self.rows]
+            if not new:
+                return
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            with open(self.matrix_path, "ab") as f:
+                f.write(vectors[new].tobytes())
+            for i in new:
+                self.rows[texts[i]] = len(self.texts)
+                self.texts.append(texts[i])
+            # Written after the matrix so a crash in between is caught by the size check,
+            # and replaced atomically so readers never see a partial file.
+            tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"dim": self.dim, "texts": self.texts}, f)
+            os.replace(tmp_path, self.meta_path)
+
+    def matrix(self):
+        """Memory-mapped view of every stored embedding."""
+        if not self.texts:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(len(self.texts), self.dim))
+
+    def vectors_for(self, texts):
+        matrix = self.matrix()
+        return np.ascontiguousarray(matrix[[self.rows[t] for t in texts]])
+
+
+def index_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.faiss")
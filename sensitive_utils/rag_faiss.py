@@ -1,24 +1,156 @@
 import json
+import os
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
+from model_registry import register_model
+from sensitive_utils.index_store import RAG_CACHE_DIR, EmbeddingStore, examples_key, index_path
+
+# "flat" is exact brute force. "ivf" and "hnsw" are approximate and only pay off
+# with thousands of examples (see benchmark_rag_index.py for recall vs latency).
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+# Below this many examples an approximate index is not worth it; flat is used instead.
+RAG_APPROXIMATE_MIN_EXAMPLES = int(os.getenv("RAG_APPROXIMATE_MIN_EXAMPLES", "2000"))
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+
+
+def build_faiss_index(vectors, index_type="flat"):
+    """Builds a FAISS L2 index of the requested type over the given vectors."""
+    import faiss
+
+    count, dim = vectors.shape
+    if index_type == "ivf":
+        nlist = max(1, int(np.sqrt(count)))
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        index.train(vectors)
+        index.nprobe = min(RAG_IVF_NPROBE, nlist)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32)
+        index.hnsw.efConstruction = 80
+        index.hnsw.efSearch = RAG_HNSW_EF_SEARCH
+    elif index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    else:
+        raise ValueError(f"Unknown RAG index type '{index_type}'")
+    index.add(vectors)
+    return index
+
+
+def _save_index(index, path):
+    """Writes next to path and renames, so workers memory-mapping the old file never see a partial one."""
+    import faiss
+
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
 
 class LightweightRAG:
-    def __init__(self, example_file="examples.json", model_name="all-MiniLM-L6-v2"):
+    def __init__(self, example_file="examples.json", model_name="all-MiniLM-L6-v2", index_type=RAG_INDEX_TYPE, cache_dir=RAG_CACHE_DIR):
+        # Imported here so that importing this module does not pull in torch and faiss
+        from sentence_transformers import SentenceTransformer
+
         with open(example_file) as f:
             data = json.load(f)
 
+        self.example_file = example_file
+        self.model_name = model_name
+        self.cache_dir = cache_dir
         self.examples = [x["text"] for x in data]
         self.labels = [x["label"] for x in data]
         self.model = SentenceTransformer(model_name)
-        self.embeddings = self.model.encode(self.examples, convert_to_numpy=True)
+        if index_type != "flat" and len(self.examples) < RAG_APPROXIMATE_MIN_EXAMPLES:
+            index_type = "flat"
+        self.index_type = index_type
+
+        # Only examples that were never encoded before are encoded now.
+        self.store = EmbeddingStore(model_name, cache_dir)
+        self._index_is_mapped = False
+        self._encode_missing(self.examples)
+        self.index = self._load_or_build_index()
+
+    def _encode_missing(self, texts):
+        missing = self.store.missing(texts)
+        if missing:
+            vectors = self.model.encode(missing, convert_to_numpy=True, batch_size=64)
+            self.store.append(missing, vectors)
 
-        dim = self.embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dim)
-        self.index.add(self.embeddings)
+    def _index_key(self):
+        return examples_key(self.model_name, self.index_type, self.examples, self.labels)
+
+    def _read_index(self, path):
+        import faiss
+
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self._index_is_mapped = True
+            return index
+        except RuntimeError:
+            # Not every index type can be memory-mapped.
+            return faiss.read_index(path)
+
+    def _load_or_build_index(self):
+        path = index_path(self.cache_dir, self._index_key())
+        if os.path.exists(path):
+            return self._read_index(path)
+
+        with self.store.locked():
+            # Another worker may have built it while this one waited for the lock.
+            if os.path.exists(path):
+                return self._read_index(path)
+            index = build_faiss_index(self.store.vectors_for(self.examples), self.index_type)
+            _save_index(index, path)
+        return index
+
+    def add_examples(self, new_examples, save=True):
+        """
+        Adds [{"text": ..., "label": ...}] without re-encoding the existing examples.
+        New vectors are appended to the embedding cache and to the live index; with
+        save=True the example file and the saved index are updated too.
+        """
+        import faiss
+
+        known = set(self.examples)
+        new_examples = [x for x in new_examples if x["text"] not in known]
+        if not new_examples:
+            return 0
+        texts = [x["text"] for x in new_examples]
+        self._encode_missing(texts)
+
+        if self._index_is_mapped:
+            # A memory-mapped index is read-only; take an in-memory copy before adding.
+            self.index = faiss.clone_index(self.index)
+            self._index_is_mapped = False
+        self.index.add(self.store.vectors_for(texts))
+        self.examples.extend(texts)
+        self.labels.extend(x["label"] for x in new_examples)
+
+        if save:
+            with open(self.example_file, "w") as f:
+                json.dump([{"text": t, "label": l} for t, l in zip(self.examples, self.labels)], f, indent=2)
+            with self.store.locked():
+                _save_index(self.index, index_path(self.cache_dir, self._index_key()))
+        return len(new_examples)
 
     def query(self, text: str, k=1):
-        vector = self.model.encode([text], convert_to_numpy=True)
-        distances, indices = self.index.search(vector, k)
-        idx = indices[0][0]
-        return self.examples[idx], self.labels[idx], distances[0][0]
+        return self.query_batch([text], k)[0]
+
+    def query_batch(self, texts, k=1):
+        """
+        Encodes all texts in one call and searches the index once with the whole
+        matrix. Returns (example, label, distance) of the nearest example for each text.
+        """
+        vectors = self.model.encode(list(texts), convert_to_numpy=True, batch_size=64)
+        distances, indices = self.index.search(vectors, k)
+        results = []
+        for row, row_distances in zip(indices, distances):
+            if row[0] < 0:
+                # Approximate indexes can come back empty when no probed cell has a neighbour.
+                results.append((None, None, float("inf")))
+            else:
+                results.append((self.examples[row[0]], self.labels[row[0]], row_distances[0]))
+        return results
+
+
+# Loaded on first use; shared by the sensitive-data detector and the embedding intent classifier
+register_model("sensitive_rag", LightweightRAG, warmup=lambda rag: rag.query("warm up"))
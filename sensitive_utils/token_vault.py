@@ -0,0 +1,95 @@
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# ***PAN_1f3a9c0e5b7d2a64***  -- the label stays readable for the NLU and the agent,
+# the random part makes every token unique across requests and threads.
+TOKEN_PATTERN = re.compile(r"\*\*\*[A-Z]+_[0-9a-f]{16}\*\*\*")
+
+
+class TokenVault:
+    """
+    Thread-safe, bounded store of token -> Fernet ciphertext.
+
+    Every encrypted value gets its own token, so two PANs in one message (or in two
+    concurrent requests) never overwrite each other. Entries expire after ttl_seconds
+    and the oldest are evicted once max_entries is reached. Encryption and decryption
+    run outside the lock; it is only held for the dictionary updates.
+    """
+
+    def __init__(self, fernet, max_entries=100000, ttl_seconds=86400):
+        self.fernet = fernet
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # token -> (expires_at, ciphertext); insertion order == expiry order
+        self._lock = threading.Lock()
+        self._evicted = 0
+        self._expired = 0
+
+    @staticmethod
+    def _new_token(label):
+        return f"***{label.upper()}_{secrets.token_hex(8)}***"
+
+    def _evict(self, now):
+        # Caller holds self._lock.
+        while self._entries:
+            token, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[token]
+            self._expired += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evicted += 1
+
+    def encrypt_many(self, items):
+        """Encrypts [(value, label), ...] and returns one new token per item, in order."""
+        sealed = [(self._new_token(label), self.fernet.encrypt(value.encode()).decode()) for value, label in items]
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            for token, ciphertext in sealed:
+                self._entries[token] = (expires_at, ciphertext)
+            self._evict(now)
+        return [token for token, _ in sealed]
+
+    def encrypt(self, value, label="SENSITIVE"):
+        return self.encrypt_many([(value, label)])[0]
+
+    def decrypt_many(self, tokens):
+        """Returns the original value for each token; unknown or expired tokens are returned unchanged."""
+        now = time.time()
+        with self._lock:
+            found = [self._entries.get(token) for token in tokens]
+        return [
+            self.fernet.decrypt(entry[1].encode()).decode() if entry and entry[0] > now else token
+            for token, entry in zip(tokens, found)
+        ]
+
+    def decrypt(self, token):
+        return self.decrypt_many([token])[0]
+
+    def decrypt_in_text(self, text):
+        """Replaces every vault token found in the text with its original value."""
+        tokens = list(dict.fromkeys(TOKEN_PATTERN.findall(text)))
+        if not tokens:
+            return text
+        values = dict(zip(tokens, self.decrypt_many(tokens)))
+        return TOKEN_PATTERN.sub(lambda match: values[match.group()], text)
+
+    def discard(self, tokens):
+        with self._lock:
+            for token in tokens:
+                self._entries.pop(token, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evicted": self._evicted,
+                "expired": self._expired,
+            }
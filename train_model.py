@@ -1,33 +1,50 @@
+import argparse
+import json
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from xgboost import XGBClassifier
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, log_loss, roc_auc_score
 import joblib
-
-def clean_and_prepare_data(df):
+from scoring_engine import CATEGORICAL_COLUMNS, save_encoders
+from tree_predictor import export_booster
+from training_pipeline import (
+    CHUNK_SIZE, REPORTS_DIR, StageProfiler, collect_statistics, evaluate_out_of_core,
+    metrics_from_confusion, save_report, train_out_of_core,
+)
+
+def clean_and_prepare_data(df, save=True):
     """
     Cleans the dataset by handling missing values and encoding categorical features.
+    The encoders are saved unless save=False (e.g. when only tuning).
     """
     print("\n--- Starting Data Cleaning and Preparation ---")
 
     # 1. Handle Missing Values
+    # The fill values are saved with the encoders so scoring imputes the same way.
+    fill_values = {}
     for col in df.select_dtypes(include=['float64', 'int64']).columns:
-        df[col] = df[col].fillna(df[col].median())
+        fill_values[col] = df[col].median().item()
+        df[col] = df[col].fillna(fill_values[col])
     
     for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].fillna(df[col].mode()[0])
+        fill_values[col] = df[col].mode()[0]
+        df[col] = df[col].fillna(fill_values[col])
+    fill_values.pop('LoanID', None)
+    fill_values.pop('Default', None)
 
     print("Missing values handled.")
 
     # 2. Encode Categorical Variables
-    le = LabelEncoder()
-    # We will skip encoding the 'ID' column as it's just an identifier
-    for col in df.select_dtypes(include=['object']).columns:
-        if col != 'ID':
-            df[col] = le.fit_transform(df[col])
+    # One encoder per column; its class order is saved so scoring uses the same mapping.
+    # 'LoanID' is just an identifier and is dropped below, so it is not encoded.
+    categories = {}
+    for col in CATEGORICAL_COLUMNS:
+        le = LabelEncoder()
+        df[col] = le.fit_transform(df[col])
+        categories[col] = le.classes_.tolist()
+    if save:
+        save_encoders(categories, fill_values)
     
     print("Categorical features encoded.")
 
@@ -41,57 +58,146 @@ def clean_and_prepare_data(df):
     
     return X_train, X_test, y_train, y_test
 
-def train_evaluate_and_save_model(X_train, X_test, y_train, y_test):
+def train_evaluate_and_save_model(X_train, X_test, y_train, y_test, profiler=None, reports_dir=REPORTS_DIR):
     """
     Trains an XGBoost model, evaluates its performance, and saves it to a file.
     """
+    profiler = profiler or StageProfiler()
     print("\n--- Starting Model Training ---")
 
     # 1. Initialize and Train the Model
     # XGBoost is a powerful and popular algorithm for this type of task.
-    model = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
-    model.fit(X_train, y_train)
+    with profiler.stage("train"):
+        model = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
+        model.fit(X_train, y_train)
     
     print("Model training completed.")
 
     # 2. Make Predictions on the Test Set
     print("\n--- Evaluating Model Performance ---")
-    y_pred = model.predict(X_test)
-
-    # 3. Evaluate the Model's Performance
-    accuracy = accuracy_score(y_test, y_pred)
-    print(f"Model Accuracy: {accuracy * 100:.2f}%")
-
-    print("\nClassification Report:")
-    print(classification_report(y_test, y_pred))
-
-    # 4. Visualize the Confusion Matrix
-    # This shows us how many predictions were correct vs. incorrect.
-    cm = confusion_matrix(y_test, y_pred)
-    plt.figure(figsize=(8, 6))
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=['Paid', 'Defaulted'], yticklabels=['Paid', 'Defaulted'])
-    plt.title('Confusion Matrix')
-    plt.xlabel('Predicted')
-    plt.ylabel('Actual')
-    plt.show()
-
-    # 5. Save the Trained Model
+    with profiler.stage("evaluate"):
+        y_pred = model.predict(X_test)
+        y_proba = model.predict_proba(X_test)[:, 1]
+
+        # 3. Evaluate the Model's Performance
+        accuracy = accuracy_score(y_test, y_pred)
+        print(f"Model Accuracy: {accuracy * 100:.2f}%")
+
+        print("\nClassification Report:")
+        print(classification_report(y_test, y_pred))
+
+        # This shows us how many predictions were correct vs. incorrect.
+        metrics = metrics_from_confusion(confusion_matrix(y_test, y_pred))
+        metrics["log_loss"] = round(float(log_loss(y_test, y_proba)), 4)
+        metrics["roc_auc"] = round(float(roc_auc_score(y_test, y_proba)), 4)
+
+    # 4. Save the Trained Model
+    with profiler.stage("save"):
+        save_model_files(model)
+
+    # 5. Save the metrics and the confusion matrix plot (no window, so this runs headless)
+    save_report(metrics, profiler, reports_dir)
+    
+    return model
+
+def save_model_files(model):
+    """Saves the sklearn model and exports its booster for serving (see tree_predictor.py)."""
     model_filename = 'recovery_model.pkl'
     joblib.dump(model, model_filename)
     print(f"\nModel saved successfully as '{model_filename}'")
-    
+
+    json_path, ubj_path = export_booster(model)
+    print(f"Booster exported as '{ubj_path}' and '{json_path}'")
+
+def train_model_out_of_core(dataset_path, chunk_size=CHUNK_SIZE, profiler=None, reports_dir=REPORTS_DIR):
+    """
+    Trains the same model without loading the dataset into memory: the CSV is streamed
+    in chunks into XGBoost's external-memory DMatrix (see training_pipeline.py).
+    """
+    profiler = profiler or StageProfiler()
+
+    print("\n--- Collecting Statistics (streaming) ---")
+    with profiler.stage("statistics"):
+        categories, fill_values, rows = collect_statistics(dataset_path, chunk_size)
+        save_encoders(categories, fill_values)
+    print(f"Scanned {rows:,} rows; encoders saved.")
+
+    print("\n--- Starting Model Training (external memory) ---")
+    with profiler.stage("train"):
+        booster = train_out_of_core(dataset_path, categories, fill_values, chunk_size)
+    print("Model training completed.")
+
+    print("\n--- Evaluating Model Performance (streaming) ---")
+    with profiler.stage("evaluate"):
+        metrics = evaluate_out_of_core(booster, dataset_path, categories, fill_values, chunk_size)
+    print(f"Model Accuracy: {metrics['accuracy'] * 100:.2f}%  ROC AUC: {metrics['roc_auc']}")
+
+    with profiler.stage("save"):
+        # The sklearn wrapper is rebuilt from the exported booster so the pickle stays usable.
+        json_path, ubj_path = export_booster(booster)
+        model = XGBClassifier()
+        model.load_model(ubj_path)
+        save_model_files(model)
+
+    save_report(metrics, profiler, reports_dir)
     return model
 
 
-if __name__ == "__main__":
-    dataset_path = 'loan_default.csv' 
-    
-    print("Loading the dataset...")
-    df = pd.read_csv(dataset_path)
-    print("Dataset loaded successfully.")
+def tune_hyperparameters(args):
+    """Cross-validated parameter search on the training split; the test split stays untouched."""
+    from model_tuning import TUNING_GRID, tune
 
-    # Clean and prepare the data
-    X_train, X_test, y_train, y_test = clean_and_prepare_data(df)
-    
-    # Train, evaluate, and save the model
-    trained_model = train_evaluate_and_save_model(X_train, X_test, y_train, y_test)
\ No newline at end of file
+    grid = TUNING_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+
+    df = pd.read_csv(args.data)
+    if args.max_rows and len(df) > args.max_rows:
+        df = df.sample(n=args.max_rows, random_state=42)
+    X_train, _, y_train, _ = clean_and_prepare_data(df, save=False)
+    tune(X_train.to_numpy(), y_train.to_numpy(), grid=grid, search=args.search, n_candidates=args.candidates,
+         folds=args.folds, workers=args.workers, reports_dir=args.reports_dir, restart=args.restart)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trains the recovery model and saves it with its encoders and reports.")
+    parser.add_argument("--data", default='loan_default.csv', help="path to the loan dataset CSV")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="stream the CSV in chunks instead of loading it (for datasets larger than memory)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per chunk in --out-of-core mode")
+    parser.add_argument("--reports-dir", default=REPORTS_DIR, help="where metrics.json and the plots are written")
+    subcommands = parser.add_subparsers(dest="command")
+    tune_parser = subcommands.add_parser("tune", help="cross-validated hyperparameter search (see model_tuning.py)")
+    tune_parser.add_argument("--data", default='loan_default.csv', help="path to the loan dataset CSV")
+    tune_parser.add_argument("--search", choices=["random", "grid"], default="random")
+    tune_parser.add_argument("--candidates", type=int, default=30, help="parameter sets tried by random search")
+    tune_parser.add_argument("--grid", help="JSON file mapping parameter names to lists of values")
+    tune_parser.add_argument("--folds", type=int, default=5)
+    tune_parser.add_argument("--workers", type=int, help="worker processes (default: all cores but one)")
+    tune_parser.add_argument("--max-rows", type=int, help="tune on a random sample of this many rows")
+    tune_parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    tune_parser.add_argument("--reports-dir", default=REPORTS_DIR, help="where the checkpoint and leaderboard are written")
+    args = parser.parse_args()
+
+    if args.command == "tune":
+        tune_hyperparameters(args)
+        raise SystemExit
+
+    profiler = StageProfiler()
+    if args.out_of_core:
+        train_model_out_of_core(args.data, args.chunk_size, profiler, args.reports_dir)
+    else:
+        print("Loading the dataset...")
+        with profiler.stage("load"):
+            df = pd.read_csv(args.data)
+        print("Dataset loaded successfully.")
+
+        # Clean and prepare the data
+        with profiler.stage("prepare"):
+            X_train, X_test, y_train, y_test = clean_and_prepare_data(df)
+        
+        # Train, evaluate, and save the model
+        trained_model = train_evaluate_and_save_model(X_train, X_test, y_train, y_test, profiler, args.reports_dir)
+
+    profiler.print_summary()
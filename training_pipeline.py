@@ -0,0 +1,289 @@
+"""
+Out-of-core training for the recovery model, plus the stage profiler and headless
+reports shared with the in-memory path of train_model.py.
+
+The CSV is never loaded as a whole. It is read in chunks with explicit dtypes:
+  1. statistics -- category counts (encoders and mode imputation) and a bounded
+                   uniform sample of the numeric columns (median imputation)
+  2. training   -- chunks are imputed, encoded and handed to XGBoost through a
+                   DataIter; XGBoost keeps its quantised pages in an on-disk cache
+  3. evaluation -- the held-out rows are streamed once more, accumulating the
+                   confusion matrix, log loss and a binned ROC AUC
+Rows are split into train/test by a hash of LoanID, so the split does not depend
+on the chunk size.
+"""
+import json
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from scoring_engine import CATEGORICAL_COLUMNS, FEATURE_COLUMNS
+
+CHUNK_SIZE = int(os.getenv("TRAINING_CHUNK_SIZE", "200000"))
+REPORTS_DIR = os.getenv("TRAINING_REPORTS_DIR", "training_reports")
+# Rows kept to estimate the numeric medians; memory is bounded by this, not the dataset.
+MEDIAN_SAMPLE_ROWS = 200000
+TEST_PERCENT = 20
+AUC_BINS = 1000
+
+NUMERIC_COLUMNS = [col for col in FEATURE_COLUMNS if col not in CATEGORICAL_COLUMNS]
+# float32 keeps missing values representable and halves the chunk size versus float64.
+CSV_DTYPES = {
+    'LoanID': str,
+    **{col: np.float32 for col in NUMERIC_COLUMNS},
+    **{col: str for col in CATEGORICAL_COLUMNS},
+    'Default': np.float32,
+}
+
+# Same model as XGBClassifier(eval_metric='logloss', random_state=42) in train_model.py.
+TRAINING_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "max_depth": 6,
+    "eta": 0.3,
+    "seed": 42,
+}
+NUM_BOOST_ROUND = 100
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Not Linux: fall back to the lifetime peak (KiB on Linux, bytes on macOS).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageProfiler:
+    """Records the wall time and peak resident memory (sampled) of each named stage."""
+
+    def __init__(self, sample_interval=0.05):
+        self.sample_interval = sample_interval
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        peak = [current_rss_bytes()]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(self.sample_interval):
+                peak[0] = max(peak[0], current_rss_bytes())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+            peak[0] = max(peak[0], current_rss_bytes())
+            record = {"stage": name, "seconds": round(time.perf_counter() - start, 2), "peak_rss_mb": round(peak[0] / 2 ** 20, 1)}
+            self.stages.append(record)
+            print(f"[{name}] {record['seconds']}s, peak RSS {record['peak_rss_mb']} MB")
+
+    def print_summary(self):
+        print(f"\n{'stage':<14} {'seconds':>9} {'peak RSS MB':>12}")
+        for record in self.stages:
+            print(f"{record['stage']:<14} {record['seconds']:>9.2f} {record['peak_rss_mb']:>12.1f}")
+
+
+def save_confusion_matrix_plot(cm, path):
+    """Saves the confusion matrix heatmap without opening a window (safe on headless servers)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=['Paid', 'Defaulted'], yticklabels=['Paid', 'Defaulted'])
+    plt.title('Confusion Matrix')
+    plt.xlabel('Predicted')
+    plt.ylabel('Actual')
+    plt.savefig(path, bbox_inches='tight')
+    plt.close()
+
+
+def save_report(metrics, profiler, reports_dir=REPORTS_DIR):
+    """Writes metrics.json (metrics plus per-stage timings) and confusion_matrix.png."""
+    os.makedirs(reports_dir, exist_ok=True)
+    save_confusion_matrix_plot(np.asarray(metrics["confusion_matrix"]), os.path.join(reports_dir, "confusion_matrix.png"))
+    with open(os.path.join(reports_dir, "metrics.json"), "w") as f:
+        json.dump({**metrics, "stages": profiler.stages}, f, indent=2)
+    print(f"Reports saved to '{reports_dir}/'")
+
+
+def metrics_from_confusion(cm):
+    """Accuracy and per-class precision/recall/F1 from a 2x2 confusion matrix [[tn, fp], [fn, tp]]."""
+    cm = np.asarray(cm, dtype=np.int64)
+    per_class = {}
+    for label, name in ((0, "Paid"), (1, "Defaulted")):
+        true_positive = cm[label, label]
+        precision = true_positive / cm[:, label].sum() if cm[:, label].sum() else 0.0
+        recall = true_positive / cm[label, :].sum() if cm[label, :].sum() else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_class[name] = {"precision": round(float(precision), 4), "recall": round(float(recall), 4),
+                           "f1": round(float(f1), 4), "support": int(cm[label, :].sum())}
+    return {
+        "accuracy": round(float(np.trace(cm) / cm.sum()), 4) if cm.sum() else 0.0,
+        "classes": per_class,
+        "confusion_matrix": cm.tolist(),
+    }
+
+
+# --- Out-of-core pipeline ---
+
+def read_chunks(csv_path, chunk_size=CHUNK_SIZE):
+    return pd.read_csv(csv_path, dtype=CSV_DTYPES, usecols=list(CSV_DTYPES), chunksize=chunk_size)
+
+
+def test_mask(chunk):
+    """True for held-out rows; decided by LoanID alone."""
+    hashes = pd.util.hash_pandas_object(chunk['LoanID'], index=False).to_numpy()
+    return hashes % 100 < TEST_PERCENT
+
+
+def collect_statistics(csv_path, chunk_size=CHUNK_SIZE, seed=42):
+    """
+    One streaming pass: exact category counts and a uniform bottom-k sample of the
+    numeric columns (the MEDIAN_SAMPLE_ROWS rows with the smallest random keys).
+    Returns (categories, fill_values, rows) in the format scoring_engine saves.
+    """
+    rng = np.random.default_rng(seed)
+    counts = {col: Counter() for col in CATEGORICAL_COLUMNS}
+    sample_keys = np.empty(0)
+    sample = np.empty((0, len(NUMERIC_COLUMNS)), dtype=np.float32)
+    rows = 0
+
+    for chunk in read_chunks(csv_path, chunk_size):
+        rows += len(chunk)
+        for col in CATEGORICAL_COLUMNS:
+            counts[col].update(chunk[col].value_counts().to_dict())
+        sample_keys = np.concatenate([sample_keys, rng.random(len(chunk))])
+        sample = np.concatenate([sample, chunk[NUMERIC_COLUMNS].to_numpy(dtype=np.float32)])
+        if len(sample_keys) > MEDIAN_SAMPLE_ROWS:
+            keep = np.argpartition(sample_keys, MEDIAN_SAMPLE_ROWS)[:MEDIAN_SAMPLE_ROWS]
+            sample_keys, sample = sample_keys[keep], sample[keep]
+
+    medians = np.nanmedian(sample, axis=0)
+    fill_values = {col: float(median) for col, median in zip(NUMERIC_COLUMNS, medians)}
+    categories = {}
+    for col in CATEGORICAL_COLUMNS:
+        # Sorted, as LabelEncoder orders its classes; ties for the mode go to the first, as in pandas.
+        categories[col] = sorted(counts[col])
+        top = max(counts[col].values())
+        fill_values[col] = min(value for value, count in counts[col].items() if count == top)
+    return categories, fill_values, rows
+
+
+def encode_chunk(chunk, categories, fill_values):
+    """Imputes and encodes a chunk into (float32 matrix in FEATURE_COLUMNS order, labels)."""
+    matrix = np.empty((len(chunk), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for j, col in enumerate(FEATURE_COLUMNS):
+        values = chunk[col].fillna(fill_values[col])
+        if col in categories:
+            codes = pd.Categorical(values, categories=categories[col]).codes.astype(np.float32)
+            # Unseen categories (code -1) become missing, as RecoveryScorer encodes them at serving time.
+            codes[codes < 0] = np.nan
+            matrix[:, j] = codes
+        else:
+            matrix[:, j] = values.to_numpy(dtype=np.float32)
+    return matrix, chunk['Default'].to_numpy(dtype=np.float32)
+
+
+def iter_encoded(csv_path, categories, fill_values, chunk_size=CHUNK_SIZE, held_out=False):
+    """Yields (matrix, labels) for the train rows (or the held-out rows) of each chunk."""
+    for chunk in read_chunks(csv_path, chunk_size):
+        chunk = chunk[chunk['Default'].notna()]
+        chunk = chunk[test_mask(chunk) == held_out]
+        if len(chunk):
+            yield encode_chunk(chunk, categories, fill_values)
+
+
+def _make_chunk_iterator(csv_path, categories, fill_values, chunk_size, cache_prefix):
+    import xgboost as xgb
+
+    class ChunkIterator(xgb.DataIter):
+        """Feeds encoded CSV chunks to XGBoost; reset() starts another pass over the file."""
+
+        def __init__(self):
+            self._batches = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._batches is None:
+                self._batches = iter_encoded(csv_path, categories, fill_values, chunk_size)
+            batch = next(self._batches, None)
+            if batch is None:
+                return False
+            matrix, labels = batch
+            input_data(data=matrix, label=labels, feature_names=FEATURE_COLUMNS)
+            return True
+
+        def reset(self):
+            self._batches = None
+
+    return ChunkIterator()
+
+
+def train_out_of_core(csv_path, categories, fill_values, chunk_size=CHUNK_SIZE):
+    """Trains on the non-held-out rows through XGBoost's external-memory DMatrix."""
+    import xgboost as xgb
+
+    cache_dir = tempfile.mkdtemp(prefix="xgb_cache_")
+    try:
+        iterator = _make_chunk_iterator(csv_path, categories, fill_values, chunk_size, os.path.join(cache_dir, "train"))
+        if hasattr(xgb, "ExtMemQuantileDMatrix"):
+            dtrain = xgb.ExtMemQuantileDMatrix(iterator, missing=np.nan)
+        else:
+            # Older XGBoost: a DMatrix built from an iterator with a cache_prefix is external memory.
+            dtrain = xgb.DMatrix(iterator, missing=np.nan)
+        booster = xgb.train(TRAINING_PARAMS, dtrain, num_boost_round=NUM_BOOST_ROUND)
+        del dtrain
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return booster
+
+
+def evaluate_out_of_core(booster, csv_path, categories, fill_values, chunk_size=CHUNK_SIZE):
+    """Streams the held-out rows and returns the same metrics as the in-memory path."""
+    cm = np.zeros((2, 2), dtype=np.int64)
+    histograms = np.zeros((2, AUC_BINS), dtype=np.int64)  # score histograms of negatives / positives
+    log_loss_sum = 0.0
+    eps = 1e-15
+
+    for matrix, labels in iter_encoded(csv_path, categories, fill_values, chunk_size, held_out=True):
+        probabilities = booster.inplace_predict(matrix, missing=np.nan, validate_features=False).astype(np.float64)
+        actual = labels.astype(np.int64)
+        predicted = (probabilities > 0.5).astype(np.int64)
+        np.add.at(cm, (actual, predicted), 1)
+        bins = np.minimum((probabilities * AUC_BINS).astype(np.int64), AUC_BINS - 1)
+        np.add.at(histograms, (actual, bins), 1)
+        clipped = np.clip(probabilities, eps, 1 - eps)
+        log_loss_sum -= float(np.sum(actual * np.log(clipped) + (1 - actual) * np.log(1 - clipped)))
+
+    metrics = metrics_from_confusion(cm)
+    rows = int(cm.sum())
+    metrics["log_loss"] = round(log_loss_sum / rows, 4) if rows else None
+    metrics["roc_auc"] = round(binned_roc_auc(histograms[0], histograms[1]), 4)
+    return metrics
+
+
+def binned_roc_auc(negative_counts, positive_counts):
+    """ROC AUC from score histograms; a negative in the same bin as a positive counts as half."""
+    negatives, positives = negative_counts.sum(), positive_counts.sum()
+    if not negatives or not positives:
+        return float("nan")
+    negatives_below = np.cumsum(negative_counts) - negative_counts
+    return float(np.sum(positive_counts * (negatives_below + 0.5 * negative_counts)) / (negatives * positives))
@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class BatchingTranscriber:
+    """
+    Gathers concurrent transcription requests into batches.
+
+    Callers get a Future from submit(). A single dispatcher thread waits for the
+    first request, keeps collecting until max_batch_size requests are waiting or
+    max_wait_ms has passed, then hands the whole batch to batch_fn in one call.
+    batch_fn takes a list of inputs and returns a list of results in the same order.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=50, latency_samples=1000):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._latencies_ms = deque(maxlen=latency_samples)
+        self._batch_count = 0
+        self._item_count = 0
+        self._failed_items = 0
+        self._busy_seconds = 0.0
+        self._started_at = None
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._started_at = time.monotonic()
+                self._thread = threading.Thread(target=self._dispatch_loop, name="transcription-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """Queues one input and returns a Future for its result."""
+        self._start()
+        future = Future()
+        self._queue.put((time.monotonic(), item, future))
+        return future
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Never let one batch kill the only dispatcher thread: fail just its requests.
+                print(f"Batch transcription error ({len(batch)} clips): {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                        with self._lock:
+                            self._failed_items += 1
+
+    def _run_batch(self, batch):
+        inputs = [item for _, item, _ in batch]
+        started = time.monotonic()
+        try:
+            results = self.batch_fn(inputs)
+            if len(results) != len(batch):
+                raise ValueError(f"expected {len(batch)} results, got {len(results)}")
+        except Exception as e:
+            print(f"Batch transcription failed ({len(batch)} clips), retrying one by one: {e}")
+            results = None
+        with self._lock:
+            self._busy_seconds += time.monotonic() - started
+
+        for index, (enqueued_at, item, future) in enumerate(batch):
+            if results is not None:
+                future.set_result(results[index])
+            else:
+                # Isolate the bad clip instead of failing everyone in the batch.
+                try:
+                    future.set_result(self.batch_fn([item])[0])
+                except Exception as e:
+                    future.set_exception(e)
+                    with self._lock:
+                        self._failed_items += 1
+            with self._lock:
+                self._latencies_ms.append((time.monotonic() - enqueued_at) * 1000)
+
+        with self._lock:
+            self._batch_count += 1
+            self._item_count += len(batch)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batch_count,
+                "items": self._item_count,
+                "failed_items": self._failed_items,
+                "avg_batch_size": round(self._item_count / self._batch_count, 2) if self._batch_count else 0.0,
+                "throughput_items_per_s": round(self._item_count / uptime, 3) if uptime else 0.0,
+                "busy_seconds": round(self._busy_seconds, 3),
+                "latency_ms_avg": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                "latency_ms_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else 0.0,
+                "latency_ms_max": round(latencies[-1], 3) if latencies else 0.0,
+            }
@@ -1,17 +1,171 @@
+import hashlib
 import os
-import torch
-from transformers import pipeline
+import threading
+from concurrent.futures import Future
+import numpy as np
+from asr_backends import ASR_BACKEND, ASR_MODEL, create_asr_backend
+from model_registry import register_model, get_model
+from response_cache import ResponseCache, make_cache_key
+from transcription_batcher import BatchingTranscriber
+from audio_stream import SAMPLING_RATE, decode_audio, decode_audio_stream, iter_overlapping_chunks, merge_overlapping_text
 
 # Manually add local ffmpeg path if you need it for local testing
 os.environ["PATH"] += os.pathsep + os.path.abspath("ffmpeg/bin")
 
-# Load Whisper (small model = faster, lower memory)
-asr_pipeline = pipeline("automatic-speech-recognition", model="openai/whisper-small", device=0 if torch.cuda.is_available() else -1)
+GENERATE_KWARGS = {"language": "en", "task": "transcribe"}
+# Longer voice notes are rejected (MediaLimitError) instead of being transcribed.
+MEDIA_MAX_DURATION_S = float(os.getenv("MEDIA_MAX_DURATION_S", "900"))
 
-def transcribe_audio(audio_data: bytes) -> str:
+
+def _warm_up_asr(backend):
+    # One second of silence is enough to initialise the decoder and feature extractor.
+    backend.transcribe({"raw": np.zeros(SAMPLING_RATE, dtype=np.float32), "sampling_rate": SAMPLING_RATE}, generate_kwargs=GENERATE_KWARGS)
+
+
+# Whisper is loaded on first use through the configured backend (ASR_BACKEND / ASR_MODEL, see asr_backends.py)
+register_model("asr", create_asr_backend, warmup=_warm_up_asr)
+
+# Batched mode: concurrent voice notes are gathered for up to TRANSCRIBE_MAX_WAIT_MS
+# and run through Whisper as one batch of at most TRANSCRIBE_MAX_BATCH_SIZE clips.
+BATCHED_TRANSCRIPTION = os.getenv("BATCHED_TRANSCRIPTION", "0") == "1"
+TRANSCRIBE_MAX_BATCH_SIZE = int(os.getenv("TRANSCRIBE_MAX_BATCH_SIZE", "8"))
+TRANSCRIBE_MAX_WAIT_MS = int(os.getenv("TRANSCRIBE_MAX_WAIT_MS", "50"))
+# A request gives up waiting for its batch after this long (raises TimeoutError).
+TRANSCRIBE_TIMEOUT_S = float(os.getenv("TRANSCRIBE_TIMEOUT_S", "300"))
+
+
+def transcribe_batch(audio_clips: list) -> list:
+    """
+    Transcribes several in-memory clips with a single pipeline call.
+    """
+    return get_model("asr").transcribe_batch(audio_clips, generate_kwargs=GENERATE_KWARGS)
+
+
+transcriber = BatchingTranscriber(transcribe_batch, max_batch_size=TRANSCRIBE_MAX_BATCH_SIZE, max_wait_ms=TRANSCRIBE_MAX_WAIT_MS)
+
+
+# Streaming mode: long voice notes are decoded incrementally and transcribed in
+# overlapping chunks, so memory stays bounded by the chunk size.
+STREAMING_TRANSCRIPTION = os.getenv("STREAMING_TRANSCRIPTION", "0") == "1"
+STREAM_CHUNK_LENGTH_S = float(os.getenv("STREAM_CHUNK_LENGTH_S", "30"))
+STREAM_STRIDE_S = float(os.getenv("STREAM_STRIDE_S", "5"))
+
+
+def transcribe_audio_stream(audio_data, chunk_length_s: float = STREAM_CHUNK_LENGTH_S, stride_s: float = STREAM_STRIDE_S):
+    """
+    Yields the transcript piece by piece as each chunk is transcribed.
+    Words repeated in the overlap between chunks are dropped, so joining the
+    pieces with spaces gives the full transcript.
+    """
+    recent_words = []
+    pcm_blocks = decode_audio_stream(audio_data, SAMPLING_RATE, max_seconds=MEDIA_MAX_DURATION_S)
+    for chunk, _ in iter_overlapping_chunks(pcm_blocks, SAMPLING_RATE, chunk_length_s, stride_s):
+        text = get_model("asr").transcribe({"raw": chunk, "sampling_rate": SAMPLING_RATE}, generate_kwargs=GENERATE_KWARGS)
+        new_words = merge_overlapping_text(recent_words, text.split())
+        if new_words:
+            recent_words = (recent_words + new_words)[-50:]
+            yield " ".join(new_words)
+
+
+def transcribe_audio_streaming(audio_data) -> str:
+    """
+    Transcribes audio in overlapping chunks and stitches the pieces together.
     """
-    Transcribes audio data directly from memory (bytes).
+    return " ".join(transcribe_audio_stream(audio_data))
+
+
+# Transcript cache: Twilio retries webhooks and agents forward the same voice note, so
+# transcripts are cached by a hash of the encoded audio plus everything that changes the
+# output (backend, checkpoint, language, streaming or not). Same LRU + SQLite store as
+# the LLM cache (response_cache.py). Transcripts can contain account, card or Aadhaar
+# numbers in clear, so by default they are kept in memory only; setting
+# TRANSCRIPT_CACHE_DB_PATH also persists them to that file, capped at
+# TRANSCRIPT_CACHE_MAX_DISK_ENTRIES rows.
+TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "1") == "1"
+TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "512"))
+TRANSCRIPT_CACHE_TTL_SECONDS = float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+TRANSCRIPT_CACHE_DB_PATH = os.getenv("TRANSCRIPT_CACHE_DB_PATH", "")
+TRANSCRIPT_CACHE_MAX_DISK_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MAX_DISK_ENTRIES", "5000"))
+
+transcript_cache = ResponseCache(
+    max_entries=TRANSCRIPT_CACHE_MAX_ENTRIES,
+    ttl_seconds=TRANSCRIPT_CACHE_TTL_SECONDS,
+    db_path=TRANSCRIPT_CACHE_DB_PATH or None,
+    max_disk_entries=TRANSCRIPT_CACHE_MAX_DISK_ENTRIES,
+)
+# key -> Future of a transcription in progress, so a duplicate arriving meanwhile waits for it
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_coalesced = 0
+
+
+def transcript_cache_key(audio_data) -> str:
+    # hashlib reads the buffer (bytes, bytearray or mmap) in place.
+    audio_digest = hashlib.sha256(audio_data).hexdigest()
+    mode = "streaming" if STREAMING_TRANSCRIPTION else "full"
+    return make_cache_key(f"{ASR_BACKEND}:{ASR_MODEL}", f"{GENERATE_KWARGS['language']} {mode} {audio_digest}")
+
+
+def transcript_cache_stats():
+    stats = transcript_cache.stats()
+    with _in_flight_lock:
+        stats["coalesced"] = _coalesced
+        stats["in_flight"] = len(_in_flight)
+    return stats
+
+
+def transcribe_audio(audio_data) -> str:
+    """
+    Transcribes encoded audio held in any buffer: bytes, or the bytearray / memory-mapped
+    file of a MediaBuffer (see media_buffer.py). Audio that was transcribed before (or is
+    being transcribed right now) is not run through Whisper again.
     """
-    # The pipeline can directly accept raw audio bytes
-    result = asr_pipeline(audio_data, generate_kwargs={"language": "en", "task": "transcribe"})
-    return result["text"]
\ No newline at end of file
+    global _coalesced
+    if not TRANSCRIPT_CACHE_ENABLED:
+        return _transcribe_uncached(audio_data)
+
+    key = transcript_cache_key(audio_data)
+    # Claim the key before looking it up: the owner stores the transcript before releasing
+    # its claim, so whoever claims the key next is sure to find it in the cache.
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+        else:
+            _coalesced += 1
+    if not owner:
+        return future.result()
+
+    try:
+        text = transcript_cache.get(key)
+        if text is None:
+            text = _transcribe_uncached(audio_data)
+            transcript_cache.put(key, text)
+        future.set_result(text)
+        return text
+    except BaseException as e:
+        # Errors (e.g. MediaLimitError) are passed to the waiters but never cached.
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+
+
+def _transcribe_uncached(audio_data) -> str:
+    """
+    Decodes the buffer without copying it (ffmpeg reads it through a memoryview) and
+    runs it through Whisper in the configured mode.
+    """
+    if STREAMING_TRANSCRIPTION:
+        return transcribe_audio_streaming(audio_data)
+
+    # Decoded here rather than by the pipeline, which only accepts bytes and has no duration limit
+    audio = {"raw": decode_audio(audio_data, SAMPLING_RATE, max_seconds=MEDIA_MAX_DURATION_S), "sampling_rate": SAMPLING_RATE}
+
+    if BATCHED_TRANSCRIPTION:
+        # Blocks this request until its batch has been transcribed
+        return transcriber.submit(audio).result(timeout=TRANSCRIBE_TIMEOUT_S)
+
+    return get_model("asr").transcribe(audio, generate_kwargs=GENERATE_KWARGS)
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""
+Serving formats for the recovery model that skip the sklearn wrapper.
+
+train_model.py exports the XGBoost booster as UBJ (loaded back as a bare
+xgboost.Booster) and as JSON, which NumpyTreeEnsemble compiles into flat node
+arrays and evaluates with NumPy only -- no xgboost import at serving time.
+check_predictor_parity.py verifies both against the pickled model.
+"""
+import json
+import numpy as np
+
+
+def export_booster(model, json_path="recovery_model.json", ubj_path="recovery_model.ubj"):
+    """Saves the booster behind an XGBClassifier (or a bare Booster) in XGBoost's native formats."""
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    booster.save_model(json_path)
+    booster.save_model(ubj_path)
+    return json_path, ubj_path
+
+
+# Trees are padded to perfect binary trees of the ensemble's depth, so this bounds the
+# node arrays at 2**depth per tree; deeper (e.g. lossguide) models stay on XGBoost.
+MAX_DEPTH = 12
+# Rows are walked in blocks so the (rows x trees) working arrays stay in cache.
+ROWS_PER_BLOCK = 256
+
+
+class NumpyTreeEnsemble:
+    """
+    Binary-logistic gradient-boosted trees evaluated with vectorised NumPy.
+
+    Every tree is padded to a perfect binary tree of the ensemble's maximum depth
+    (a leaf above the bottom is copied into all the bottom slots below it), so the
+    children of position i are always 2i+1 and 2i+2. Every row then walks every
+    tree at once in exactly `depth` steps, each step one gather of the split
+    feature and threshold. Leaf values are summed in tree order in float32, the
+    way XGBoost accumulates them.
+    """
+
+    def __init__(self, feature, threshold, default_left, leaf_value, depth, base_margin, feature_names=None):
+        # feature/threshold/default_left: (n_trees, 2**depth - 1), leaf_value: (n_trees, 2**depth)
+        self.depth = depth
+        self.n_trees = feature.shape[0]
+        self.feature = feature.ravel()
+        self.threshold = threshold.ravel()
+        self.default_left = default_left.ravel()
+        self.leaf_value = leaf_value.ravel()
+        self.internal_base = np.arange(self.n_trees, dtype=np.intp) * feature.shape[1]
+        self.leaf_base = np.arange(self.n_trees, dtype=np.intp) * leaf_value.shape[1] - feature.shape[1]
+        self.base_margin = np.float32(base_margin)
+        self.feature_names = feature_names
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path) as f:
+            return cls.from_model(json.load(f))
+
+    @classmethod
+    def from_model(cls, model):
+        """Builds the ensemble from a parsed XGBoost JSON model (e.g. json.loads(booster.save_raw("json")))."""
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Unsupported objective '{objective}'")
+        gradient_booster = learner["gradient_booster"]
+        if gradient_booster["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster '{gradient_booster['name']}'")
+
+        # Stored in probability space (newer versions wrap it in brackets).
+        base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+        base_margin = np.log(base_score / (1 - base_score))
+
+        trees = gradient_booster["model"]["trees"]
+        for tree in trees:
+            if any(tree.get("split_type", [])):
+                raise ValueError("Categorical splits are not supported")
+        depth = max((cls._depth(tree["left_children"], tree["right_children"]) for tree in trees), default=0)
+        if depth > MAX_DEPTH:
+            raise ValueError(f"Trees of depth {depth} are too deep for the NumPy predictor")
+
+        internal_count = 2 ** depth - 1
+        feature = np.zeros((len(trees), internal_count), dtype=np.intp)
+        threshold = np.zeros((len(trees), internal_count), dtype=np.float32)
+        default_left = np.zeros((len(trees), internal_count), dtype=bool)
+        leaf_value = np.zeros((len(trees), internal_count + 1), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            left, right = tree["left_children"], tree["right_children"]
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            stack = [(0, 0, 0)]  # (node id, position in the perfect tree, depth)
+            while stack:
+                node, position, level = stack.pop()
+                if left[node] == -1:
+                    # For leaves, split_conditions holds the leaf value (learning rate already applied).
+                    span = 2 ** (depth - level)
+                    first_leaf = position * span + span - 1 - internal_count
+                    leaf_value[t, first_leaf:first_leaf + span] = conditions[node]
+                    continue
+                feature[t, position] = tree["split_indices"][node]
+                threshold[t, position] = conditions[node]
+                default_left[t, position] = bool(tree["default_left"][node])
+                stack.append((left[node], 2 * position + 1, level + 1))
+                stack.append((right[node], 2 * position + 2, level + 1))
+
+        return cls(feature, threshold, default_left, leaf_value, depth, base_margin,
+                   learner.get("feature_names") or None)
+
+    @staticmethod
+    def _depth(left, right):
+        depth, level = 0, [0]
+        while True:
+            level = [child for node in level for child in (left[node], right[node]) if child != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    def predict_margin(self, matrix):
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if len(matrix) <= ROWS_PER_BLOCK:
+            return self._predict_block(matrix)
+        return np.concatenate([
+            self._predict_block(matrix[start:start + ROWS_PER_BLOCK])
+            for start in range(0, len(matrix), ROWS_PER_BLOCK)
+        ])
+
+    def _predict_block(self, matrix):
+        n_rows, n_features = matrix.shape
+        values = matrix.ravel()
+        row_base = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        has_missing = np.isnan(values).any()
+
+        position = np.zeros((n_rows, self.n_trees), dtype=np.intp)
+        for _ in range(self.depth):
+            node = position + self.internal_base
+            x = values[row_base + self.feature[node]]
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.default_left[node], ~(x < self.threshold[node]))
+            else:
+                go_right = ~(x < self.threshold[node])
+            position = 2 * position + 1 + go_right
+
+        leaves = np.empty((n_rows, self.n_trees + 1), dtype=np.float32)
+        leaves[:, 0] = self.base_margin
+        leaves[:, 1:] = self.leaf_value[position + self.leaf_base]
+        # cumsum adds strictly left to right: base margin first, then each tree in order.
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+    def predict_proba_matrix(self, matrix):
+        """Probability of class 1 for every row of the float32 feature matrix."""
+        # exp in float64 rounded to float32 matches the C expf XGBoost uses far more
+        # often than NumPy's float32 exp does.
+        denominator = np.float32(1) + np.exp(-self.predict_margin(matrix).astype(np.float64)).astype(np.float32)
+        return np.float32(1) / denominator
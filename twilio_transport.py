@@ -0,0 +1,198 @@
+"""
+Shared HTTP transport for Twilio.
+
+Every REST call and media download goes through one requests.Session, so
+connections (and their TLS sessions) are pooled and kept alive instead of being
+opened per message. Each request has a connect and a read timeout, and failed
+requests are retried with exponentially growing, fully jittered delays.
+
+Retries are only made when repeating the request is safe: connection failures,
+429 (rate limited, honouring Retry-After) and 5xx responses. A POST is only resent
+after a failure to connect (connect timeout, refused, DNS) or a 429/503, where
+Twilio rejected it without processing it. Once its body may have been handled (a
+read timeout, the connection dropping mid-request, any other 5xx), Twilio may
+already have accepted the message, so it is not retried.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from media_buffer import MEDIA_MAX_BYTES, MEDIA_SPILL_BYTES, read_response
+
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL") or "https://api.twilio.com"
+TWILIO_CONNECT_TIMEOUT = float(os.getenv("TWILIO_CONNECT_TIMEOUT", "5"))
+TWILIO_READ_TIMEOUT = float(os.getenv("TWILIO_READ_TIMEOUT", "30"))
+TWILIO_MAX_RETRIES = int(os.getenv("TWILIO_MAX_RETRIES", "3"))
+TWILIO_BACKOFF_BASE = float(os.getenv("TWILIO_BACKOFF_BASE", "0.5"))
+TWILIO_BACKOFF_MAX = float(os.getenv("TWILIO_BACKOFF_MAX", "8"))
+TWILIO_POOL_SIZE = int(os.getenv("TWILIO_POOL_SIZE", "16"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses returned before the request was processed, so safe to retry for a POST too.
+REJECTED_STATUSES = {429, 503}
+
+
+class RateLimiter:
+    """
+    Token bucket: acquire() blocks until a token is free. Callers reserve their slot
+    before sleeping, so concurrent callers are spaced out rather than woken together.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._waited_s = 0.0
+
+    def acquire(self):
+        """Takes one token. Returns the seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self._waited_s += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {"rate_per_s": self.rate, "burst": self.burst, "waited_s": round(self._waited_s, 3)}
+
+
+def _never_connected(error):
+    """True if a requests ConnectionError happened before the request could be sent."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # urllib3 wraps the socket error in MaxRetryError(reason=NewConnectionError(...)).
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+
+class TwilioTransport:
+    def __init__(self, base_url=TWILIO_API_BASE_URL, connect_timeout=TWILIO_CONNECT_TIMEOUT,
+                 read_timeout=TWILIO_READ_TIMEOUT, max_retries=TWILIO_MAX_RETRIES,
+                 backoff_base=TWILIO_BACKOFF_BASE, backoff_max=TWILIO_BACKOFF_MAX,
+                 pool_size=TWILIO_POOL_SIZE, latency_samples=1000):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        # Retries are handled below, where the method and the failure are known.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=latency_samples)
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+
+    @staticmethod
+    def _auth():
+        # Read per call: app.py loads .env after this module is imported.
+        return (os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends the request, retrying transient failures. Returns the successful response;
+        raises the last error (requests exceptions, or HTTPError from raise_for_status).
+        """
+        idempotent = method.upper() in ("GET", "HEAD", "PUT", "DELETE")
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._lock:
+                    self._retries += 1
+            last_attempt = attempt == self.max_retries
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, auth=self._auth(), timeout=self.timeout, **kwargs)
+            except requests.exceptions.ReadTimeout:
+                self._record(start)
+                if last_attempt or not idempotent:
+                    self._record_failure()
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            except requests.exceptions.ConnectionError as e:
+                # Includes connect timeouts and stale keep-alive connections being reset;
+                # the latter may come after the body was sent, so only GETs etc. retry them.
+                self._record(start)
+                if last_attempt or not (idempotent or _never_connected(e)):
+                    self._record_failure()
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            self._record(start)
+            retryable = RETRY_STATUSES if idempotent else REJECTED_STATUSES
+            if response.status_code in retryable and not last_attempt:
+                response.close()
+                time.sleep(self._backoff(attempt, response))
+                continue
+            if not response.ok:
+                self._record_failure()
+            response.raise_for_status()
+            return response
+
+    def _record(self, start):
+        with self._lock:
+            self._requests += 1
+            self._latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+
+    def send_message(self, from_number, to_number, body):
+        """Creates a message with the REST API (the call twilio.rest.Client makes). Returns its SID."""
+        account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+        response = self.request(
+            "POST",
+            f"{self.base_url}/2010-04-01/Accounts/{account_sid}/Messages.json",
+            data={"From": from_number, "To": to_number, "Body": body},
+        )
+        return response.json().get("sid")
+
+    def download(self, url, max_bytes=MEDIA_MAX_BYTES, spill_bytes=MEDIA_SPILL_BYTES):
+        """
+        Streams the body into a MediaBuffer (see media_buffer.py), so it is never held
+        as one bytes object and is rejected once it passes max_bytes. Close the buffer
+        (or use it as a context manager) when done.
+        """
+        response = self.request("GET", url, stream=True)
+        return read_response(response, max_bytes, spill_bytes)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            return {
+                "requests": self._requests,
+                "retries": self._retries,
+                "failures": self._failures,
+                "latency_ms_avg": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+                "latency_ms_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else 0.0,
+            }
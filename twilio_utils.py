@@ -1,33 +1,76 @@
-import requests
+import atexit
 import os
+import xml.etree.ElementTree as ET
 
-def download_audio_file(audio_url: str) -> bytes:
-    auth = (os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
-    response = requests.get(audio_url, auth=auth)
-    response.raise_for_status()
-    return response.content
+from background_jobs import KeyedWorkerPool
+from twilio_transport import RateLimiter, TwilioTransport
 
-# In twilio_utils.py
-from twilio.rest import Client
+TWILIO_WHATSAPP_NUMBER = 'whatsapp:+14155238886' # Your Twilio Sandbox Number
 
-def send_whatsapp_message(to_number, body):
+# Outbound messages are queued and sent by background workers, in order per recipient.
+# Set TWILIO_ASYNC_SENDS=0 to send in the calling thread instead.
+TWILIO_ASYNC_SENDS = os.getenv("TWILIO_ASYNC_SENDS", "1") == "1"
+# Twilio queues messages sent faster than a sender's throughput (1 message/s for a long
+# code, 80/s for a WhatsApp Business sender), so sends are paced to the sender's rate.
+TWILIO_SEND_RATE = float(os.getenv("TWILIO_SEND_RATE", "1"))
+TWILIO_SEND_BURST = int(os.getenv("TWILIO_SEND_BURST", "5"))
+
+# One pooled keep-alive session for every Twilio request (see twilio_transport.py).
+# Set TWILIO_API_BASE_URL to point it at a local stand-in (see fake_twilio.py).
+transport = TwilioTransport()
+send_limiter = RateLimiter(TWILIO_SEND_RATE, TWILIO_SEND_BURST)
+send_queue = KeyedWorkerPool(
+    "twilio-send",
+    max_workers=int(os.getenv("TWILIO_SEND_WORKERS", "4")),
+    max_queue_size=int(os.getenv("TWILIO_SEND_QUEUE_SIZE", "1000")),
+)
+# Deliver what is still queued before the process exits.
+atexit.register(send_queue.join)
+
+def download_audio_file(audio_url: str):
+    """
+    Downloads the media as a MediaBuffer: in memory when small, otherwise in a memory-mapped
+    temporary file. Pass its .data to transcribe_audio and close it afterwards.
+    """
+    return transport.download(audio_url)
+
+def _deliver_message(to_number, body):
+    send_limiter.acquire()
+    message_sid = transport.send_message(TWILIO_WHATSAPP_NUMBER, to_number, body)
+    print(f"Notification sent successfully to {to_number}, SID: {message_sid}")
+
+def send_whatsapp_message(to_number, body, wait=False):
     """
     Sends a proactive WhatsApp message to a specified number.
+    The message is queued unless wait=True or the queue is full, in which case it is
+    sent before returning. Returns False only if a direct send failed.
     """
+    if TWILIO_ASYNC_SENDS and not wait and send_queue.submit(to_number, _deliver_message, to_number, body):
+        return True
     try:
-        account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-        auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-        twilio_number = 'whatsapp:+14155238886' # Your Twilio Sandbox Number
-
-        client = Client(account_sid, auth_token)
-
-        message = client.messages.create(
-            from_=twilio_number,
-            body=body,
-            to=to_number
-        )
-        print(f"Notification sent successfully to {to_number}, SID: {message.sid}")
+        _deliver_message(to_number, body)
         return True
     except Exception as e:
         print(f"Error sending WhatsApp notification: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def twilio_stats():
+    return {
+        "transport": transport.stats(),
+        "send_queue": send_queue.stats(),
+        "send_rate": send_limiter.stats(),
+    }
+
+def twiml_message_bodies(twiml):
+    """
+    Extracts the text of every <Message> in a TwiML response string, so a reply
+    built for the webhook can be delivered later with send_whatsapp_message.
+    """
+    root = ET.fromstring(twiml)
+    bodies = []
+    for message in root.iter('Message'):
+        body = message.find('Body')
+        text = body.text if body is not None else message.text
+        if text:
+            bodies.append(text)
+    return bodies
\ No newline at end of file
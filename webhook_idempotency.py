@@ -0,0 +1,153 @@
+"""
+Idempotent webhook handling keyed on Twilio's MessageSid.
+
+Twilio retries a webhook with the same MessageSid when the first attempt is slow
+or fails. The first request to claim a MessageSid runs the handler and stores
+the TwiML it returns. A retry, in any worker process, does not repeat the NLU
+call, the database writes or the LLM calls:
+  - if the first request has finished, the retry gets the stored TwiML;
+  - if it is still running, the retry waits up to WEBHOOK_INFLIGHT_WAIT_SECONDS
+    for it and then answers with an empty <Response/>, so no duplicate reply is sent.
+If the handler raises, the claim is released so a retry can run it again. If the
+store itself fails (locked, unreadable, disk full), the error is logged and the
+handler runs unguarded: a possible duplicate is better than dropping the message.
+
+Claims live in a small SQLite file shared by the workers, and expire after
+WEBHOOK_IDEMPOTENCY_TTL_SECONDS (completed) or WEBHOOK_INFLIGHT_TTL_SECONDS (a
+claim whose worker died).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+WEBHOOK_IDEMPOTENCY_ENABLED = os.getenv("WEBHOOK_IDEMPOTENCY_ENABLED", "1") == "1"
+WEBHOOK_IDEMPOTENCY_DB_PATH = os.getenv("WEBHOOK_IDEMPOTENCY_DB_PATH", "webhook_idempotency.db")
+WEBHOOK_IDEMPOTENCY_TTL_SECONDS = float(os.getenv("WEBHOOK_IDEMPOTENCY_TTL_SECONDS", "3600"))
+WEBHOOK_INFLIGHT_TTL_SECONDS = float(os.getenv("WEBHOOK_INFLIGHT_TTL_SECONDS", "300"))
+# Twilio gives up on a webhook after 15 seconds, so a waiting retry must answer before that.
+WEBHOOK_INFLIGHT_WAIT_SECONDS = float(os.getenv("WEBHOOK_INFLIGHT_WAIT_SECONDS", "10"))
+EMPTY_TWIML = '<?xml version="1.0" encoding="UTF-8"?><Response />'
+
+_POLL_SECONDS = 0.05
+_PURGE_INTERVAL_SECONDS = 60.0
+
+
+class IdempotencyStore:
+    def __init__(self, db_path=WEBHOOK_IDEMPOTENCY_DB_PATH, ttl_seconds=WEBHOOK_IDEMPOTENCY_TTL_SECONDS,
+                 inflight_ttl_seconds=WEBHOOK_INFLIGHT_TTL_SECONDS, inflight_wait_seconds=WEBHOOK_INFLIGHT_WAIT_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.inflight_ttl_seconds = inflight_ttl_seconds
+        self.inflight_wait_seconds = inflight_wait_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._stats = {"processed": 0, "replayed": 0, "waited": 0, "wait_timeouts": 0, "released": 0, "errors": 0}
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS webhook_requests (
+                    request_key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL CHECK (state IN ('in_flight', 'completed')),
+                    response TEXT,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            self._local.connection = connection
+        return connection
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _claim(self, key, now):
+        """Returns True if this request now owns key (no entry, or only an expired one)."""
+        connection = self._connection()
+        cursor = connection.execute(
+            "INSERT INTO webhook_requests (request_key, state, expires_at) VALUES (?, 'in_flight', ?) "
+            "ON CONFLICT (request_key) DO UPDATE SET state = 'in_flight', response = NULL, expires_at = excluded.expires_at "
+            "WHERE webhook_requests.expires_at <= ?",
+            (key, now + self.inflight_ttl_seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    def _lookup(self, key):
+        return self._connection().execute(
+            "SELECT state, response FROM webhook_requests WHERE request_key = ?", (key,)
+        ).fetchone()
+
+    def _purge_expired(self, now):
+        with self._lock:
+            if now - self._last_purge < _PURGE_INTERVAL_SECONDS:
+                return
+            self._last_purge = now
+        self._connection().execute("DELETE FROM webhook_requests WHERE expires_at <= ?", (now,))
+
+    def _store_error(self, e):
+        print(f"Webhook idempotency store error: {e}")
+        self._count("errors")
+
+    def run(self, key, handler):
+        """Returns handler()'s TwiML for the first request with this key, and the stored TwiML for retries."""
+        now = time.time()
+        try:
+            self._purge_expired(now)
+            claimed = self._claim(key, now)
+        except sqlite3.Error as e:
+            self._store_error(e)
+            return handler()
+        if claimed:
+            try:
+                response = handler()
+            except BaseException:
+                try:
+                    self._connection().execute("DELETE FROM webhook_requests WHERE request_key = ?", (key,))
+                    self._count("released")
+                except sqlite3.Error as e:
+                    # The claim still expires after inflight_ttl_seconds.
+                    self._store_error(e)
+                raise
+            try:
+                self._connection().execute(
+                    "UPDATE webhook_requests SET state = 'completed', response = ?, expires_at = ? WHERE request_key = ?",
+                    (response, time.time() + self.ttl_seconds, key),
+                )
+                self._count("processed")
+            except sqlite3.Error as e:
+                self._store_error(e)
+            return response
+
+        deadline = now + self.inflight_wait_seconds
+        waited = False
+        while True:
+            try:
+                row = self._lookup(key)
+            except sqlite3.Error as e:
+                self._store_error(e)
+                return handler()
+            if row is None:
+                # The first attempt failed and released its claim: this retry runs the handler.
+                return self.run(key, handler)
+            if row[0] == "completed":
+                self._count("waited" if waited else "replayed")
+                return row[1]
+            if time.time() >= deadline:
+                self._count("wait_timeouts")
+                return EMPTY_TWIML
+            waited = True
+            time.sleep(_POLL_SECONDS)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["enabled"] = WEBHOOK_IDEMPOTENCY_ENABLED
+        return stats
+
+
+webhook_requests = IdempotencyStore()